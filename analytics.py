@@ -0,0 +1,290 @@
+import atexit
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone, timedelta
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from observability import get_logger
+
+log = get_logger("analytics")
+
+PROGRESS_BUCKETS = 11  # 0-9%, 10-19%, ... 90-99%, 100%
+TOTALS_ID = "totals"
+BACKFILL_ID = "backfill"
+
+
+def progress_bucket(counters):
+    """Histogram bucket (0..10) for a roadmap's {"done", "total"} counters."""
+    counters = counters or {}
+    total = counters.get("total", 0)
+    return min(10, int(counters.get("done", 0) * 10 // total)) if total else 0
+
+
+def normalize_goal(goal):
+    return " ".join(str(goal).split()) if goal else None
+
+
+def normalize_skills(skills):
+    if isinstance(skills, str):
+        skills = skills.split(",")
+    return {" ".join(str(s).split()).lower() for s in (skills or []) if str(s).strip()}
+
+
+def _day(now=None):
+    return (now or datetime.now(timezone.utc)).strftime("%Y-%m-%d")
+
+
+class AnalyticsRollups:
+    """
+    Admin analytics kept as counters in one small collection, so the admin
+    page reads a fixed number of tiny documents however many users exist.
+
+    Documents are keyed by kind: the global totals, users per current goal,
+    users per skill, users per progress bucket, and per-day (and per-day per
+    goal) signup/generation/failure counts. Write paths call the record_*
+    methods, which only add to an in-memory delta; a background thread
+    folds the deltas into one unordered bulk of $inc upserts every
+    flush_interval seconds, so a burst of task toggles costs one write.
+
+    Deltas not yet flushed are lost if the process dies. rebuild()
+    recomputes the user-derived counters with aggregations as a repair.
+    """
+
+    def __init__(self, collection, flush_interval=2.0):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self._pending = defaultdict(lambda: defaultdict(int))  # _id -> {field: delta}
+        self._meta = {}  # _id -> fields set on insert
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def ensure_indexes(self):
+        try:
+            self.collection.create_index([("kind", ASCENDING), ("users", DESCENDING)], name="kind_users")
+            self.collection.create_index([("kind", ASCENDING), ("day", DESCENDING)], name="kind_day")
+        except Exception as e:
+            log.warning("Index creation failed: %s", e)
+
+    # ------------------ Recording ------------------
+    def _add(self, doc_id, meta, **deltas):
+        with self._lock:
+            counters = self._pending[doc_id]
+            for field, delta in deltas.items():
+                counters[field] += delta
+            self._meta.setdefault(doc_id, meta)
+        self._ensure_thread()
+
+    def _add_daily(self, goal, now=None, **deltas):
+        day = _day(now)
+        self._add(f"day:{day}", {"kind": "day", "day": day}, **deltas)
+        goal = normalize_goal(goal)
+        if goal:
+            self._add(f"day_goal:{day}:{goal}", {"kind": "day_goal", "day": day, "goal": goal}, **deltas)
+
+    def _move_user(self, kind, old_key, new_key):
+        if old_key == new_key:
+            return
+        if old_key is not None:
+            self._add(f"{kind}:{old_key}", {"kind": kind, "key": old_key}, users=-1)
+        if new_key is not None:
+            self._add(f"{kind}:{new_key}", {"kind": kind, "key": new_key}, users=1)
+
+    def record_signup(self, now=None):
+        self._add(TOTALS_ID, {"kind": "totals"}, users=1)
+        self._add_daily(None, now, signups=1)
+        self._move_user("progress", None, 0)
+
+    def record_profile(self, previous, goal, skills):
+        """
+        A user replaced their goal/skills/roadmap. `previous` is the user
+        document as it was before the write (goal, skills, roadmap.progress);
+        the new roadmap always starts at 0% done.
+        """
+        previous = previous or {}
+        self._move_user("goal", normalize_goal(previous.get("goal")), normalize_goal(goal))
+        old_skills, new_skills = normalize_skills(previous.get("skills")), normalize_skills(skills)
+        for skill in old_skills - new_skills:
+            self._move_user("skill", skill, None)
+        for skill in new_skills - old_skills:
+            self._move_user("skill", None, skill)
+        self._move_user("progress", progress_bucket((previous.get("roadmap") or {}).get("progress")), 0)
+
+    def record_generation(self, goal, ok=True, now=None):
+        if ok:
+            self._add(TOTALS_ID, {"kind": "totals"}, roadmaps=1)
+            self._add_daily(goal, now, generations=1)
+        else:
+            self._add(TOTALS_ID, {"kind": "totals"}, failures=1)
+            self._add_daily(goal, now, failures=1)
+
+    def record_progress(self, before, after):
+        self._move_user("progress", progress_bucket(before), progress_bucket(after))
+
+    # ------------------ Flushing ------------------
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._flush_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="analytics-rollups", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                log.warning("Analytics flush failed: %s", e)
+
+    def flush(self):
+        """Write all pending deltas now. Returns the number of documents touched."""
+        with self._flush_lock:
+            with self._lock:
+                pending, meta = self._pending, self._meta
+                self._pending, self._meta = defaultdict(lambda: defaultdict(int)), {}
+            now = datetime.now(timezone.utc)
+            ops = []
+            for doc_id, counters in pending.items():
+                deltas = {field: delta for field, delta in counters.items() if delta}
+                if not deltas:
+                    continue
+                ops.append(UpdateOne(
+                    {"_id": doc_id},
+                    {"$inc": deltas, "$set": {"updated_at": now}, "$setOnInsert": meta[doc_id]},
+                    upsert=True,
+                ))
+            if not ops:
+                return 0
+            try:
+                self.collection.bulk_write(ops, ordered=False)
+            except BulkWriteError as e:
+                # Two workers upserting a new key at once: one loses with a duplicate key. Retry just those.
+                retry = [ops[err["index"]] for err in e.details.get("writeErrors", []) if err.get("code") == 11000]
+                if retry:
+                    self.collection.bulk_write(retry, ordered=False)
+                if len(retry) != len(e.details.get("writeErrors", [])):
+                    log.warning("Dropped %d analytics updates: %s", len(e.details["writeErrors"]) - len(retry),
+                                e.details["writeErrors"][0].get("errmsg"))
+            except Exception:
+                self._restore(pending, meta)
+                raise
+            return len(ops)
+
+    def _restore(self, pending, meta):
+        """Put deltas from a failed flush back so the next one retries them."""
+        with self._lock:
+            for doc_id, counters in pending.items():
+                for field, delta in counters.items():
+                    self._pending[doc_id][field] += delta
+                self._meta.setdefault(doc_id, meta[doc_id])
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        try:
+            self.flush()
+        except Exception as e:
+            log.warning("Final analytics flush failed: %s", e)
+
+    # ------------------ Reading ------------------
+    def summary(self, top=10, days=14):
+        """Everything the admin page shows, from a bounded number of rollup documents."""
+        totals = self.collection.find_one({"_id": TOTALS_ID}) or {}
+        goals = list(self.collection.find({"kind": "goal", "users": {"$gt": 0}}, {"key": 1, "users": 1})
+                     .sort("users", DESCENDING).limit(top))
+        skills = list(self.collection.find({"kind": "skill", "users": {"$gt": 0}}, {"key": 1, "users": 1})
+                      .sort("users", DESCENDING).limit(top))
+        histogram = [0] * PROGRESS_BUCKETS
+        for doc in self.collection.find({"kind": "progress"}, {"key": 1, "users": 1}):
+            if isinstance(doc.get("key"), int) and 0 <= doc["key"] < PROGRESS_BUCKETS:
+                histogram[doc["key"]] = max(0, doc.get("users", 0))
+        since = _day(datetime.now(timezone.utc) - timedelta(days=days - 1))
+        daily = list(self.collection.find({"kind": "day", "day": {"$gte": since}},
+                                          {"_id": 0, "day": 1, "signups": 1, "generations": 1, "failures": 1})
+                     .sort("day", DESCENDING).limit(days))
+        return {
+            "total_users": totals.get("users", 0),
+            "total_roadmaps": totals.get("roadmaps", 0),
+            "generation_failures": totals.get("failures", 0),
+            "goals": [{"_id": d["key"], "count": d["users"]} for d in goals],
+            "top_skills": [(d["key"], d["users"]) for d in skills],
+            "progress_histogram": histogram,
+            "daily": daily,
+            "updated_at": totals.get("updated_at"),
+        }
+
+    # ------------------ Repair ------------------
+    def rebuild_if_missing(self, users_col, roadmaps_col=None, claim_timeout=600):
+        """
+        Backfill from the source collections once per database: users who
+        signed up before the rollups existed are otherwise never counted.
+        Every worker calls this at boot, so the first one to claim the
+        backfill marker does the scan and the rest return None. A claim older
+        than claim_timeout seconds (its worker died mid-scan) can be taken over.
+        """
+        if self.collection.find_one({"_id": TOTALS_ID, "rebuilt_at": {"$exists": True}}, {"_id": 1}) is not None:
+            return None
+        now = datetime.now(timezone.utc)
+        try:
+            # Matches only an unfinished, stale claim; otherwise the upsert inserts a new one or,
+            # when the marker is already held or done, fails on the _id.
+            self.collection.find_one_and_update(
+                {"_id": BACKFILL_ID, "done_at": {"$exists": False},
+                 "claimed_at": {"$lt": now - timedelta(seconds=claim_timeout)}},
+                {"$set": {"kind": "backfill", "claimed_at": now}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return None
+        log.info("Analytics rollups were never built for this database; rebuilding")
+        try:
+            result = self.rebuild(users_col, roadmaps_col)
+        except Exception:
+            self.collection.delete_one({"_id": BACKFILL_ID, "done_at": {"$exists": False}})
+            raise
+        self.collection.update_one({"_id": BACKFILL_ID}, {"$set": {"done_at": datetime.now(timezone.utc)}})
+        return result
+
+    def rebuild(self, users_col, roadmaps_col=None):
+        """
+        Recompute totals.users/roadmaps and the goal, skill and progress
+        counters from the source collections. This is the only full scan;
+        run it after an unclean shutdown or to backfill an existing database.
+        Per-day counters are history and are left as they are.
+        """
+        self.flush()
+        now = datetime.now(timezone.utc)
+        counts = {"goal": defaultdict(int), "skill": defaultdict(int), "progress": defaultdict(int)}
+        users = 0
+        for user in users_col.find({}, {"_id": 0, "goal": 1, "skills": 1, "roadmap.progress": 1}).batch_size(1000):
+            users += 1
+            goal = normalize_goal(user.get("goal"))
+            if goal:
+                counts["goal"][goal] += 1
+            for skill in normalize_skills(user.get("skills")):
+                counts["skill"][skill] += 1
+            counts["progress"][progress_bucket((user.get("roadmap") or {}).get("progress"))] += 1
+
+        ops = [UpdateOne({"_id": TOTALS_ID},
+                         {"$set": {"kind": "totals", "users": users, "updated_at": now, "rebuilt_at": now}},
+                         upsert=True)]
+        if roadmaps_col is not None:
+            roadmaps = roadmaps_col.count_documents({"version": {"$exists": True}})
+            ops.append(UpdateOne({"_id": TOTALS_ID}, {"$set": {"roadmaps": roadmaps}}))
+        for kind, values in counts.items():
+            for key, n in values.items():
+                ops.append(UpdateOne({"_id": f"{kind}:{key}"},
+                                     {"$set": {"kind": kind, "key": key, "users": n, "updated_at": now}}, upsert=True))
+        # Zero out keys nobody has any more.
+        stale = self.collection.find({"kind": {"$in": list(counts)}, "users": {"$ne": 0}}, {"kind": 1, "key": 1})
+        for doc in stale:
+            if doc.get("key") not in counts[doc["kind"]]:
+                ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"users": 0, "updated_at": now}}))
+        self.collection.bulk_write(ops, ordered=False)
+        log.info("Analytics rebuilt from %d users", users)
+        return {"users": users, "goals": len(counts["goal"]), "skills": len(counts["skill"])}
@@ -0,0 +1,231 @@
+import math
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+from observability import AUTH_HASH_DURATION, AUTH_HASH_REJECTED, get_logger
+
+log = get_logger("auth")
+
+# werkzeug's defaults, spelled out so a stored hash can be compared with the configured method.
+_SCRYPT_DEFAULTS = ("32768", "8", "1")
+
+
+def canonical_method(method):
+    """Expand a werkzeug method string ("scrypt", "pbkdf2:sha256", ...) to the form it writes into hashes."""
+    parts = method.split(":")
+    if parts[0] == "scrypt":
+        return ":".join(["scrypt", *(parts[1:] + list(_SCRYPT_DEFAULTS[len(parts) - 1:]))[:3]])
+    if parts[0] == "pbkdf2":
+        digest = parts[1] if len(parts) > 1 else "sha256"
+        iterations = parts[2] if len(parts) > 2 else str(DEFAULT_PBKDF2_ITERATIONS)
+        return f"pbkdf2:{digest}:{iterations}"
+    return method
+
+
+def hash_method(pwhash):
+    return pwhash.split("$", 1)[0] if pwhash else ""
+
+
+# Run in the pool processes; module-level so they pickle by reference.
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(pwhash, password):
+    return check_password_hash(pwhash, password)
+
+
+class HashPoolBusy(RuntimeError):
+    """Raised when max_pending hashes are already queued; the caller should ask the client to retry."""
+
+
+class PasswordHasher:
+    """
+    Password hashing off the request thread.
+    scrypt/pbkdf2 are CPU bound and hold the GIL, so they run in a small
+    process pool; at most max_pending hashes may be queued or running and
+    anything beyond that fails fast with HashPoolBusy instead of stacking up
+    behind a login storm. workers=0 hashes inline (tests, tiny deployments).
+    """
+
+    def __init__(self, method="scrypt:32768:8:1", workers=1, max_pending=8, timeout=10.0):
+        self.method = canonical_method(method)
+        self.workers = workers
+        self.max_pending = max(1, max_pending)
+        self.timeout = timeout
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn: forking a worker that holds Mongo/LLM client threads is not safe.
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                         mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _discard(self, executor):
+        """Drop a pool whose worker died so the next call starts a fresh one."""
+        with self._lock:
+            if self._executor is not executor:
+                return  # another thread already replaced it
+            self._executor = None
+        log.warning("Password hash pool broke; starting a new one")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, op, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                AUTH_HASH_REJECTED.inc(op=op)
+                raise HashPoolBusy("Too many password checks in progress, try again shortly.")
+            self._pending += 1
+        started = time.perf_counter()
+
+        def done(_future=None):
+            with self._lock:
+                self._pending -= 1
+            AUTH_HASH_DURATION.observe(time.perf_counter() - started, op=op)
+
+        if not self.workers:
+            try:
+                return _Done(fn(*args))
+            finally:
+                done()
+        try:
+            executor = self._pool()
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool:
+                self._discard(executor)
+                executor = self._pool()
+                future = executor.submit(fn, *args)
+        except Exception:
+            done()
+            raise
+        future.executor = executor
+        future.add_done_callback(done)
+        return future
+
+    def _result(self, future):
+        try:
+            return future.result(timeout=self.timeout)
+        except BrokenProcessPool:
+            # The worker died mid-hash (OOM kill, crash); the pool is unusable until replaced.
+            self._discard(future.executor)
+            raise HashPoolBusy("Password check was interrupted, try again.")
+
+    def hash(self, password):
+        return self._result(self._submit("hash", _hash, password, self.method))
+
+    def verify(self, pwhash, password):
+        return self._result(self._submit("verify", _verify, pwhash, password))
+
+    def needs_rehash(self, pwhash):
+        return hash_method(pwhash) != self.method
+
+    def rehash_later(self, password, on_done):
+        """Hash with the current method in the background and call on_done(new_hash). Skipped when busy."""
+        try:
+            future = self._submit("rehash", _hash, password, self.method)
+        except HashPoolBusy:
+            return False
+
+        def deliver(f):
+            try:
+                on_done(f.result())
+            except BrokenProcessPool:
+                self._discard(f.executor)
+            except Exception as e:
+                log.warning("Password rehash failed: %s", e)
+
+        if isinstance(future, _Done):
+            deliver(future)
+        else:
+            future.add_done_callback(deliver)
+        return True
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _Done:
+    """Result holder with the slice of the Future API PasswordHasher uses, for inline hashing."""
+
+    def __init__(self, value):
+        self._value = value
+
+    def result(self, timeout=None):
+        return self._value
+
+
+class SlidingWindowLimiter:
+    """
+    Per-key sliding-window counter kept in process memory.
+    Uses the two-bucket approximation: the previous window's count is
+    weighted by how much of it still overlaps the sliding window, so each
+    key costs two ints no matter how many hits it gets. Keys are held in an
+    LRU capped at max_keys so a spray of addresses cannot grow it unbounded.
+    """
+
+    def __init__(self, limit, window_seconds, max_keys=100000):
+        self.limit = limit
+        self.window = float(window_seconds)
+        self.max_keys = max_keys
+        self._counts = OrderedDict()  # key -> [window_index, current, previous]
+        self._lock = threading.Lock()
+
+    def _state(self, key, now):
+        index = int(now // self.window)
+        state = self._counts.get(key)
+        if state is None:
+            state = self._counts[key] = [index, 0, 0]
+            while len(self._counts) > self.max_keys:
+                self._counts.popitem(last=False)
+        elif state[0] != index:
+            state[2] = state[1] if state[0] == index - 1 else 0
+            state[1] = 0
+            state[0] = index
+        self._counts.move_to_end(key)
+        return state
+
+    def _estimate(self, state, now):
+        overlap = 1.0 - (now % self.window) / self.window
+        return state[1] + state[2] * overlap
+
+    def retry_after(self, key, now=None):
+        """Seconds until key may try again; 0 when it is under the limit. Does not count a hit."""
+        if self.limit <= 0:
+            return 0
+        now = time.time() if now is None else now
+        with self._lock:
+            if key not in self._counts:
+                return 0
+            state = self._state(key, now)
+            if self._estimate(state, now) < self.limit:
+                return 0
+            # Wait for the previous window's weight to decay enough, or for the current one to roll over.
+            into = now % self.window
+            if state[2] and state[1] < self.limit:
+                needed = 1.0 - (self.limit - state[1]) / state[2]
+                return max(1, math.ceil(needed * self.window - into))
+            return max(1, math.ceil(self.window - into))
+
+    def hit(self, key, now=None):
+        if self.limit <= 0:
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            self._state(key, now)[1] += 1
+
+    def reset(self, key):
+        with self._lock:
+            self._counts.pop(key, None)
@@ -0,0 +1,128 @@
+"""
+Benchmark: per-message insert_one vs mongodb_helper.BufferedWriter.
+
+Usage:
+    python benchmarks/bench_buffered_writes.py [--messages 5000] [--producers 4] [--rtt-ms 20] [--json]
+
+Writes go to mongomock (or --mongo-uri) through a proxy that sleeps
+--rtt-ms per command, standing in for the network round trip to Atlas
+that dominates chat storage. Reports messages/sec for both paths and the
+writer's per-batch latency.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mongodb_helper import BufferedWriter, utcnow  # noqa: E402
+
+
+class RoundTripCollection:
+    """Adds a fixed delay to every write command, like a remote server would."""
+
+    def __init__(self, collection, rtt):
+        self._collection = collection
+        self._rtt = rtt
+        self.name = collection.name
+
+    def insert_one(self, doc):
+        time.sleep(self._rtt)
+        return self._collection.insert_one(doc)
+
+    def insert_many(self, docs, ordered=True):
+        time.sleep(self._rtt)
+        return self._collection.insert_many(docs, ordered=ordered)
+
+    def bulk_write(self, ops, ordered=True):
+        time.sleep(self._rtt)
+        return self._collection.bulk_write(ops, ordered=ordered)
+
+
+def chat_doc(producer, i):
+    now = utcnow()
+    return {"session_id": f"s{producer}", "role": "user" if i % 2 else "assistant",
+            "message": f"message {i} " * 8, "timestamp": now, "created_at": now}
+
+
+def drive(producers, per_producer, write):
+    def work(p):
+        for i in range(per_producer):
+            write(chat_doc(p, i))
+
+    threads = [threading.Thread(target=work, args=(p,)) for p in range(producers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--producers", type=int, default=4, help="threads writing concurrently")
+    parser.add_argument("--rtt-ms", type=float, default=20.0)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--flush-ms", type=float, default=200.0)
+    parser.add_argument("--direct-sample", type=int, default=400,
+                        help="messages for the insert_one baseline (it is slow by design)")
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--json", action="store_true", help="emit machine-readable results")
+    args = parser.parse_args()
+
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        db = MongoClient(args.mongo_uri)["skillsync_bench"]
+    else:
+        import mongomock
+        db = mongomock.MongoClient()["skillsync_bench"]
+    db.drop_collection("chats_direct")
+    db.drop_collection("chats_buffered")
+    rtt = args.rtt_ms / 1000
+
+    direct = RoundTripCollection(db["chats_direct"], rtt)
+    direct_messages = max(1, args.direct_sample // args.producers) * args.producers
+    direct_s = drive(args.producers, direct_messages // args.producers, direct.insert_one)
+    direct_rate = direct_messages / direct_s
+
+    writer = BufferedWriter(RoundTripCollection(db["chats_buffered"], rtt), batch_size=args.batch_size,
+                            flush_interval=args.flush_ms / 1000, max_buffer=args.batch_size * 4)
+    per = max(1, args.messages // args.producers)
+    start = time.perf_counter()
+    drive(args.producers, per, writer.put)
+    enqueue_s = time.perf_counter() - start
+    writer.close()
+    buffered_s = time.perf_counter() - start
+    stored = db["chats_buffered"].count_documents({})
+
+    results = {
+        "rtt_ms": args.rtt_ms,
+        "producers": args.producers,
+        "direct_insert_one": {"messages": direct_messages, "msgs_per_sec": round(direct_rate, 1)},
+        "buffered": {
+            "messages": per * args.producers,
+            "stored": stored,
+            "msgs_per_sec": round(per * args.producers / buffered_s, 1),
+            "enqueue_msgs_per_sec": round(per * args.producers / enqueue_s, 1),
+            **writer.stats(),
+        },
+    }
+    results["speedup"] = round(results["buffered"]["msgs_per_sec"] / direct_rate, 1)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    b = results["buffered"]
+    print(f"rtt {args.rtt_ms} ms, {args.producers} producers")
+    print(f"insert_one     {direct_rate:>10.1f} msg/s")
+    print(f"BufferedWriter {b['msgs_per_sec']:>10.1f} msg/s  ({b['batches']} batches, "
+          f"p50 {b['batch_ms_p50']} ms, p95 {b['batch_ms_p95']} ms, {b['blocked_puts']} blocked puts)")
+    print(f"speedup x{results['speedup']}, stored {b['stored']}/{b['messages']}")
+
+
+if __name__ == "__main__":
+    main()
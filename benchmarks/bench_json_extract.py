@@ -0,0 +1,122 @@
+"""
+Micro-benchmark: json_extract.extract_json vs the old regex fallback in safe_json_loads.
+
+Usage:
+    python benchmarks/bench_json_extract.py [--repeat 200] [--json]
+
+The corpus mirrors the shapes we get back from the roadmap / daily-task
+prompts: clean JSON, fenced JSON, JSON wrapped in prose, trailing commas,
+truncated output (max_tokens hit), prose after an unclosed brace, which
+is the case that sends the old regex into exponential backtracking, and
+deeply nested brackets. A case only counts as parsed when the result is
+non-empty.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_extract import extract_json  # noqa: E402
+
+
+def legacy_safe_json_loads(s):
+    """The pre-json_extract implementation, kept here for comparison only."""
+    try:
+        return json.loads(s)
+    except Exception:
+        pass
+    m = re.search(r"(\{(?:.|\s)*\}|\[(?:.|\s)*\])", str(s))
+    if not m:
+        return None
+    candidate = m.group(1)
+    candidate = re.sub(r"^```(?:json)?\s*", "", candidate, flags=re.I)
+    candidate = re.sub(r"\s*```$", "", candidate, flags=re.I)
+    try:
+        return json.loads(candidate)
+    except Exception:
+        return None
+
+
+def make_roadmap(weeks):
+    return {
+        "goal": "Data Scientist",
+        "weeks": [
+            {
+                "title": f"Week {i + 1} - Topic {i + 1}",
+                "tasks": [{"title": f"Study concept {i}.{j} with \"quotes\" and {{braces}}", "done": False} for j in range(7)],
+                "resources": [f"https://example.com/{i}/{j}" for j in range(3)],
+                "weekend_challenge": "Build a small project",
+            }
+            for i in range(weeks)
+        ],
+    }
+
+
+def build_corpus():
+    doc = json.dumps(make_roadmap(12), indent=2)
+    prose = "Sure! Here's a roadmap tailored to your goals. " * 40
+    return {
+        "clean": doc,
+        "fenced": f"```json\n{doc}\n```",
+        "prose_wrapped": f"{prose}\n{doc}\nLet me know if you want changes!",
+        "trailing_commas": doc.replace('"done": false\n', '"done": false,\n'),
+        "truncated": doc[: int(len(doc) * 0.8)],
+        # The legacy regex's (.|\s)* doubles its work for every whitespace character
+        # after an unclosed brace, so this case is kept small enough to finish.
+        "prose_broken_object": 'Here is the plan: {"goal": ' + "word " * 15,
+        "deeply_nested": "text " + "[" * 5000 + "]" * 5000,
+        "daily_tasks_array": json.dumps([{"day": f"Day {d}", "tasks": ["Read", "Code", "Review"]} for d in range(1, 6)]),
+    }
+
+
+def usable(parsed):
+    """An empty {} or [] (e.g. a repair that had to drop everything) counts as a failure."""
+    return bool(parsed)
+
+
+def time_call(fn, text, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        samples.append(time.perf_counter() - start)
+    return {
+        "median_us": round(statistics.median(samples) * 1e6, 2),
+        "max_us": round(max(samples) * 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="emit machine-readable results")
+    args = parser.parse_args()
+
+    results = {}
+    for name, text in build_corpus().items():
+        results[name] = {
+            "bytes": len(text),
+            "legacy": time_call(legacy_safe_json_loads, text, args.repeat),
+            "extract_json": time_call(extract_json, text, args.repeat),
+            "legacy_parsed": usable(legacy_safe_json_loads(text)),
+            "extract_parsed": usable(extract_json(text)),
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'case':<22}{'bytes':>8}{'legacy µs':>14}{'new µs':>12}{'legacy ok':>11}{'new ok':>8}")
+    for name, r in results.items():
+        print(
+            f"{name:<22}{r['bytes']:>8}{r['legacy']['median_us']:>14}{r['extract_json']['median_us']:>12}"
+            f"{str(r['legacy_parsed']):>11}{str(r['extract_parsed']):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
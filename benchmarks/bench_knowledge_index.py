@@ -0,0 +1,113 @@
+"""
+Benchmark: knowledge_index ingestion and query throughput.
+
+Usage:
+    python benchmarks/bench_knowledge_index.py [--docs 20000] [--queries 2000] [--json]
+
+Builds a synthetic corpus of job postings on top of the bundled
+data/knowledge_corpus.jsonl, then measures docs/sec for ingestion, query
+latency with a cold cache (every query distinct) and with a warm cache
+(the same queries repeated), and incremental adds into a live index.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knowledge_index import DEFAULT_CORPUS, KnowledgeIndex  # noqa: E402
+
+ROLES = ["Data Scientist", "Backend Developer", "Frontend Developer", "DevOps Engineer", "Data Engineer",
+         "ML Engineer", "Android Developer", "QA Engineer", "Cloud Engineer", "Security Analyst"]
+SKILLS = ["Python", "SQL", "React", "Docker", "Kubernetes", "AWS", "Java", "Spark", "Airflow", "Pandas",
+          "TypeScript", "Terraform", "Linux", "Git", "Kotlin", "Figma", "Statistics", "PyTorch", "Kafka", "Redis"]
+FILLER = ("team product build ship maintain scalable services collaborate stakeholders deliver features "
+          "experience years degree preferred remote hybrid office growth mentoring agile sprint").split()
+
+
+def synthetic_docs(n, rng):
+    for i in range(n):
+        skills = rng.sample(SKILLS, 5)
+        yield {
+            "id": f"synthetic-{i}",
+            "title": f"{rng.choice(ROLES)} #{i}",
+            "skills": skills,
+            "text": " ".join(rng.choice(FILLER + skills) for _ in range(60)),
+        }
+
+
+def random_queries(n, rng):
+    return [f"{rng.choice(ROLES)} {' '.join(rng.sample(SKILLS, 2))} #{i}" for i in range(n)]
+
+
+def latency_summary(samples):
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(ordered[len(ordered) // 2] * 1e3, 3),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95)] * 1e3, 3),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1e3, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1e3, 3),
+        "qps": round(len(samples) / sum(samples), 1),
+    }
+
+
+def time_queries(index, queries):
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        index.search(q, k=5)
+        samples.append(time.perf_counter() - start)
+    return latency_summary(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="emit machine-readable results")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    index = KnowledgeIndex(cache_size=args.queries)
+    index.load_jsonl(DEFAULT_CORPUS)
+    docs = list(synthetic_docs(args.docs, rng))
+    start = time.perf_counter()
+    index.add_many(docs)
+    ingest_s = time.perf_counter() - start
+
+    queries = random_queries(args.queries, rng)
+    cold = time_queries(index, queries)
+    warm = time_queries(index, queries)
+
+    extra = list(synthetic_docs(200, random.Random(args.seed + 1)))
+    start = time.perf_counter()
+    for doc in extra:
+        doc["id"] = "live-" + doc["id"]
+        index.add(doc)
+    add_ms = (time.perf_counter() - start) / len(extra) * 1e3
+
+    results = {
+        "documents": len(index),
+        "terms": index.stats()["terms"],
+        "ingest_docs_per_sec": round(args.docs / ingest_s, 1),
+        "incremental_add_ms": round(add_ms, 3),
+        "query_cold": cold,
+        "query_warm": warm,
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"documents: {results['documents']}  terms: {results['terms']}")
+    print(f"ingest: {results['ingest_docs_per_sec']} docs/s   incremental add: {add_ms:.3f} ms/doc")
+    for name in ("query_cold", "query_warm"):
+        r = results[name]
+        print(f"{name:<11} p50 {r['p50_ms']} ms  p95 {r['p95_ms']} ms  p99 {r['p99_ms']} ms  {r['qps']} q/s")
+
+
+if __name__ == "__main__":
+    main()
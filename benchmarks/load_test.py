@@ -0,0 +1,429 @@
+"""
+Offline load test for the Flask app: fake OpenAI server + in-memory Mongo.
+
+Usage:
+    python benchmarks/load_test.py [--requests 2000] [--concurrency 16] [--out results.json]
+                                   [--llm-latency-ms 300] [--baseline old.json --max-regression 25]
+
+Nothing leaves the machine. A local HTTP server speaks the OpenAI chat
+completions API (streaming and non-streaming) and returns deterministic
+roadmaps after a configurable delay; the app's OpenAI client is pointed at
+it through OPENAI_BASE_URL. Mongo is mongomock unless --mongo-uri points at
+a real (local) server. Virtual users each hold their own session cookie and
+send a weighted mix of login / dashboard / generate_roadmap /
+update_task_status / download_pdf requests. The gateway's LLM_* limits
+still apply; raise LLM_RATE_PER_MINUTE and LLM_TOKENS_PER_MINUTE (or set
+it to 0) to measure the app rather than the rate limiter.
+
+The report has, per route: count, errors, p50/p95/p99/mean latency,
+throughput and peak traced allocation per request, plus micro-timings of
+the hot helpers (calculate_progress, attach_weekly_dates, PDF rendering)
+and the process's max RSS. With --baseline, exits non-zero when any p95
+or hot-path median regressed by more than --max-regression percent, so it
+can gate CI.
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_MIX = "login=5,dashboard=40,update_task_status=35,generate_roadmap=10,download_pdf=10"
+PASSWORD = "load-test-password"
+
+
+# ------------------ Fake LLM ------------------
+def fake_roadmap(seed, weeks, tasks_per_week):
+    rng = random.Random(seed)
+    topics = ["Foundations", "Data Handling", "APIs", "Testing", "Projects", "Deployment", "Interview Prep"]
+    return {
+        "goal": f"Goal {seed % 1000}",
+        "weeks": [
+            {
+                "title": f"Week {i + 1} - {rng.choice(topics)}",
+                "tasks": [{"title": f"Task {i + 1}.{j + 1}: practice {rng.choice(topics).lower()}", "done": False}
+                          for j in range(tasks_per_week)],
+                "resources": [f"https://example.com/w{i + 1}/r{r}" for r in range(3)],
+                "weekend_challenge": f"Mini project {i + 1}",
+            }
+            for i in range(weeks)
+        ],
+    }
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    """Minimal /v1/chat/completions. Settings live on the server object."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = json.dumps(body.get("messages", []), sort_keys=True)
+        seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+        cfg = self.server.settings
+        if "daily" in prompt.lower():
+            text = json.dumps([{"day": f"Day {d}", "tasks": ["Read", "Code", "Review"]} for d in range(1, 6)])
+        else:
+            text = json.dumps(fake_roadmap(seed, cfg["weeks"], cfg["tasks_per_week"]))
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4,
+                 "total_tokens": (len(prompt) + len(text)) // 4}
+        jitter = random.Random(seed).uniform(0, cfg["jitter_ms"])
+        time.sleep((cfg["latency_ms"] + jitter) / 1000)
+        with self.server.lock:
+            self.server.calls += 1
+
+        base = {"id": f"chatcmpl-{seed}", "created": int(time.time()), "model": body.get("model", "fake")}
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            step = cfg["chunk_chars"]
+            for i in range(0, len(text), step):
+                chunk = dict(base, object="chat.completion.chunk",
+                             choices=[{"index": 0, "delta": {"content": text[i:i + step]}, "finish_reason": None}])
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            final = dict(base, object="chat.completion.chunk", choices=[], usage=usage)
+            self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            self.close_connection = True
+            return
+        payload = json.dumps(dict(
+            base, object="chat.completion", usage=usage,
+            choices=[{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+        )).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_fake_llm(latency_ms, jitter_ms, weeks, tasks_per_week, chunk_chars=64):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeLLMHandler)
+    server.daemon_threads = True
+    server.settings = {"latency_ms": latency_ms, "jitter_ms": jitter_ms, "weeks": weeks,
+                       "tasks_per_week": tasks_per_week, "chunk_chars": chunk_chars}
+    server.lock = threading.Lock()
+    server.calls = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ------------------ App under test ------------------
+def patch_mongomock_bulk():
+    """
+    mongomock's bulk builder predates the `sort` argument newer pymongo
+    passes for UpdateOne/ReplaceOne, so every bulk_write raises TypeError.
+    Accept and drop it (mongomock applies single-document updates in
+    natural order anyway).
+    """
+    from mongomock.collection import BulkOperationBuilder
+    for name in ("add_update", "add_replace"):
+        original = getattr(BulkOperationBuilder, name)
+        if getattr(original, "drops_sort", False):
+            continue
+
+        def add(self, *args, _original=original, sort=None, **kwargs):
+            return _original(self, *args, **kwargs)
+
+        add.drops_sort = True
+        setattr(BulkOperationBuilder, name, add)
+
+
+def load_app(args, llm_url):
+    os.environ["OPENAI_BASE_URL"] = llm_url
+    os.environ["OPENAI_API_KEY"] = "offline-load-test"
+    os.environ["PDF_CACHE_DIR"] = tempfile.mkdtemp(prefix="skillsync_bench_pdf_")
+    os.environ.setdefault("SECRET_KEY", "load-test")
+    if args.mongo_uri:
+        os.environ["MONGO_URI"] = args.mongo_uri
+    else:
+        import mongomock
+        import mongo_setup
+        patch_mongomock_bulk()
+        shared = mongomock.MongoClient()
+        os.environ["MONGO_URI"] = "mongodb://in-memory"
+        # create_client() builds its MongoClient from this module-level name.
+        mongo_setup.MongoClient = lambda uri, **options: shared
+    os.environ["MONGO_INDEX_BOOTSTRAP"] = "sync"
+    # Every virtual user shares one client IP, and logins must not be shed as "busy".
+    os.environ.setdefault("AUTH_IP_LIMIT", "0")
+    os.environ.setdefault("AUTH_HASH_MAX_PENDING", str(args.concurrency))
+    import main
+    if args.mongo_uri:
+        main.mongo_client.drop_database("SkillSyncDB")
+    main.create_app().config["TESTING"] = True
+    return main
+
+
+class VirtualUser:
+    def __init__(self, app, email):
+        self.client = app.test_client()
+        self.email = email
+
+    def signup(self):
+        self.client.post("/signup", data={"name": self.email.split("@")[0], "email": self.email,
+                                          "password": PASSWORD, "confirm_password": PASSWORD})
+
+
+def op_login(user, rng, ctx):
+    return user.client.post("/login", data={"email": user.email, "password": PASSWORD})
+
+
+def op_dashboard(user, rng, ctx):
+    return user.client.get("/dashboard")
+
+
+def op_generate_roadmap(user, rng, ctx):
+    goal = f"Load Goal {rng.randrange(ctx['distinct_goals'])}"
+    return user.client.post("/generate_roadmap", json={"goal": goal, "skills": ["python"], "hours": 2,
+                                                       "duration_months": 3})
+
+
+def op_update_task_status(user, rng, ctx):
+    return user.client.post("/update_task_status", json={
+        "weekIdx": rng.randrange(ctx["weeks"]), "taskIdx": rng.randrange(ctx["tasks_per_week"]),
+        "done": rng.random() < 0.5,
+    })
+
+
+def op_download_pdf(user, rng, ctx):
+    return user.client.get("/download_pdf")
+
+
+OPERATIONS = {
+    "login": op_login,
+    "dashboard": op_dashboard,
+    "generate_roadmap": op_generate_roadmap,
+    "update_task_status": op_update_task_status,
+    "download_pdf": op_download_pdf,
+}
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise SystemExit(f"Unknown route in --mix: {name} (choose from {', '.join(OPERATIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ------------------ Measurement ------------------
+def percentile(ordered, p):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def summarize(samples, errors, wall):
+    ordered = sorted(samples)
+    ms = lambda v: None if v is None else round(v * 1e3, 3)  # noqa: E731
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "p50_ms": ms(percentile(ordered, 0.50)),
+        "p95_ms": ms(percentile(ordered, 0.95)),
+        "p99_ms": ms(percentile(ordered, 0.99)),
+        "mean_ms": ms(statistics.fmean(samples)) if samples else None,
+        "throughput_rps": round(len(samples) / wall, 2) if wall else None,
+    }
+
+
+def run_load(users, mix, ctx, total, concurrency, seed):
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    samples = {n: [] for n in names}
+    errors = {n: 0 for n in names}
+    lock = threading.Lock()
+    remaining = [total]
+
+    def worker(i):
+        rng = random.Random(seed + i)
+        user = users[i % len(users)]
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                resp = OPERATIONS[name](user, rng, ctx)
+                resp.get_data()
+                failed = resp.status_code >= 400
+                resp.close()
+            except Exception:
+                failed = True
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples[name].append(elapsed)
+                errors[name] += failed
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+    routes = {n: summarize(samples[n], errors[n], wall) for n in names if samples[n]}
+    return routes, wall
+
+
+def trace_route_memory(user, names, ctx, seed, repeat=5):
+    """Peak bytes allocated while serving one request, measured sequentially."""
+    rng = random.Random(seed)
+    peaks = {}
+    tracemalloc.start()
+    try:
+        for name in names:
+            worst = 0
+            for _ in range(repeat):
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+                resp = OPERATIONS[name](user, rng, ctx)
+                resp.get_data()
+                resp.close()
+                worst = max(worst, tracemalloc.get_traced_memory()[1] - base)
+            peaks[name] = round(worst / 1024, 1)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def time_hot_path(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {"median_us": round(statistics.median(samples) * 1e6, 2),
+            "p95_us": round(percentile(sorted(samples), 0.95) * 1e6, 2)}
+
+
+def hot_paths(main, weeks, tasks_per_week, repeat):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate
+    import pdf_export
+
+    roadmap = fake_roadmap(1, weeks, tasks_per_week)
+    counted = main.attach_progress_counters(json.loads(json.dumps(roadmap)))
+
+    def render_pdf():
+        SimpleDocTemplate(io.BytesIO(), pagesize=A4).build(pdf_export.build_story("Load Test", roadmap))
+
+    return {
+        "calculate_progress_scan": time_hot_path(lambda: main.calculate_progress(roadmap), repeat * 20),
+        "calculate_progress_counters": time_hot_path(lambda: main.calculate_progress(counted), repeat * 20),
+        "attach_weekly_dates": time_hot_path(lambda: main.attach_weekly_dates(roadmap), repeat * 20),
+        "roadmap_fingerprint": time_hot_path(lambda: pdf_export.roadmap_fingerprint("Load Test", roadmap), repeat * 20),
+        "pdf_render": time_hot_path(render_pdf, max(3, repeat // 10)),
+    }
+
+
+def compare(report, baseline, max_regression):
+    """List of human-readable regressions against a previous report."""
+    limit = 1 + max_regression / 100.0
+    problems = []
+    for name, r in report["routes"].items():
+        old = baseline.get("routes", {}).get(name, {}).get("p95_ms")
+        if old and r["p95_ms"] and r["p95_ms"] > old * limit:
+            problems.append(f"route {name}: p95 {old} -> {r['p95_ms']} ms")
+    for name, r in report["hot_paths"].items():
+        old = baseline.get("hot_paths", {}).get(name, {}).get("median_us")
+        if old and r["median_us"] > old * limit:
+            problems.append(f"hot path {name}: median {old} -> {r['median_us']} us")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000, help="total requests across all users")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent virtual users")
+    parser.add_argument("--users", type=int, default=None, help="distinct accounts (default: concurrency)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="route=weight list")
+    parser.add_argument("--distinct-goals", type=int, default=50,
+                        help="goal variety for generate_roadmap; lower means more roadmap cache hits")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--llm-weeks", type=int, default=12, help="weeks per generated roadmap")
+    parser.add_argument("--llm-tasks", type=int, default=7, help="tasks per generated week")
+    parser.add_argument("--mongo-uri", default=None, help="use a real local mongod instead of mongomock")
+    parser.add_argument("--hot-path-repeat", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=None, help="write the JSON report here as well as stdout")
+    parser.add_argument("--baseline", default=None, help="previous report to compare against")
+    parser.add_argument("--max-regression", type=float, default=25.0, help="allowed slowdown in percent")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's own log output")
+    args = parser.parse_args()
+
+    llm_server = start_fake_llm(args.llm_latency_ms, args.llm_jitter_ms, args.llm_weeks, args.llm_tasks)
+    llm_url = f"http://127.0.0.1:{llm_server.server_address[1]}/v1"
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    if not args.verbose:
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+    ctx = {"weeks": args.llm_weeks, "tasks_per_week": args.llm_tasks, "distinct_goals": args.distinct_goals}
+    mix = parse_mix(args.mix)
+
+    with quiet:
+        app_module = load_app(args, llm_url)
+        users = [VirtualUser(app_module.app, f"load{i}@bench.local") for i in range(args.users or args.concurrency)]
+        setup_rng = random.Random(args.seed)
+        for user in users:
+            user.signup()
+            op_login(user, setup_rng, ctx)
+            op_generate_roadmap(user, setup_rng, ctx)
+        routes, wall = run_load(users, mix, ctx, args.requests, args.concurrency, args.seed)
+        memory = trace_route_memory(users[0], list(mix), ctx, args.seed)
+        hot = hot_paths(app_module, args.llm_weeks, args.llm_tasks, args.hot_path_repeat)
+
+    for name, peak in memory.items():
+        if name in routes:
+            routes[name]["peak_alloc_kb"] = peak
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")},
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(sum(r["count"] for r in routes.values()) / wall, 2),
+        "llm_calls": llm_server.calls,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "routes": routes,
+        "hot_paths": hot,
+        "llm_gateway": app_module.llm.metrics(),
+    }
+    llm_server.shutdown()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = compare(report, json.load(f), args.max_regression)
+        for p in problems:
+            print("REGRESSION:", p, file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Cold-start profile and budget check for a web worker.
+
+Usage:
+    python benchmarks/startup_profile.py [--runs 5] [--budget-ms 1000] [--top 15] [--json]
+
+Each run is a fresh interpreter that imports main, calls create_app() and
+serves one GET / (what a new gunicorn worker does before it is useful).
+Reports the median time to ready, the heaviest imports from
+`python -X importtime`, and whether any module that should load lazily
+(OpenAI SDK, reportlab, crewAI and its tree) was imported on the way.
+
+Exits non-zero when the median exceeds --budget-ms or a lazy module was
+loaded eagerly, so it can run as a CI step. Runs with the deployment's
+defaults; a crew warm-up thread started by create_app() is waited for so
+whatever it imports counts. Mongo is never contacted: the client does
+not connect at import and index bootstrap runs in the background.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY_MODULES = ("openai", "reportlab", "crewai", "crewai_tools", "langchain", "litellm", "chromadb")
+
+PROBE = r"""
+import json, sys, threading, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+app = main.create_app()
+t2 = time.perf_counter()
+resp = app.test_client().get("/")
+t3 = time.perf_counter()
+for thread in threading.enumerate():
+    if thread.name == "skillsync-crew-warmup":
+        thread.join(60)  # what it imports counts against the worker even though it runs after ready
+lazy = {lazy!r}
+print("@@PROBE@@" + json.dumps({{
+    "import_ms": (t1 - t0) * 1e3,
+    "create_app_ms": (t2 - t1) * 1e3,
+    "first_request_ms": (t3 - t2) * 1e3,
+    "ready_ms": (t3 - t0) * 1e3,
+    "status": resp.status_code,
+    "eager": sorted(m for m in lazy if m in sys.modules),
+    "modules": len(sys.modules),
+}}))
+"""
+
+
+def parse_importtime(stderr):
+    """(name, self_us, cumulative_us, depth) for each `import time:` line."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, raw_name = parts
+        depth = (len(raw_name) - len(raw_name.lstrip(" ")) - 1) // 2
+        rows.append((raw_name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def run_once(env):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(lazy=LAZY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=120,
+    )
+    marker = [line for line in proc.stdout.splitlines() if line.startswith("@@PROBE@@")]
+    if proc.returncode != 0 or not marker:
+        raise SystemExit(f"probe failed (exit {proc.returncode}):\n{proc.stderr[-2000:]}")
+    return json.loads(marker[0][len("@@PROBE@@"):]), parse_importtime(proc.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1000.0, help="max median time to first response")
+    parser.add_argument("--top", type=int, default=15, help="how many imports to list")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable results")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    # Unroutable on purpose: startup must not wait on the database.
+    env.setdefault("MONGO_URI", "mongodb://127.0.0.1:9/?serverSelectionTimeoutMS=200")
+    env.setdefault("OPENAI_API_KEY", "startup-profile")
+    env.setdefault("LOG_LEVEL", "ERROR")
+    env.setdefault("MONGO_INDEX_BOOTSTRAP", "background")
+
+    probes, rows = [], None
+    for _ in range(args.runs):
+        probe, rows = run_once(env)
+        probes.append(probe)
+
+    # Depth 0 is mostly `main` itself; depth 1 is what main (and site) pull in directly.
+    top_level = sorted((r for r in rows if r[3] <= 1), key=lambda r: r[2], reverse=True)[:args.top]
+    heaviest_self = sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]
+    median = {k: round(statistics.median(p[k] for p in probes), 1)
+              for k in ("import_ms", "create_app_ms", "first_request_ms", "ready_ms")}
+    eager = sorted({m for p in probes for m in p["eager"]})
+    report = {
+        "runs": args.runs,
+        "median": median,
+        "modules_loaded": probes[-1]["modules"],
+        "eager_lazy_modules": eager,
+        "budget_ms": args.budget_ms,
+        "within_budget": median["ready_ms"] <= args.budget_ms and not eager,
+        "top_level_imports_ms": {name: round(cum / 1000, 1) for name, _, cum, _ in top_level},
+        "heaviest_self_ms": {name: round(own / 1000, 1) for name, own, _, _ in heaviest_self},
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"ready in {median['ready_ms']} ms (import {median['import_ms']}, create_app "
+              f"{median['create_app_ms']}, first request {median['first_request_ms']}) over {args.runs} runs")
+        print(f"modules loaded: {report['modules_loaded']}")
+        print("direct imports (cumulative ms):")
+        for name, ms in report["top_level_imports_ms"].items():
+            print(f"  {ms:>8}  {name}")
+        if eager:
+            print("loaded eagerly but should be lazy:", ", ".join(eager))
+    if not report["within_budget"]:
+        print(f"FAIL: startup over budget ({median['ready_ms']} ms > {args.budget_ms} ms) "
+              f"or lazy modules loaded: {eager}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,23 @@
-from typing import Type
+from typing import Optional, Type
 from crewai.tools import BaseTool # FIX: BaseTool is correctly imported from crewai.tools
 from pydantic import BaseModel, Field
 import json
 import requests 
+from knowledge_index import format_results, get_knowledge_index
+from playlist_scheduler import build_schedule, get_playlist_index
 
 # --- Tool Input Schemas ---
 class WebSearchInput(BaseModel):
     """Input schema for WebSearchTool."""
     query: str = Field(description="The search term to find job market data or required skills.")
+    top_k: int = Field(default=3, description="How many matching documents to return.")
 
 class PlaylistInput(BaseModel):
     """Input schema for PlaylistPlannerTool."""
-    playlists: list[dict] = Field(description="List of playlists, each with 'url' and 'hours' to analyze.")
+    playlists: list[dict] = Field(description="List of playlists, each with a 'url' (looked up in the local playlist index), optional 'videos' with durations, or total 'hours'.")
+    hours_per_day: float = Field(default=2, description="Hours of video the user can watch per day.")
+    skip_weekends: bool = Field(default=False, description="Leave Saturdays and Sundays free.")
+    start_date: Optional[str] = Field(default=None, description="First study day as YYYY-MM-DD (defaults to today).")
 
 
 # --- Specialized Tool Classes ---
@@ -22,9 +28,9 @@ class WebSearchTool(BaseTool):
     description: str = "Searches the internet for the latest career paths, job requirements, and skill prerequisites." 
     args_schema: Type[BaseModel] = WebSearchInput
 
-    def _run(self, query: str) -> str:
-        # Placeholder
-        return f"Found latest market data on '{query}'. The key requirement is deep practice."
+    def _run(self, query: str, top_k: int = 3) -> str:
+        # Served from the local BM25 index (knowledge_index.py); no network round trip.
+        return format_results(query, get_knowledge_index().search(query, k=max(1, min(top_k, 10))))
 
 
 class RoadmapGeneratorTool(BaseTool):
@@ -40,16 +46,15 @@ class PlaylistPlannerTool(BaseTool):
     description: str = "Analyzes a list of video playlist URLs and user time commitments, generating a single, unified daily viewing schedule."
     args_schema: Type[BaseModel] = PlaylistInput
     
-    def _run(self, playlists: list[dict]) -> str:
-        # Placeholder: Returns simulated JSON schedule
-        if playlists and any("youtube.com" in p.get("url", "") for p in playlists):
-             total_hours = sum(p.get('hours', 0) for p in playlists)
-             
-             return json.dumps({
-                 "schedule": [
-                     {"date": "2025-10-15", "video_title": f"Video 1 from List {i}", "time_needed_minutes": 60, "url": p.get("url", "#") }
-                     for i, p in enumerate(playlists)
-                 ],
-                 "schedule_summary": f"Total commitment analyzed: {total_hours} hours daily.",
-             })
-        return '{"schedule": [], "error": "Playlist URL not supported or analysis failed."}'
\ No newline at end of file
+    def _run(self, playlists: list[dict], hours_per_day: float = 2, skip_weekends: bool = False, start_date: Optional[str] = None) -> str:
+        # Durations come from the locally cached playlist index; no network calls here.
+        if not playlists:
+            return json.dumps({"schedule": [], "error": "No playlists provided."})
+        try:
+            plan = build_schedule(playlists, hours_per_day, start_date=start_date,
+                                  skip_weekends=skip_weekends, index=get_playlist_index())
+        except ValueError as e:
+            return json.dumps({"schedule": [], "error": str(e)})
+        if not plan["schedule"]:
+            plan["error"] = "No duration data found for these playlists."
+        return json.dumps(plan)
@@ -0,0 +1,97 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from observability import get_logger
+
+log = get_logger("daily_plans")
+
+
+class DailyPlanStore:
+    """
+    Generated daily plans, one document per (email, roadmap version, week index).
+    The unique index on those fields is created by mongo_setup.ensure_indexes.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get(self, email, roadmap_version, week_index):
+        return self.collection.find_one(
+            {"email": email, "roadmap_version": roadmap_version, "week_index": week_index},
+            {"_id": 0, "week_index": 1, "week_title": 1, "plan": 1},
+        )
+
+    def get_many(self, email, roadmap_version):
+        """All stored plans for a roadmap version, keyed by week index."""
+        cursor = self.collection.find(
+            {"email": email, "roadmap_version": roadmap_version},
+            {"_id": 0, "week_index": 1, "week_title": 1, "plan": 1},
+        )
+        return {doc["week_index"]: doc for doc in cursor}
+
+    def save_many(self, email, roadmap_version, plans):
+        """Upsert {week_index: (week_title, plan)} in a single unordered bulk write."""
+        if not plans:
+            return 0
+        now = datetime.now(timezone.utc)
+        ops = [
+            UpdateOne(
+                {"email": email, "roadmap_version": roadmap_version, "week_index": index},
+                {
+                    "$set": {"week_title": title, "plan": plan, "updated_at": now},
+                    "$setOnInsert": {"created_at": now},
+                },
+                upsert=True,
+            )
+            for index, (title, plan) in plans.items()
+        ]
+        try:
+            result = self.collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # Another request upserted the same week first; retrying turns the insert into an update.
+            errors = e.details.get("writeErrors", [])
+            retry = [ops[err["index"]] for err in errors if err.get("code") == 11000]
+            if len(retry) != len(errors):
+                raise
+            result = self.collection.bulk_write(retry, ordered=False)
+            return e.details.get("nUpserted", 0) + e.details.get("nModified", 0) + result.upserted_count + result.modified_count
+        return result.upserted_count + result.modified_count
+
+
+def chunked(items, size):
+    size = max(1, size)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def generate_in_batches(weeks, generate_batch, weeks_per_call=4, concurrency=3):
+    """
+    Generate plans for many weeks with few LLM calls.
+    `weeks` is a list of (week_index, week_title); each call gets up to
+    `weeks_per_call` of them and at most `concurrency` calls run at once.
+    generate_batch(batch) must return {week_index: plan}.
+    Returns (plans, errors) where errors maps week_index -> message.
+    """
+    plans, errors = {}, {}
+    batches = chunked(list(weeks), weeks_per_call)
+    if not batches:
+        return plans, errors
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(batches)))) as pool:
+        futures = {pool.submit(generate_batch, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                result = future.result() or {}
+            except Exception as e:
+                log.warning("Batch failed: %s", e)
+                result = {}
+                for index, _ in batch:
+                    errors[index] = str(e)
+            for index, _ in batch:
+                if index in result:
+                    plans[index] = result[index]
+                elif index not in errors:
+                    errors[index] = "Missing from model output"
+    return plans, errors
@@ -0,0 +1,70 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from observability import get_logger
+
+log = get_logger("dashboard_cache")
+
+
+def dashboard_etag(email, revision, day, salt=""):
+    """
+    Strong validator for one user's dashboard: it changes when the roadmap
+    revision does, when the calendar day rolls over (week dates are relative
+    to today) and when `salt` (template/deploy stamp) changes.
+    """
+    blob = f"{email}\x00{revision}\x00{day.isoformat()}\x00{salt}"
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+class DashboardCache:
+    """
+    In-process LRU of rendered dashboards, one entry per user, keyed by the
+    ETag the page was rendered for. A roadmap write bumps the user's
+    revision, which changes the ETag, so stale entries are simply never
+    matched again and no cross-worker invalidation is needed.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def get(self, email, etag):
+        with self._lock:
+            entry = self._lru.get(email)
+            if entry is None or entry[0] != etag:
+                self.stats["misses"] += 1
+                return None
+            self._lru.move_to_end(email)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def put(self, email, etag, html):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._lru[email] = (etag, html)
+            self._lru.move_to_end(email)
+            self.stats["stores"] += 1
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, email=None):
+        """Drop one user's entry, or everything when email is None."""
+        with self._lock:
+            if email is None:
+                removed = len(self._lru)
+                self._lru.clear()
+            else:
+                removed = 1 if self._lru.pop(email, None) is not None else 0
+        log.debug("Dashboard cache invalidated %d entries", removed)
+        return removed
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return dict(self.stats, entries=len(self._lru), max_entries=self.max_entries,
+                        hit_ratio=round(self.stats["hits"] / lookups, 4) if lookups else 0.0)
@@ -0,0 +1,238 @@
+"""
+Load a playlists catalog into SkillSyncDB.playlists.
+
+Usage:
+    python ingest_playlists.py [catalog ...] [--chunk-size 1000] [--dedupe] [--dry-run]
+
+Catalogs are JSONL or CSV (optionally .gz), one playlist per row with at
+least `url` and `title`; `language`, `creator`, `rating`, `video_count`
+and `avg_video_minutes` are typed when present and any other column is
+stored as is. With no catalog the bundled demo set in
+data/playlists_demo.jsonl is loaded.
+
+Rows are streamed in chunks and upserted by url with unordered
+bulk_write, so memory stays flat however big the catalog is and running
+the same catalog twice changes nothing. --dedupe removes duplicate urls
+left by the old seed script so the unique url index can be built.
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from mongo_setup import INDEXES, ensure_collection_indexes
+from observability import get_logger
+
+log = get_logger("ingest")
+
+DEMO_CATALOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "playlists_demo.jsonl")
+FLOAT_FIELDS = ("rating", "avg_video_minutes")
+INT_FIELDS = ("video_count",)
+TEXT_FIELDS = ("title", "url", "language", "creator")
+
+
+# ------------------ Reading ------------------
+def _open_text(path):
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    return "csv" if name.lower().endswith(".csv") else "jsonl"
+
+
+def read_catalog(path, fmt=None):
+    """Yield (line_number, row dict) one at a time; unparsable JSON lines yield (line_number, None)."""
+    fmt = fmt or detect_format(path)
+    with _open_text(path) as f:
+        if fmt == "csv":
+            for number, row in enumerate(csv.DictReader(f), start=2):
+                yield number, row
+            return
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+
+
+def normalize_playlist(row):
+    """Typed, trimmed copy of a catalog row. Raises ValueError when it can't be stored."""
+    if row is None:
+        raise ValueError("not a JSON object")
+    doc = {}
+    for key, value in row.items():
+        if key is None or key == "_id":
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+            if value == "":
+                continue
+        doc[key.strip()] = value
+    for field in TEXT_FIELDS:
+        if field in doc:
+            doc[field] = " ".join(str(doc[field]).split())
+    if not doc.get("url") or not doc.get("title"):
+        raise ValueError("url and title are required")
+    try:
+        for field in FLOAT_FIELDS:
+            if field in doc:
+                doc[field] = float(doc[field])
+        for field in INT_FIELDS:
+            if field in doc:
+                doc[field] = int(float(doc[field]))
+    except (TypeError, ValueError):
+        raise ValueError(f"bad number in {field}")
+    return doc
+
+
+def chunked(rows, size, stats):
+    """Group valid rows into {url: doc} chunks; the last row for a url within a chunk wins."""
+    chunk = {}
+    for number, row in rows:
+        stats["read"] += 1
+        try:
+            doc = normalize_playlist(row)
+        except ValueError as e:
+            stats["rejected"] += 1
+            if stats["rejected"] <= 10:
+                log.warning("Skipping row %d: %s", number, e)
+            continue
+        if doc["url"] in chunk:
+            stats["duplicates"] += 1
+        chunk[doc["url"]] = doc
+        if len(chunk) >= size:
+            yield chunk
+            chunk = {}
+    if chunk:
+        yield chunk
+
+
+# ------------------ Writing ------------------
+def upsert_chunk(collection, chunk, now):
+    """One unordered bulk_write of url upserts. Identical rows are matched but not modified."""
+    ops = [
+        UpdateOne({"url": url}, {"$set": doc, "$setOnInsert": {"created_at": now}}, upsert=True)
+        for url, doc in chunk.items()
+    ]
+    try:
+        result = collection.bulk_write(ops, ordered=False)
+        return {"inserted": result.upserted_count, "modified": result.modified_count,
+                "unchanged": result.matched_count - result.modified_count, "failed": 0}
+    except BulkWriteError as e:
+        details = e.details
+        errors = details.get("writeErrors", [])
+        if errors:
+            log.warning("%d of %d upserts failed: %s", len(errors), len(ops), errors[0].get("errmsg"))
+        return {"inserted": details.get("nUpserted", 0), "modified": details.get("nModified", 0),
+                "unchanged": details.get("nMatched", 0) - details.get("nModified", 0), "failed": len(errors)}
+
+
+def ingest(collection, rows, chunk_size=1000, dry_run=False, max_in_flight=2):
+    """
+    Stream rows into collection. Parsing the next chunk overlaps with the
+    previous chunk's bulk_write; at most max_in_flight chunks are held in
+    memory at once.
+    """
+    stats = {"read": 0, "rejected": 0, "duplicates": 0, "inserted": 0, "modified": 0, "unchanged": 0,
+             "failed": 0, "chunks": 0}
+    now = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    in_flight = []
+
+    def collect(future):
+        for key, value in future.result().items():
+            stats[key] += value
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-writer") as writer:
+        for chunk in chunked(rows, chunk_size, stats):
+            stats["chunks"] += 1
+            if dry_run:
+                continue
+            if len(in_flight) >= max_in_flight:
+                collect(in_flight.pop(0))
+            in_flight.append(writer.submit(upsert_chunk, collection, chunk, now))
+            if stats["chunks"] % 50 == 0:
+                log.info("%d rows read, %.0f rows/s", stats["read"], stats["read"] / (time.perf_counter() - started))
+        for future in in_flight:
+            collect(future)
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["rows_per_sec"] = round(stats["read"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+    return stats
+
+
+def dedupe_urls(collection):
+    """Delete all but the oldest document for each url. Returns how many were removed."""
+    removed = 0
+    pipeline = [
+        {"$group": {"_id": "$url", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    for group in collection.aggregate(pipeline, allowDiskUse=True):
+        extra = sorted(group["ids"])[1:]
+        removed += collection.delete_many({"_id": {"$in": extra}}).deleted_count
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("catalogs", nargs="*", help="JSONL/CSV files (.gz ok, - for stdin JSONL)")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default=None, help="override detection by extension")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--db", default="SkillSyncDB")
+    parser.add_argument("--collection", default="playlists")
+    parser.add_argument("--dedupe", action="store_true", help="remove duplicate urls before indexing")
+    parser.add_argument("--dry-run", action="store_true", help="parse and validate only")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable results")
+    args = parser.parse_args()
+    catalogs = args.catalogs or [DEMO_CATALOG]
+
+    helper = collection = None
+    if not args.dry_run:
+        from mongodb_helper import MongoDBHelper
+        helper = MongoDBHelper(buffered=False)
+        helper.select_db(args.db, args.collection)
+        collection = helper.collection
+        if args.dedupe:
+            log.info("Removed %d duplicate playlists", dedupe_urls(collection))
+        # The playlists spec, whatever --collection is called: url_unique is what makes reruns idempotent.
+        ensure_collection_indexes(collection, INDEXES["playlists"])
+        if "url_unique" not in collection.index_information():
+            log.warning("No unique index on url (duplicates already stored?); rerun with --dedupe")
+
+    report = {}
+    for path in catalogs:
+        report[path] = ingest(collection, read_catalog(path, args.format), args.chunk_size, args.dry_run)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for path, s in report.items():
+            print(f"{path}: {s['read']} rows in {s['seconds']}s ({s['rows_per_sec']} rows/s), "
+                  f"{s['inserted']} new, {s['modified']} updated, {s['unchanged']} unchanged, "
+                  f"{s['rejected']} rejected, {s['duplicates']} duplicate, {s['failed']} failed")
+    if helper is not None:
+        helper.close()
+    if any(s["failed"] for s in report.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+from observability import get_logger
+
+log = get_logger("jobs")
+
+ACTIVE_STATES = ("queued", "running")
+TERMINAL_STATES = ("succeeded", "failed")
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when the local worker pool already has max_queue jobs waiting."""
+
+
+class JobManager:
+    """
+    Background job runner for slow LLM work.
+    Jobs run on a bounded in-process thread pool (no external broker needed),
+    while their state lives in a Mongo collection so any gunicorn worker can
+    answer polling and SSE requests for them.
+    """
+
+    def __init__(self, collection, max_workers=4, max_queue=32, stale_after_seconds=600):
+        self.collection = collection
+        self.max_queue = max_queue
+        self.stale_after = timedelta(seconds=stale_after_seconds)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="skillsync-job")
+        self._handlers = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._indexed = False
+        self._index_lock = threading.Lock()
+
+    def ensure_indexes(self):
+        """One active job per dedup key and quick lookups by owner. Returns False if creation failed."""
+        with self._index_lock:
+            if self._indexed:
+                return True
+            try:
+                self.collection.create_index(
+                    "dedup_key", unique=True, partialFilterExpression={"active": True}
+                )
+                self.collection.create_index([("owner", 1), ("created_at", -1)])
+                self.collection.create_index("finished_at", expireAfterSeconds=7 * 24 * 3600)
+                self._indexed = True
+            except Exception as e:
+                log.warning("Index creation failed: %s", e)
+            return self._indexed
+
+    def register(self, kind, handler):
+        """handler(params, report) -> JSON-serialisable result. report(progress, message) updates the job."""
+        self._handlers[kind] = handler
+
+    # ------------------ Submission ------------------
+    def submit(self, kind, owner, params, dedup_scope=""):
+        """Queue a job. Returns (job_doc, created); an in-flight job with the same
+        (owner, kind, dedup_scope) is reused instead of starting a second one."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = datetime.now(timezone.utc)
+        job = {
+            "_id": uuid.uuid4().hex,
+            "kind": kind,
+            "owner": owner,
+            "params": params,
+            "status": "queued",
+            "progress": 0,
+            "message": "Queued",
+            "result": None,
+            "error": None,
+            "active": True,
+            "dedup_key": f"{owner}:{kind}:{dedup_scope}",
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None,
+        }
+        # Dedup relies on the unique dedup_key index, so make sure it exists before the
+        # first insert rather than waiting for the background index bootstrap.
+        if not self.ensure_indexes():
+            existing = self.collection.find_one({"dedup_key": job["dedup_key"], "active": True})
+            if existing and not self._is_stale(existing):
+                return existing, False
+        for _ in range(2):
+            try:
+                self.collection.insert_one(job)
+                break
+            except DuplicateKeyError:
+                existing = self.collection.find_one({"dedup_key": job["dedup_key"], "active": True})
+                if existing and not self._is_stale(existing):
+                    return existing, False
+                if existing:
+                    self._finish(existing["_id"], "failed", error="Job abandoned by its worker.")
+        else:
+            raise RuntimeError("Could not register job.")
+
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self._finish(job["_id"], "failed", error="Job queue is full, try again shortly.")
+                raise JobQueueFull("Job queue is full, try again shortly.")
+            self._pending += 1
+        self._executor.submit(self._run, job["_id"], kind, params)
+        return job, True
+
+    def _is_stale(self, job):
+        updated = job.get("updated_at")
+        if updated is None:
+            return False
+        if updated.tzinfo is None:
+            updated = updated.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) - updated > self.stale_after
+
+    # ------------------ Execution ------------------
+    def _run(self, job_id, kind, params):
+        def report(progress, message=None):
+            update = {"progress": int(progress), "updated_at": datetime.now(timezone.utc)}
+            if message:
+                update["message"] = message
+            self.collection.update_one({"_id": job_id}, {"$set": update})
+
+        try:
+            self.collection.update_one(
+                {"_id": job_id},
+                {"$set": {"status": "running", "message": "Running", "updated_at": datetime.now(timezone.utc)}},
+            )
+            result = self._handlers[kind](params, report)
+            self._finish(job_id, "succeeded", result=result)
+        except Exception as e:
+            log.exception("%s job %s failed: %s", kind, job_id, e)
+            self._finish(job_id, "failed", error=str(e))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _finish(self, job_id, status, result=None, error=None):
+        now = datetime.now(timezone.utc)
+        update = {
+            "status": status,
+            "message": "Done" if status == "succeeded" else "Failed",
+            "result": result,
+            "error": error,
+            "active": False,
+            "updated_at": now,
+            "finished_at": now,
+        }
+        if status == "succeeded":
+            update["progress"] = 100
+        self.collection.update_one({"_id": job_id}, {"$set": update, "$unset": {"dedup_key": ""}})
+
+    # ------------------ Reads ------------------
+    def get(self, job_id, owner=None):
+        query = {"_id": job_id}
+        if owner is not None:
+            query["owner"] = owner
+        return self.collection.find_one(query, {"params": 0, "dedup_key": 0})
+
+    def stream(self, job_id, owner, poll_interval=0.5, timeout=300):
+        """Yield server-sent events whenever the job's status or progress changes."""
+        last = None
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = self.get(job_id, owner)
+            if job is None:
+                yield sse_event("error", {"error": "Job not found"})
+                return
+            view = public_view(job)
+            marker = (view["status"], view["progress"], view["message"])
+            if marker != last:
+                last = marker
+                yield sse_event(view["status"], view)
+            if view["status"] in TERMINAL_STATES:
+                return
+            time.sleep(poll_interval)
+        yield sse_event("timeout", {"id": job_id})
+
+    def stats(self):
+        with self._lock:
+            return {"pending": self._pending, "max_queue": self.max_queue}
+
+
+def public_view(job):
+    """Job fields safe to return to the owning user."""
+    return {
+        "id": job["_id"],
+        "kind": job.get("kind"),
+        "status": job.get("status"),
+        "progress": job.get("progress"),
+        "message": job.get("message"),
+        "result": job.get("result"),
+        "error": job.get("error"),
+    }
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
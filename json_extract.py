@@ -0,0 +1,174 @@
+import json
+import re
+from collections import deque
+
+_OPENERS = {"{": "}", "[": "]"}
+# Only these characters change scanner state; everything else is skipped in C.
+_STRUCTURAL = re.compile(r'[{}\[\]",\\]')
+# A complete string literal (kept as-is) or a comma followed by a closing bracket.
+# The string pattern is the unrolled `"[^"\\]*(?:\\.[^"\\]*)*"` form: it consumes runs of plain
+# characters in one step and can't backtrack badly.
+_TRAILING_COMMA = re.compile(r'("[^"\\]*(?:\\.[^"\\]*)*")|,\s*(?=[}\]])')
+_decoder = json.JSONDecoder()
+# How many cut points to try when closing a truncated document.
+_MAX_REPAIR_ATTEMPTS = 8
+
+
+def strip_code_fences(text):
+    """Drop a leading ```/```json line and a trailing ``` if present."""
+    text = text.strip()
+    if text.startswith("```"):
+        newline = text.find("\n")
+        text = text[newline + 1:] if newline != -1 else text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+
+def strip_trailing_commas(text):
+    """Remove commas that directly precede a closing bracket, outside of strings."""
+    return _TRAILING_COMMA.sub(r"\1", text)  # an unmatched group expands to "", dropping the comma
+
+
+def _loads(candidate, repair):
+    try:
+        return json.loads(candidate)
+    except (ValueError, RecursionError):
+        pass
+    if repair:
+        try:
+            return json.loads(strip_trailing_commas(candidate))
+        except (ValueError, RecursionError):
+            pass
+    return None
+
+
+def _close_truncated(text, start, cut_points, stack):
+    """
+    Try to close a document that ended mid-way, dropping the incomplete tail.
+    Every cut point is a prefix of the final open stack, so one closer string
+    built from it serves all of them: a cut at depth d takes its last d closers.
+    """
+    closers = "".join(_OPENERS[c] for c in reversed(stack))
+    for cut, depth in reversed(cut_points):
+        head = text[start:cut].rstrip().rstrip(",")
+        parsed = _loads(head + closers[len(closers) - depth:], repair=True)
+        if parsed is not None:
+            return parsed
+    return None
+
+
+def scan_candidates(text):
+    """
+    Single left-to-right pass that yields (start, end, None) for each
+    balanced top-level object/array, respecting strings and escapes. If the
+    text ends inside a value, yields (start, None, (cut_points, stack)) for
+    repair, where cut_points are (offset, depth) pairs and stack is the
+    list of still-open brackets.
+    """
+    stack = []
+    in_string = False
+    escaped_at = -1
+    start = None
+    # Cut points deeper than the current stack are dropped when it shrinks, so
+    # the survivors always describe a prefix of `stack`.
+    cut_points = deque(maxlen=_MAX_REPAIR_ATTEMPTS)
+    for m in _STRUCTURAL.finditer(text):
+        i = m.start()
+        ch = text[i]
+        if in_string:
+            if i == escaped_at:
+                continue
+            if ch == "\\":
+                escaped_at = i + 1
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            if stack:
+                in_string = True
+            continue
+        if ch in _OPENERS:
+            if not stack:
+                start = i
+                cut_points.clear()
+            stack.append(ch)
+            cut_points.append((i + 1, len(stack)))
+        elif ch in "}]":
+            if not stack:
+                continue
+            if _OPENERS[stack[-1]] != ch:
+                # Mismatched bracket: abandon this candidate and rescan after it.
+                stack.clear()
+                continue
+            stack.pop()
+            depth = len(stack)
+            while cut_points and cut_points[-1][1] > depth:
+                cut_points.pop()
+            if not depth:
+                yield start, i + 1, None
+            else:
+                cut_points.append((i + 1, depth))
+        elif ch == "," and stack:
+            cut_points.append((i, len(stack)))
+    if stack:
+        yield start, None, (cut_points, stack)
+
+
+def extract_json(text, repair=True):
+    """
+    Parse JSON out of an LLM response in linear time.
+    Tries the whole string first, then code-fence stripping, then the
+    longest balanced top-level object/array found in the text. With
+    repair=True, trailing commas are dropped and truncated documents are
+    closed. Returns None when nothing usable is found.
+    """
+    if text is None:
+        return None
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError, RecursionError):
+        pass
+    text = strip_code_fences(str(text))
+    try:
+        return json.loads(text)
+    except (ValueError, RecursionError):
+        pass
+
+    # Common case: one document wrapped in prose. Decode it in C from the first
+    # bracket and accept it if it's an object or nothing else could follow.
+    first = min((i for i in (text.find("{"), text.find("[")) if i != -1), default=-1)
+    if first == -1:
+        return None
+    try:
+        parsed, end = _decoder.raw_decode(text, first)
+        if isinstance(parsed, dict) or not _STRUCTURAL.search(text, end):
+            return parsed
+    except RecursionError:
+        # Nested deeper than the json module can decode; no candidate inside it could be parsed either.
+        return None
+    except ValueError:
+        pass
+    if repair:
+        # Still C speed: the usual damage is a trailing comma in an otherwise whole document,
+        # so try that before the Python-level scan below.
+        tail = strip_trailing_commas(text[first:])
+        try:
+            parsed, end = _decoder.raw_decode(tail)
+            if isinstance(parsed, dict) or not _STRUCTURAL.search(tail, end):
+                return parsed
+        except (ValueError, RecursionError):
+            pass
+
+    best, best_len = None, -1
+    for start, end, open_state in scan_candidates(text):
+        if end is None:
+            if repair and best is None:
+                best = _close_truncated(text, start, *open_state)
+            continue
+        if end - start <= best_len:
+            continue
+        parsed = _loads(text[start:end], repair)
+        if parsed is not None:
+            best, best_len = parsed, end - start
+    return best
@@ -0,0 +1,194 @@
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+
+from observability import get_logger
+
+log = get_logger("knowledge_index")
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or that the this to with you your "
+    "will who what how".split()
+)
+# Fields that are searched; title is repeated so a title hit outweighs a body hit.
+TEXT_FIELDS = ("title", "title", "skills", "text")
+
+
+def tokenize(text):
+    tokens = []
+    for tok in _TOKEN.findall(str(text).lower()):
+        tok = tok.rstrip(".")
+        if tok and tok not in STOPWORDS:
+            tokens.append(tok)
+    return tokens
+
+
+def document_text(doc):
+    parts = []
+    for field in TEXT_FIELDS:
+        value = doc.get(field)
+        if isinstance(value, (list, tuple)):
+            parts.append(" ".join(map(str, value)))
+        elif value:
+            parts.append(str(value))
+    return " ".join(parts)
+
+
+class KnowledgeIndex:
+    """
+    In-memory BM25 inverted index over job descriptions and skill notes.
+    Documents can be added at any time; re-adding an id replaces it.
+    Query results are cached until the next ingest.
+    """
+
+    def __init__(self, k1=1.5, b=0.75, cache_size=512):
+        self.k1 = k1
+        self.b = b
+        self.cache_size = cache_size
+        self._postings = defaultdict(dict)  # term -> {doc_id: term frequency}
+        self._doc_len = {}
+        self._docs = {}
+        self._total_len = 0
+        self._cache = OrderedDict()
+        self._weights = {}  # term -> {doc_id: BM25 contribution}, dropped on every ingest
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    # ------------------ Ingestion ------------------
+    def _remove(self, doc_id):
+        for term in set(tokenize(document_text(self._docs[doc_id]))):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_len -= self._doc_len.pop(doc_id)
+        del self._docs[doc_id]
+
+    def add(self, doc):
+        """Index one document. It needs an 'id' plus any of title/skills/text."""
+        doc_id = str(doc["id"])
+        counts = Counter(tokenize(document_text(doc)))
+        with self._lock:
+            if doc_id in self._docs:
+                self._remove(doc_id)
+            for term, tf in counts.items():
+                self._postings[term][doc_id] = tf
+            length = sum(counts.values())
+            self._doc_len[doc_id] = length
+            self._total_len += length
+            self._docs[doc_id] = doc
+            self._weights.clear()
+            self._cache.clear()
+
+    def add_many(self, docs):
+        count = 0
+        for doc in docs:
+            self.add(doc)
+            count += 1
+        return count
+
+    def load_jsonl(self, path):
+        with open(path, encoding="utf-8") as f:
+            return self.add_many(json.loads(line) for line in f if line.strip())
+
+    # ------------------ Query ------------------
+    def _term_weights(self, term):
+        """Per-document BM25 score for one term, computed lazily and reused until the next ingest."""
+        weights = self._weights.get(term)
+        if weights is None:
+            postings = self._postings.get(term, {})
+            n = len(self._docs)
+            avgdl = self._total_len / n
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            k1, b, doc_len = self.k1, self.b, self._doc_len
+            weights = {
+                doc_id: idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * doc_len[doc_id] / avgdl))
+                for doc_id, tf in postings.items()
+            }
+            self._weights[term] = weights
+        return weights
+
+    def search(self, query, k=5):
+        """Top-k documents for `query` as (score, doc) pairs, best first."""
+        terms = tokenize(query)
+        key = (" ".join(sorted(set(terms))), k)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+            if not self._docs or not terms:
+                return []
+            # Copy the longest posting list in C, then fold the shorter ones into it.
+            lists = sorted((self._term_weights(t) for t in set(terms)), key=len, reverse=True)
+            scores = dict(lists[0])
+            get = scores.get
+            for weights in lists[1:]:
+                for doc_id, w in weights.items():
+                    scores[doc_id] = get(doc_id, 0.0) + w
+            top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            results = [(round(score, 4), self._docs[doc_id]) for doc_id, score in top]
+
+            self._cache[key] = results
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": len(self._docs),
+                "terms": len(self._postings),
+                "cache_entries": len(self._cache),
+                "cache_hits": self.hits,
+                "cache_misses": self.misses,
+            }
+
+
+def format_results(query, results):
+    """Plain-text answer for an agent: one short block per hit."""
+    if not results:
+        return f"No local market data found for '{query}'."
+    lines = [f"Top matches for '{query}':"]
+    for score, doc in results:
+        lines.append(f"- {doc.get('title', doc['id'])} (score {score})")
+        if doc.get("skills"):
+            lines.append(f"  Skills: {', '.join(doc['skills'])}")
+        if doc.get("text"):
+            lines.append(f"  {doc['text']}")
+    return "\n".join(lines)
+
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "knowledge_corpus.jsonl")
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_knowledge_index():
+    """Process-wide index, loaded from KNOWLEDGE_CORPUS (a JSONL file) on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = KnowledgeIndex(cache_size=int(os.getenv("KNOWLEDGE_CACHE_SIZE", "512")))
+                path = os.getenv("KNOWLEDGE_CORPUS", DEFAULT_CORPUS)
+                try:
+                    log.info("Loaded %d documents from %s", index.load_jsonl(path), path)
+                except OSError as e:
+                    log.warning("Corpus not loaded: %s", e)
+                _index = index
+    return _index
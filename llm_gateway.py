@@ -0,0 +1,448 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Future
+
+from observability import (
+    LLM_COALESCED, LLM_DURATION, LLM_ERRORS, LLM_IN_FLIGHT, LLM_QUEUED, LLM_RETRIES, LLM_TOKENS,
+    end_span, get_logger, span, start_span,
+)
+
+log = get_logger("llm")
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class LLMBusyError(RuntimeError):
+    """Raised when a call waited longer than the queue timeout for a slot."""
+
+
+class StreamCancelled(Exception):
+    """Recorded as the outcome of a stream the caller closed before it finished (e.g. a client disconnect)."""
+
+
+class ChatStream:
+    """
+    An open streaming completion. Iterate it for chunks; the gateway slot,
+    token reservation, metrics and span are settled exactly once, when the
+    stream is exhausted, fails, or is closed (also as a context manager or
+    when it is garbage collected unfinished), and closing it closes the
+    upstream SDK stream too.
+    """
+
+    def __init__(self, stream, on_close):
+        self._stream = stream
+        self._chunks = iter(stream)
+        self._on_close = on_close
+        self._closed = False
+        self.usage = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._finish(None)
+            raise
+        except BaseException as e:
+            self._finish(e)
+            raise
+        if getattr(chunk, "usage", None) is not None:
+            self.usage = chunk
+        return chunk
+
+    def close(self):
+        self._finish(StreamCancelled("stream closed before it finished"))
+
+    def _finish(self, error):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            close = getattr(self._stream, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self._on_close(self.usage, error)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        if not getattr(self, "_closed", True):
+            self.close()
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, timeout, amount=1):
+        amount = min(amount, self.capacity)  # a request bigger than the bucket waits for a full one
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return True
+                wait = (amount - self.tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def charge(self, amount):
+        """Take (or, when negative, give back) tokens without waiting; the bucket may go into debt."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+    def available(self):
+        with self._lock:
+            self._refill()
+            return self.tokens
+
+
+class RouteMetrics:
+    def __init__(self, window=512):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.coalesced = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies = deque(maxlen=window)
+
+    def snapshot(self):
+        ordered = sorted(self.latencies)
+
+        def pct(p):
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 4)
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "latency_p50": pct(0.50),
+            "latency_p95": pct(0.95),
+            "latency_p99": pct(0.99),
+        }
+
+
+def estimate_tokens(request):
+    """Upper bound on what a request can spend: ~4 characters per prompt token plus the completion limit."""
+    chars = sum(len(str(m.get("content") or "")) for m in request.get("messages", []))
+    return chars // 4 + int(request.get("max_tokens") or 1024)
+
+
+def total_tokens(response):
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    total = getattr(usage, "total_tokens", None)
+    if total is None:
+        total = (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0)
+    return total
+
+
+def is_retryable(error):
+    import openai  # deferred with the SDK itself; a dict lookup once loaded
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status in RETRYABLE_STATUS or (status is not None and status >= 500)
+
+
+def retry_after_seconds(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMGateway:
+    """
+    The single path from this process to the OpenAI API.
+    Every call takes a rate-limiter token and a concurrency slot, gets a
+    per-call timeout, and is retried with jittered exponential backoff on
+    429/5xx/connection errors. Identical non-streaming requests that are
+    already in flight share one upstream call.
+
+    With tokens_per_minute set, each call also reserves its estimated
+    token cost (prompt size plus max_tokens) from a per-minute budget
+    before it is sent, and the reservation is settled against the
+    response's usage.total_tokens once it finishes.
+    """
+
+    def __init__(self, client_factory, max_concurrency=8, rate_per_minute=120, burst=None,
+                 timeout=60.0, max_retries=4, base_delay=0.5, max_delay=20.0, queue_timeout=30.0,
+                 tokens_per_minute=0):
+        self._client_factory = client_factory
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._bucket = TokenBucket(rate_per_minute / 60.0, burst or max(1, max_concurrency))
+        self.tokens_per_minute = tokens_per_minute
+        self._token_budget = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.queue_timeout = queue_timeout
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._active = 0
+        self._routes = defaultdict(RouteMetrics)
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    # ------------------ Admission ------------------
+    def _admit(self):
+        with self._lock:
+            self._waiting += 1
+        LLM_QUEUED.inc()
+        try:
+            deadline = time.monotonic() + self.queue_timeout
+            if not self._bucket.acquire(self.queue_timeout):
+                raise LLMBusyError("LLM rate limit queue timed out.")
+            if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                raise LLMBusyError("No LLM slot available, try again shortly.")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+            LLM_QUEUED.dec()
+        with self._lock:
+            self._active += 1
+        LLM_IN_FLIGHT.inc()
+
+    def _reserve_tokens(self, estimate):
+        if self._token_budget is not None and not self._token_budget.acquire(self.queue_timeout, estimate):
+            raise LLMBusyError("LLM token budget exhausted, try again shortly.")
+
+    def _settle_tokens(self, estimate, response=None):
+        """Swap a reservation for what the call actually used; a failed or usage-less call keeps the estimate."""
+        if self._token_budget is None:
+            return
+        used = total_tokens(response)
+        if used is not None:
+            self._token_budget.charge(used - min(estimate, self._token_budget.capacity))
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+        LLM_IN_FLIGHT.dec()
+        self._slots.release()
+
+    def _backoff(self, attempt, error):
+        hinted = retry_after_seconds(error)
+        if hinted is not None:
+            return min(self.max_delay, hinted)
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, ceiling)  # full jitter
+
+    def _record(self, route, started, response=None, error=None):
+        elapsed = time.monotonic() - started
+        usage = getattr(response, "usage", None)
+        prompt_tokens = (getattr(usage, "prompt_tokens", 0) or 0) if usage is not None else 0
+        completion_tokens = (getattr(usage, "completion_tokens", 0) or 0) if usage is not None else 0
+        with self._lock:
+            m = self._routes[route]
+            m.calls += 1
+            m.latencies.append(elapsed)
+            if error is not None:
+                m.errors += 1
+            m.prompt_tokens += prompt_tokens
+            m.completion_tokens += completion_tokens
+        LLM_DURATION.observe(elapsed, route=route, outcome="error" if error is not None else "ok")
+        if error is not None:
+            LLM_ERRORS.inc(route=route, error=type(error).__name__)
+            log.warning("%s failed after %.2fs: %s", route, elapsed, error)
+        if usage is not None:
+            LLM_TOKENS.inc(prompt_tokens, route=route, kind="prompt")
+            LLM_TOKENS.inc(completion_tokens, route=route, kind="completion")
+        log.debug("%s finished in %.2fs (%d prompt / %d completion tokens)",
+                  route, elapsed, prompt_tokens, completion_tokens)
+
+    def _call_with_retries(self, route, request):
+        attempt = 0
+        while True:
+            self._admit()
+            try:
+                return self.client.chat.completions.create(timeout=self.timeout, **request)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = self._backoff(attempt, e)
+                log.info("%s retry %d in %.2fs: %s", route, attempt + 1, delay, e)
+                with self._lock:
+                    self._routes[route].retries += 1
+                LLM_RETRIES.inc(route=route)
+            finally:
+                self._release()
+            time.sleep(delay)
+            attempt += 1
+
+    # ------------------ Public API ------------------
+    def chat(self, route, messages, model, coalesce=True, **params):
+        """Blocking chat completion. Returns the SDK response object."""
+        request = dict(params, model=model, messages=messages)
+        key = hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        leader = True
+        if coalesce:
+            with self._lock:
+                future = self._inflight.get(key)
+                if future is None:
+                    future = Future()
+                    self._inflight[key] = future
+                else:
+                    leader = False
+                    self._routes[route].coalesced += 1
+            if not leader:
+                LLM_COALESCED.inc(route=route)
+                return future.result(timeout=self.timeout * (self.max_retries + 1) + self.queue_timeout)
+
+        started = time.monotonic()
+        estimate = estimate_tokens(request)
+        try:
+            with span("llm.chat", {"llm.route": route, "llm.model": model}):
+                self._reserve_tokens(estimate)
+                response = self._call_with_retries(route, request)
+        except Exception as e:
+            self._record(route, started, error=e)
+            if coalesce:
+                future.set_exception(e)
+            raise
+        finally:
+            if coalesce:
+                with self._lock:
+                    self._inflight.pop(key, None)
+        self._settle_tokens(estimate, response)
+        self._record(route, started, response=response)
+        if coalesce:
+            future.set_result(response)
+        return response
+
+    def stream_chat(self, route, messages, model, **params):
+        """
+        Streaming chat completion. Admission, the token reservation and
+        retries happen here, before returning, so a busy gateway raises
+        LLMBusyError at call time; the returned ChatStream holds the
+        concurrency slot until it is exhausted or closed.
+        """
+        request = dict(params, model=model, messages=messages, stream=True)
+        request.setdefault("stream_options", {"include_usage": True})
+        started = time.monotonic()
+        estimate = estimate_tokens(request)
+        trace_span = start_span("llm.stream_chat", {"llm.route": route, "llm.model": model})
+        try:
+            self._reserve_tokens(estimate)
+            attempt = 0
+            while True:
+                self._admit()
+                try:
+                    stream = self.client.chat.completions.create(timeout=self.timeout, **request)
+                    break
+                except Exception as e:
+                    self._release()
+                    if attempt >= self.max_retries or not is_retryable(e):
+                        raise
+                    with self._lock:
+                        self._routes[route].retries += 1
+                    LLM_RETRIES.inc(route=route)
+                    time.sleep(self._backoff(attempt, e))
+                    attempt += 1
+        except BaseException as e:
+            # Busy, not retryable or the caller gave up: the stream never opened.
+            self._record(route, started, error=e)
+            end_span(trace_span, e)
+            raise
+
+        def settle(usage, error):
+            try:
+                self._release()
+                self._settle_tokens(estimate, usage)
+                self._record(route, started, response=usage, error=error)
+            finally:
+                end_span(trace_span, error)
+
+        return ChatStream(stream, settle)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "queue_depth": self._waiting,
+                "in_flight": self._active,
+                "max_concurrency": self.max_concurrency,
+                "coalescing": len(self._inflight),
+                "tokens_per_minute": self.tokens_per_minute,
+                "tokens_available": int(self._token_budget.available()) if self._token_budget else None,
+                "routes": {route: m.snapshot() for route, m in self._routes.items()},
+            }
+
+
+def _openai_client():
+    # Imported on first use: the SDK and its type tree take ~0.7s to load,
+    # which every worker would otherwise pay before serving its first request.
+    from openai import OpenAI
+    # The gateway owns retries, so the SDK's own retry loop is disabled.
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """Process-wide gateway configured from LLM_* environment variables."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway(
+                    _openai_client,
+                    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+                    rate_per_minute=float(os.getenv("LLM_RATE_PER_MINUTE", "120")),
+                    timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+                    max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+                    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "30")),
+                    tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000")),
+                )
+    return _gateway
@@ -1,7 +1,16 @@
 import json
 import os
-from crewai import Agent, Task, Crew, Process 
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from crewai import Agent, Task, Crew, Process, BaseLLM
 from custom_tool import WebSearchTool, RoadmapGeneratorTool, PlaylistPlannerTool 
+from llm_gateway import get_gateway
+from observability import get_logger
+
+log = get_logger("crew")
 
 # --- Defensive Verbose Setting (To fix previous Pydantic error) ---
 def get_safe_verbose(default_level=1):
@@ -16,6 +25,34 @@ def get_safe_verbose(default_level=1):
 
 SAFE_VERBOSE_LEVEL = get_safe_verbose(1)
 
+# --- LLM Adapter: route every agent call through the shared gateway ---
+class GatewayLLM(BaseLLM):
+    """crewAI LLM that sends completions through llm_gateway (rate limit, retries, metrics)."""
+
+    def __init__(self, route: str, model: str = None, temperature: float = None, stop: list = None):
+        super().__init__(model=model or os.getenv("OPENAI_MODEL", "gpt-4o-mini"), temperature=temperature, stop=stop)
+        self.route = route
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        params = {}
+        if self.temperature is not None:
+            params["temperature"] = self.temperature
+        if getattr(self, "stop", None):
+            params["stop"] = self.stop
+        resp = get_gateway().chat(self.route, messages, model=self.model, **params)
+        return resp.choices[0].message.content
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return True
+
+    def get_context_window_size(self) -> int:
+        return 128000
+
 # --- Global Agent/Tool Instantiation ---
 web_search_tool = WebSearchTool()
 roadmap_tool = RoadmapGeneratorTool()
@@ -29,6 +66,7 @@ class SkillSyncCrew:
             goal="Guide users in exploring career paths, clarifying their goals, and suggesting roles. Always use the Web Search Tool for current market requirements (like Matplotlib/Python versions).",
             backstory="You are an experienced global career coach with insights across tech and non-tech fields.",
             tools=[web_search_tool, roadmap_tool],
+            llm=GatewayLLM("crew.career_guide"),
             verbose=True 
         )
 
@@ -37,6 +75,7 @@ class SkillSyncCrew:
             goal="Create personalized learning roadmaps, recommend resources, generate daily plans, and adapt plans to user time constraints.",
             backstory="You are a passionate educator who simplifies complex concepts into achievable steps.",
             tools=[roadmap_tool, playlist_planner_tool],
+            llm=GatewayLLM("crew.learning_coach"),
             verbose=True
         )
 
@@ -45,41 +84,181 @@ class SkillSyncCrew:
             goal="Help users become job-ready by highlighting missing skills, recommending opportunities, and prep for interviews.",
             backstory="You are a recruiter with deep knowledge of hiring across industries.",
             tools=[web_search_tool], 
+            llm=GatewayLLM("crew.job_advisor"),
             verbose=True
         )
 
 
-    # -------- Workflow 1: Full Roadmap Orchestration (Sequential) --------
+    # -------- Execution Engine --------
+    def run_phases(self, phases, inputs):
+        """
+        Run a small dependency graph of tasks.
+        Each phase is a dict: name, agent (attribute name), description,
+        expected_output and optional depends_on. A phase starts as soon as
+        its own dependencies finish, so independent phases run concurrently,
+        each as a one-task Crew; upstream outputs are appended to the
+        dependent task's description.
+        Returns outputs and per-phase wall-clock timings.
+        """
+        results, timings = {}, {}
+        pending = {p["name"]: p for p in phases}
+        started = time.perf_counter()
+
+        def run_one(phase):
+            t0 = time.perf_counter()
+            description = phase["description"].format(**inputs)
+            for dep in phase.get("depends_on", ()):
+                description += f"\n\nContext from {dep}:\n{results[dep]}"
+            agent = getattr(self, phase["agent"])
+            task = Task(description=description, expected_output=phase["expected_output"], agent=agent)
+            crew = Crew(agents=[agent], tasks=[task], process=Process.sequential, verbose=SAFE_VERBOSE_LEVEL)
+            output = crew.kickoff()
+            return phase["name"], str(output), time.perf_counter() - t0
+
+        with ThreadPoolExecutor(max_workers=len(phases)) as pool:
+            running = {}
+            while pending or running:
+                for phase in [p for p in pending.values() if all(d in results for d in p.get("depends_on", ()))]:
+                    running[pool.submit(run_one, phase)] = phase["name"]
+                    pending.pop(phase["name"])
+                if not running:
+                    raise RuntimeError(f"Unresolvable task dependencies: {sorted(pending)}")
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+                    name, output, elapsed = future.result()
+                    results[name] = output
+                    timings[name] = round(elapsed, 3)
+
+        timings["total"] = round(time.perf_counter() - started, 3)
+        log.info("Phase timings (s): %s", timings)
+        return {"results": results, "timings": timings}
+
+    # -------- Workflow 1: Full Roadmap Orchestration --------
     def orchestrate(self, goal: str, skills: list, hours: int, duration: int, weekends: bool = True):
-        user_input = f"Goal: {goal}, Current Skills: {skills}, Available Daily Hours: {hours}, Duration: {duration} months."
-
-        # 1. ANALYSIS TASK DEFINED FIRST (Fixes the NameError)
-        analysis_task = Task(
-            description=f"""
-                Analyze the user's profile based on this input: {user_input}. Identify the top 5 missing skills required for {goal} based on current job market standards. Provide a short, motivating message. Use the Web Search Tool for current market validation (e.g., check required Python libraries like Matplotlib).
-            """,
-            expected_output="A JSON object containing analysis (paths, missing_skills, motivation) and initial roadmap ideas.",
-            agent=self.career_guide
-        )
+        """Career analysis and job-readiness run in parallel; the roadmap waits only on the analysis."""
+        inputs = {"goal": goal, "skills": skills, "hours": hours, "duration": duration,
+                  "weekends": "including weekends" if weekends else "weekdays only"}
+        run = self.run_phases([ANALYSIS_PHASE, JOB_READINESS_PHASE, ROADMAP_PHASE], inputs)
+        return {"result": run["results"]["roadmap"], **run}
 
-        # 2. ROADMAP TASK DEFINED SECOND (Uses the defined analysis_task)
-        roadmap_task = Task(
-            description=f"""
-                Based on the analysis and the user's constraints, generate the detailed learning roadmap. The roadmap must include 3-5 milestones, weekly goals, and at least 2 specific project ideas. Use the Roadmap Generator Tool to structure the output.
-            """,
-            expected_output="A structured JSON object detailing the milestones, weekly_goals, and project ideas.",
-            agent=self.learning_coach,
-            context=[analysis_task] # analysis_task is guaranteed to be defined here
-        )
+    # -------- Workflow 2: Daily Plan --------
+    def run_daily_plan(self, goal: str, week_title: str, hours: int, weekends: bool = True):
+        inputs = {"goal": goal, "week_title": week_title, "hours": hours,
+                  "weekends": "including weekends" if weekends else "weekdays only"}
+        run = self.run_phases([DAILY_PLAN_PHASE], inputs)
+        return {"result": run["results"]["daily_plan"], **run}
 
-        roadmap_crew = Crew(
-            agents=[self.career_guide, self.learning_coach],
-            tasks=[analysis_task, roadmap_task],
-            process=Process.sequential,
-            verbose=SAFE_VERBOSE_LEVEL
-        )
+    # -------- Workflow 3: Playlist Plan --------
+    def run_playlist_plan(self, playlists: list, hours: int, weekends: bool = True):
+        inputs = {"playlists": json.dumps(playlists), "hours": hours,
+                  "weekends": "including weekends" if weekends else "weekdays only"}
+        run = self.run_phases([PLAYLIST_PHASE], inputs)
+        return {"result": run["results"]["playlist_plan"], **run}
+
+    # -------- Workflow 4: Job Readiness --------
+    def run_job_readiness(self, goal: str, skills: list):
+        run = self.run_phases([JOB_READINESS_PHASE], {"goal": goal, "skills": skills})
+        return {"result": run["results"]["job_readiness"], **run}
+
+
+# --- Phase Definitions ---
+ANALYSIS_PHASE = {
+    "name": "analysis",
+    "agent": "career_guide",
+    "description": (
+        "Analyze the user's profile: Goal: {goal}, Current Skills: {skills}, Available Daily Hours: {hours}, "
+        "Duration: {duration} months. Identify the top 5 missing skills required for {goal} based on current job "
+        "market standards. Provide a short, motivating message. Use the Web Search Tool for current market validation."
+    ),
+    "expected_output": "A JSON object containing analysis (paths, missing_skills, motivation) and initial roadmap ideas.",
+}
+
+JOB_READINESS_PHASE = {
+    "name": "job_readiness",
+    "agent": "job_advisor",
+    "description": (
+        "Assess job readiness for the goal {goal} given current skills {skills}. Suggest matching job titles, "
+        "list missing skills, and give interview and portfolio preparation tips. Use the Web Search Tool for current openings."
+    ),
+    "expected_output": "A JSON object with job_titles, missing_skills, interview_tips and portfolio_tips.",
+}
+
+ROADMAP_PHASE = {
+    "name": "roadmap",
+    "agent": "learning_coach",
+    "depends_on": ("analysis",),
+    "description": (
+        "Based on the analysis and the user's constraints ({hours} hours/day for {duration} months, {weekends}), "
+        "generate the detailed learning roadmap for {goal}. The roadmap must include 3-5 milestones, weekly goals, "
+        "and at least 2 specific project ideas. Use the Roadmap Generator Tool to structure the output."
+    ),
+    "expected_output": "A structured JSON object detailing the milestones, weekly_goals, and project ideas.",
+}
+
+DAILY_PLAN_PHASE = {
+    "name": "daily_plan",
+    "agent": "learning_coach",
+    "description": (
+        "For the goal {goal}, break the roadmap week '{week_title}' into a day-by-day plan that fits {hours} hours "
+        "per day, {weekends}. Each day needs 2-4 concrete tasks."
+    ),
+    "expected_output": "A JSON array of objects with keys 'day' and 'tasks' (array of strings).",
+}
+
+PLAYLIST_PHASE = {
+    "name": "playlist_plan",
+    "agent": "learning_coach",
+    "description": (
+        "Use the Playlist Planner Tool to turn these playlists into a unified daily viewing schedule of at most "
+        "{hours} hours per day, {weekends}: {playlists}"
+    ),
+    "expected_output": "A JSON object with a 'schedule' list and a 'schedule_summary'.",
+}
+
+
+# --- Crew Pool: agents are built once per process and reused across requests ---
+# main.py warms it at startup and leases crews for the /crew/<workflow> jobs.
+class CrewPool:
+    """Fixed set of pre-built SkillSyncCrew instances leased one request at a time."""
+
+    def __init__(self, size=2):
+        self.size = max(1, size)
+        self._idle = queue.Queue()
+        self._built = 0
+        self._lock = threading.Lock()
+
+    def warm(self):
+        """Build every crew up front so the first request doesn't pay agent construction."""
+        with self._lock:
+            while self._built < self.size:
+                self._idle.put(SkillSyncCrew())
+                self._built += 1
+
+    @contextmanager
+    def lease(self, timeout=None):
+        with self._lock:
+            if self._idle.empty() and self._built < self.size:
+                self._idle.put(SkillSyncCrew())
+                self._built += 1
+        try:
+            crew = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise RuntimeError("All crews are busy, try again shortly.")
+        try:
+            yield crew
+        finally:
+            self._idle.put(crew)
+
+
+_crew_pool = None
+_crew_pool_lock = threading.Lock()
 
-        result = roadmap_crew.kickoff()
-        return {"result": result}
 
-    # ... (Rest of run_daily_plan, run_playlist_plan, run_job_readiness remain the same) ...
\ No newline at end of file
+def get_crew_pool():
+    global _crew_pool
+    if _crew_pool is None:
+        with _crew_pool_lock:
+            if _crew_pool is None:
+                _crew_pool = CrewPool(int(os.getenv("CREW_POOL_SIZE", "2")))
+    return _crew_pool
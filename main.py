@@ -1,17 +1,28 @@
+import hashlib
 import os
-import json
-import re
+import threading
+from concurrent.futures import TimeoutError as FuturesTimeout
 from datetime import datetime, timezone, timedelta
 from functools import wraps
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash, send_file
-from werkzeug.security import generate_password_hash, check_password_hash
-from pymongo import MongoClient
-from openai import OpenAI
-from io import BytesIO
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import A4
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash, send_file, Response, stream_with_context, make_response
+from werkzeug.middleware.proxy_fix import ProxyFix
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from llm_gateway import get_gateway
+from auth import HashPoolBusy, PasswordHasher, SlidingWindowLimiter
+from pdf_export import open_or_render, roadmap_fingerprint
+from mongo_setup import create_client, ensure_indexes, health
+from roadmap_cache import RoadmapCache, make_cache_key
+from dashboard_cache import DashboardCache, dashboard_etag
+from analytics import AnalyticsRollups
+from static_assets import StaticAssets, compress_response
+from roadmap_versions import RoadmapVersionStore
+from daily_plans import DailyPlanStore, generate_in_batches
+from jobs import JobManager, JobQueueFull, public_view, sse_event
+from stream_json import WeekStreamParser
+from json_extract import extract_json
+from observability import AUTH_THROTTLED, get_logger, instrument_app, render_metrics
 
 # ------------------ Initialization ------------------
 load_dotenv()
@@ -20,24 +31,162 @@ MONGO_URI = os.getenv("MONGO_URI")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 SECRET_KEY = os.getenv("SECRET_KEY", "super_secret_key")
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+
+# Bump whenever the roadmap prompt changes so cached roadmaps from older prompts are not reused.
+ROADMAP_PROMPT_VERSION = "1"
+ROADMAP_CACHE_TTL = int(os.getenv("ROADMAP_CACHE_TTL", str(7 * 24 * 3600)))
+ROADMAP_CACHE_SIZE = int(os.getenv("ROADMAP_CACHE_SIZE", "256"))
+ROADMAP_SNAPSHOT_EVERY = int(os.getenv("ROADMAP_SNAPSHOT_EVERY", "10"))
+DAILY_PLAN_WEEKS_PER_CALL = int(os.getenv("DAILY_PLAN_WEEKS_PER_CALL", "4"))
+DAILY_PLAN_CONCURRENCY = int(os.getenv("DAILY_PLAN_CONCURRENCY", "3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_QUEUE = int(os.getenv("JOB_MAX_QUEUE", "32"))
+# Longest an SSE job stream stays open; keep it below the gunicorn --timeout in the Procfile.
+JOB_STREAM_TIMEOUT = int(os.getenv("JOB_STREAM_TIMEOUT", "300"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+DASHBOARD_CACHE_SIZE = int(os.getenv("DASHBOARD_CACHE_SIZE", "256"))
+# Any werkzeug method string; stored hashes made with a different one are upgraded on the next login.
+AUTH_HASH_METHOD = os.getenv("AUTH_HASH_METHOD", "scrypt:32768:8:1")
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "1"))
+AUTH_HASH_MAX_PENDING = int(os.getenv("AUTH_HASH_MAX_PENDING", "8"))
+AUTH_IP_LIMIT = int(os.getenv("AUTH_IP_LIMIT", "30"))
+AUTH_IP_WINDOW = int(os.getenv("AUTH_IP_WINDOW", "300"))
+AUTH_EMAIL_LIMIT = int(os.getenv("AUTH_EMAIL_LIMIT", "5"))
+AUTH_EMAIL_WINDOW = int(os.getenv("AUTH_EMAIL_WINDOW", "900"))
+MAX_PASSWORD_LENGTH = 1024
+ANALYTICS_FLUSH_SECONDS = float(os.getenv("ANALYTICS_FLUSH_SECONDS", "2"))
+# Number of reverse proxies in front of the app whose X-Forwarded-For can be trusted for client IPs.
+# The Procfile deployment sits behind one router; without this every client would share the router's
+# address and AUTH_IP_LIMIT would throttle the whole site at once. Set 0 when clients connect directly.
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "1"))
+# auto (default): rebuild static/dist on startup when a source file changed; off: serve the existing build.
+STATIC_BUILD = os.getenv("STATIC_BUILD", "auto").lower()
+HTML_GZIP = os.getenv("HTML_GZIP", "1").lower() in ("1", "true", "yes")
+# background (default): create indexes on a worker thread after startup; sync: before serving; off: skip.
+MONGO_INDEX_BOOTSTRAP = os.getenv("MONGO_INDEX_BOOTSTRAP", "background").lower()
+# Off by default: warming imports crewAI and builds every agent in every worker at boot. Without it the
+# pool builds a crew on the first /crew lease that finds none idle. Turn on for crew-heavy deployments.
+CREW_POOL_WARM = os.getenv("CREW_POOL_WARM", "0").lower() in ("1", "true", "yes")
+CREW_LEASE_TIMEOUT = float(os.getenv("CREW_LEASE_TIMEOUT", "60"))
+
+log = get_logger("server")
+ai_log = get_logger("ai")
 
 if not MONGO_URI:
     raise EnvironmentError("Please set MONGO_URI in .env")
 
 if not OPENAI_API_KEY:
-    print("Warning: OPENAI_API_KEY not set. AI calls will fail until you set it.")
+    log.warning("OPENAI_API_KEY not set. AI calls will fail until you set it.")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+llm = get_gateway()
 app = Flask(__name__)
 app.secret_key = SECRET_KEY
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+elif AUTH_IP_LIMIT:
+    log.warning("TRUSTED_PROXIES=0: auth throttling keys on the socket address; behind a proxy that is one "
+                "address for every client.")
+instrument_app(app)
+static_assets = StaticAssets(app)
+if HTML_GZIP:
+    app.after_request(compress_response)
 
 # ------------------ MongoDB Setup ------------------
-mongo_client = MongoClient(MONGO_URI)
+mongo_client = create_client(MONGO_URI)
 db = mongo_client["SkillSyncDB"]
 users_col = db["users"]
 roadmaps_col = db["roadmaps"]
 dailyplans_col = db["daily_plans"]
 
+# Per-route projections so only the fields a view needs cross the wire.
+DASHBOARD_FIELDS = {"name": 1, "email": 1, "goal": 1, "skills": 1, "roadmap": 1, "roadmap_rev": 1}
+DASHBOARD_REV_FIELDS = {"_id": 0, "roadmap_rev": 1}
+LOGIN_FIELDS = {"email": 1, "password": 1}
+PDF_FIELDS = {"name": 1, "roadmap": 1}
+# Before-image of a roadmap replacement, for the analytics rollups.
+ANALYTICS_FIELDS = {"_id": 0, "goal": 1, "skills": 1, "roadmap.progress": 1}
+
+roadmap_cache = RoadmapCache(db["roadmap_cache"], max_entries=ROADMAP_CACHE_SIZE, ttl_seconds=ROADMAP_CACHE_TTL)
+roadmap_versions = RoadmapVersionStore(roadmaps_col, snapshot_every=ROADMAP_SNAPSHOT_EVERY)
+daily_plan_store = DailyPlanStore(dailyplans_col)
+job_manager = JobManager(db["jobs"], max_workers=JOB_WORKERS, max_queue=JOB_MAX_QUEUE)
+dashboard_cache = DashboardCache(max_entries=DASHBOARD_CACHE_SIZE)
+analytics = AnalyticsRollups(db["analytics_rollups"], flush_interval=ANALYTICS_FLUSH_SECONDS)
+
+# ------------------ Auth ------------------
+password_hasher = PasswordHasher(AUTH_HASH_METHOD, workers=AUTH_HASH_WORKERS, max_pending=AUTH_HASH_MAX_PENDING)
+# Every auth POST counts against the client IP; only failed logins count against the email.
+ip_limiter = SlidingWindowLimiter(AUTH_IP_LIMIT, AUTH_IP_WINDOW)
+email_limiter = SlidingWindowLimiter(AUTH_EMAIL_LIMIT, AUTH_EMAIL_WINDOW)
+
+# ------------------ Startup ------------------
+def bootstrap_indexes():
+    """Create every collection's indexes (each create_index is a round trip to Mongo) and backfill the analytics rollups once."""
+    ensure_indexes(db)
+    roadmap_cache.ensure_indexes()
+    roadmap_versions.ensure_indexes()
+    job_manager.ensure_indexes()
+    analytics.ensure_indexes()
+    try:
+        analytics.rebuild_if_missing(users_col, roadmaps_col)
+    except Exception as e:
+        log.warning("Analytics backfill failed: %s", e)
+
+def warm_crews():
+    """Import crewAI and build the pooled crews; loader is imported here so the web path never pays for it."""
+    try:
+        from loader import get_crew_pool
+        get_crew_pool().warm()
+        log.info("Crew pool warmed")
+    except Exception as e:
+        log.warning("Crew pool warm-up failed: %s", e)
+
+_started = False
+_startup_lock = threading.Lock()
+
+def startup():
+    """Per-worker startup work, kept off the import path so a worker can serve as soon as it is imported."""
+    global _started
+    with _startup_lock:
+        if _started:
+            return
+        _started = True
+    try:
+        static_assets.load(rebuild=STATIC_BUILD == "auto")
+    except OSError as e:
+        # e.g. a read-only deploy image: serve whatever build it shipped with.
+        log.warning("Static asset build skipped: %s", e)
+        static_assets.load()
+    if MONGO_INDEX_BOOTSTRAP == "sync":
+        bootstrap_indexes()
+    elif MONGO_INDEX_BOOTSTRAP == "background":
+        threading.Thread(target=bootstrap_indexes, name="skillsync-index-bootstrap", daemon=True).start()
+    if CREW_POOL_WARM:
+        threading.Thread(target=warm_crews, name="skillsync-crew-warmup", daemon=True).start()
+
+def create_app():
+    """App factory for gunicorn ("main:create_app()"). Safe to call more than once."""
+    startup()
+    return app
+
+@app.before_request
+def ensure_started():
+    # Covers `gunicorn main:app` and other servers that import `app` directly.
+    if not _started:
+        startup()
+
+# ------------------ Dashboard Cache ------------------
+def template_stamp(name):
+    """Content hash of a template, so a deploy that changes it never revalidates a page rendered by the old one."""
+    try:
+        with open(os.path.join(app.root_path, "templates", name), "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()[:12]
+    except OSError:
+        return ""
+
+DASHBOARD_TEMPLATE_STAMP = template_stamp("dashboard.html")
+
 # ------------------ Predefined Goals ------------------
 PREDEFINED_GOALS = [
     "Software Developer", "Full Stack Developer", "Frontend Developer", "Backend Developer",
@@ -53,6 +202,39 @@ def login_required(f):
         return f(*args, **kwargs)
     return wrapper
 
+def is_admin():
+    return "user" in session and session["user"].lower() in ADMIN_EMAILS
+
+def admin_required(f):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        if "user" not in session:
+            return redirect(url_for("index"))
+        if not is_admin():
+            return jsonify({"error": "Admin access required"}), 403
+        return f(*args, **kwargs)
+    return wrapper
+
+def auth_throttled(route, scope, retry_after):
+    AUTH_THROTTLED.inc(route=route, scope=scope)
+    flash(f"Too many attempts. Please try again in {retry_after} seconds.", "error")
+    response = redirect(url_for("index"))
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+def auth_busy():
+    flash("The server is busy, please try again in a moment.", "error")
+    response = redirect(url_for("index"))
+    response.headers["Retry-After"] = "2"
+    return response
+
+def save_rehash(email, old_hash):
+    """Callback for password_hasher.rehash_later; only replaces the hash it was computed from."""
+    def save(new_hash):
+        users_col.update_one({"email": email, "password": old_hash}, {"$set": {"password": new_hash}})
+        log.info("Password hash upgraded to %s", password_hasher.method)
+    return save
+
 def safe_json_loads(s):
     """Try to parse JSON from a string or return None."""
     if s is None:
@@ -61,24 +243,15 @@ def safe_json_loads(s):
         return s
     if isinstance(s, list):
         return s
-    try:
-        return json.loads(s)
-    except Exception:
-        pass
-    m = re.search(r"(\{(?:.|\s)*\}|\[(?:.|\s)*\])", str(s))
-    if not m:
-        return None
-    candidate = m.group(1)
-    candidate = re.sub(r"^```(?:json)?\s*", "", candidate, flags=re.I)
-    candidate = re.sub(r"\s*```$", "", candidate, flags=re.I)
-    try:
-        return json.loads(candidate)
-    except Exception:
-        return None
+    return extract_json(str(s))
 
 def calculate_progress(roadmap):
     if not roadmap or "weeks" not in roadmap:
         return 0
+    counters = roadmap.get("progress")
+    if isinstance(counters, dict) and "total" in counters:
+        total, done = counters.get("total", 0), counters.get("done", 0)
+        return int((done / total) * 100) if total else 0
     total = done = 0
     for w in roadmap.get("weeks", []):
         for t in w.get("tasks", []):
@@ -87,23 +260,41 @@ def calculate_progress(roadmap):
                 done += 1
     return int((done / total) * 100) if total else 0
 
+def attach_progress_counters(roadmap):
+    """Store per-week and overall done/total counts so progress reads are O(1).
+    Task toggles keep them current with $inc."""
+    if not roadmap or "weeks" not in roadmap:
+        return roadmap
+    total = done = 0
+    for week in roadmap["weeks"]:
+        tasks = week.get("tasks", [])
+        week_done = sum(1 for t in tasks if t.get("done"))
+        week["task_count"] = len(tasks)
+        week["done_count"] = week_done
+        total += len(tasks)
+        done += week_done
+    roadmap["progress"] = {"done": done, "total": total}
+    return roadmap
+
 def attach_weekly_dates(roadmap, start_date=None):
-    """Add week start/end date strings to each week in roadmap."""
+    """Return a copy of roadmap with week start/end date strings on each week. The input is left untouched."""
     if not roadmap or "weeks" not in roadmap:
         return roadmap
     start = start_date or datetime.now(timezone.utc).date()
+    weeks = []
     for i, week in enumerate(roadmap["weeks"]):
         s = start + timedelta(weeks=i)
         e = s + timedelta(days=6)
-        week["start_date_str"] = s.strftime("%b %d")
-        week["end_date_str"] = e.strftime("%b %d")
-    return roadmap
+        weeks.append(dict(week, start_date_str=s.strftime("%b %d"), end_date_str=e.strftime("%b %d")))
+    return dict(roadmap, weeks=weeks)
+
+def bump_revision(update):
+    """Add the dashboard revision bump to a users update. Every write that changes what /dashboard shows goes through this."""
+    update.setdefault("$inc", {})["roadmap_rev"] = 1
+    return update
 
 # ------------------ AI Roadmap Generation ------------------
-def call_openai_generate_roadmap(goal, skills, hours_per_day=2, months=3):
-    """Call OpenAI to generate a roadmap JSON. Raises RuntimeError on failure."""
-    if not goal:
-        raise RuntimeError("Goal is required for roadmap generation.")
+def build_roadmap_prompts(goal, skills, hours_per_day, months):
     system_prompt = (
         "You are an expert AI career coach. Produce a JSON object with the structure:\n"
         "{\n"
@@ -115,15 +306,31 @@ def call_openai_generate_roadmap(goal, skills, hours_per_day=2, months=3):
         "Each week should have 6-8 tasks, at least one 'weekend_challenge', and resources (URLs when possible). Output only valid JSON (no markdown fences)."
     )
     user_prompt = f"Goal: {goal}\nExisting Skills: {skills}\nHours/day: {hours_per_day}\nDuration (months): {months}\nGenerate the roadmap now."
+    return system_prompt, user_prompt
+
+def call_openai_generate_roadmap(goal, skills, hours_per_day=2, months=3, use_cache=True):
+    """Call OpenAI to generate a roadmap JSON. Raises RuntimeError on failure.
+    Identical (goal, skills, hours, months, model, prompt) requests are served from roadmap_cache."""
+    if not goal:
+        raise RuntimeError("Goal is required for roadmap generation.")
+    cache_key = make_cache_key(goal, skills, hours_per_day, months, OPENAI_MODEL, ROADMAP_PROMPT_VERSION)
+    if use_cache:
+        cached = roadmap_cache.get(cache_key)
+        if cached is not None:
+            ai_log.info("Roadmap cache hit for goal: %s", goal)
+            return cached
+
+    system_prompt, user_prompt = build_roadmap_prompts(goal, skills, hours_per_day, months)
 
     try:
-        print("[AI Agent] Generating roadmap for goal:", goal)
-        resp = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
+        ai_log.info("Generating roadmap for goal: %s", goal)
+        resp = llm.chat(
+            "generate_roadmap",
+            [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
+            model=OPENAI_MODEL,
             temperature=0.25,
             max_tokens=2000
         )
@@ -133,13 +340,216 @@ def call_openai_generate_roadmap(goal, skills, hours_per_day=2, months=3):
             raise RuntimeError("AI returned unparsable JSON. Raw output logged.")
         if "weeks" not in parsed:
             raise RuntimeError("AI JSON missing 'weeks' key.")
-        print("[AI Agent] Roadmap parsed with", len(parsed.get("weeks", [])), "weeks.")
+        ai_log.info("Roadmap parsed with %d weeks.", len(parsed.get("weeks", [])))
+        roadmap_cache.put(cache_key, goal, parsed)
         return parsed
     except Exception as e:
-        print("[AI Agent] Error:", e)
+        ai_log.error("Roadmap generation failed: %s", e)
         raise RuntimeError(f"AI generation failed: {e}")
 
+def stream_openai_generate_roadmap(goal, skills, hours_per_day=2, months=3):
+    """Yield roadmap weeks one at a time as the model streams them.
+    Returns the full roadmap (via StopIteration.value) once the stream ends."""
+    if not goal:
+        raise RuntimeError("Goal is required for roadmap generation.")
+    cache_key = make_cache_key(goal, skills, hours_per_day, months, OPENAI_MODEL, ROADMAP_PROMPT_VERSION)
+    cached = roadmap_cache.get(cache_key)
+    if cached is not None:
+        ai_log.info("Roadmap cache hit for goal: %s", goal)
+        for week in cached.get("weeks", []):
+            yield week
+        return cached
+
+    system_prompt, user_prompt = build_roadmap_prompts(goal, skills, hours_per_day, months)
+    ai_log.info("Streaming roadmap for goal: %s", goal)
+    parser = WeekStreamParser()
+    weeks = []
+    try:
+        # `with` closes the upstream stream even when this generator is closed mid-way (client disconnect).
+        with llm.stream_chat(
+            "generate_roadmap_stream",
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            model=OPENAI_MODEL,
+            temperature=0.25,
+            max_tokens=2000
+        ) as stream:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                for week in parser.feed(delta):
+                    weeks.append(week)
+                    yield week
+    except Exception as e:
+        ai_log.error("Stream error: %s", e)
+        raise RuntimeError(f"AI generation failed: {e}")
+
+    parsed = safe_json_loads(parser.document()) if parser.complete else None
+    if not isinstance(parsed, dict) or "weeks" not in parsed:
+        if not weeks:
+            raise RuntimeError("AI returned unparsable JSON.")
+        parsed = {"goal": goal, "weeks": weeks}
+    ai_log.info("Roadmap streamed with %d weeks.", len(parsed.get("weeks", [])))
+    if parser.complete:
+        roadmap_cache.put(cache_key, goal, parsed)
+    return parsed
+
+def generate_and_save_roadmap(email, goal, skills, hours, months):
+    """Generate a roadmap and persist it for the user. Safe to call outside a request."""
+    try:
+        roadmap = call_openai_generate_roadmap(goal, skills, hours, months)
+    except Exception:
+        analytics.record_generation(goal, ok=False)
+        raise
+    roadmap, version = save_roadmap(email, goal, skills, roadmap)
+    log.info("Roadmap saved to database as version %s", version)
+    return roadmap
+
+def save_roadmap(email, goal, skills, roadmap, start_date=None, extra_update=None):
+    """Date, count and version a finished roadmap, then make it the user's current one. Returns (roadmap, version)."""
+    roadmap = attach_progress_counters(attach_weekly_dates(roadmap, start_date=start_date))
+    # The users update assigns the version number; history is only written once the roadmap is applied.
+    update = {"$set": {"goal": goal, "skills": skills, "roadmap": roadmap}, "$inc": {"roadmap_version": 1}}
+    update.update(extra_update or {})
+    previous = users_col.find_one_and_update({"email": email}, bump_revision(update),
+                                             projection={**ANALYTICS_FIELDS, "roadmap_version": 1})
+    if previous is None:
+        return roadmap, None
+    version = previous.get("roadmap_version", 0) + 1
+    analytics.record_profile(previous, goal, skills)
+    analytics.record_generation(goal)
+    try:
+        roadmap_versions.record(email, roadmap, version)
+    except Exception as e:
+        # The roadmap is saved; the next version is stored as a snapshot since this one is missing.
+        log.warning("Could not record roadmap version %s for %s: %s", version, email, e)
+    return roadmap, version
+
+def call_openai_generate_daily_tasks(goal, week_title):
+    """Ask the model for 5 daily tasks for one week. Returns parsed JSON or the raw text."""
+    prompt = f"Based on the week titled '{week_title}' for the goal '{goal}', generate 5 daily learning tasks with short descriptions. Output as a JSON array of objects with keys 'day' and 'tasks' (tasks array of strings)."
+    resp = llm.chat(
+        "generate_daily_tasks",
+        [
+            {"role": "system", "content": "You are a productivity AI coach."},
+            {"role": "user", "content": prompt}
+        ],
+        model=OPENAI_MODEL,
+        temperature=0.35,
+        max_tokens=800
+    )
+    raw = resp.choices[0].message.content
+    parsed = safe_json_loads(raw)
+    return parsed if parsed else raw
+
+def call_openai_generate_daily_plans_batch(goal, weeks):
+    """One model call covering several weeks. `weeks` is [(week_index, title)];
+    returns {week_index: [{"day": ..., "tasks": [...]}, ...]}."""
+    listing = "\n".join(f"{index}: {title}" for index, title in weeks)
+    prompt = (
+        f"For the goal '{goal}', generate 5 daily learning tasks with short descriptions for each of these roadmap weeks "
+        f"(format 'week_index: title'):\n{listing}\n"
+        "Output a JSON object {\"weeks\": [{\"week_index\": <number>, \"days\": [{\"day\": \"...\", \"tasks\": [\"...\"]}]}]} "
+        "with exactly one entry per week listed."
+    )
+    resp = llm.chat(
+        "generate_daily_plans",
+        [
+            {"role": "system", "content": "You are a productivity AI coach."},
+            {"role": "user", "content": prompt}
+        ],
+        model=OPENAI_MODEL,
+        temperature=0.35,
+        max_tokens=min(4000, 800 * len(weeks))
+    )
+    parsed = safe_json_loads(resp.choices[0].message.content)
+    entries = parsed.get("weeks", []) if isinstance(parsed, dict) else parsed or []
+    wanted = {index for index, _ in weeks}
+    plans = {}
+    for entry in entries:
+        try:
+            index = int(entry.get("week_index"))
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if index in wanted and entry.get("days"):
+            plans[index] = entry["days"]
+    return plans
+
+def load_plan_context(email):
+    """Goal, week titles and roadmap version needed to generate or look up daily plans."""
+    user = users_col.find_one({"email": email}, {"roadmap.goal": 1, "roadmap.weeks.title": 1, "roadmap_version": 1}) or {}
+    roadmap = user.get("roadmap") or {}
+    goal = roadmap.get("goal") or "Skill Development"
+    titles = [w.get("title") or f"Week {i + 1}" for i, w in enumerate(roadmap.get("weeks", []))]
+    return goal, titles, user.get("roadmap_version", 0)
+
+def daily_tasks_for_week(email, week_title, week_index=None):
+    """
+    Serve a week's plan from daily_plans, generating and storing it on a miss.
+    With a week_index the title comes from the stored roadmap, never the
+    client, so a plan is only ever cached under the week it was made for.
+    Raises ValueError for an index the roadmap doesn't have.
+    """
+    goal, titles, version = load_plan_context(email)
+    if week_index is not None:
+        if not 0 <= week_index < len(titles):
+            raise ValueError("week_index out of range")
+        week_title = titles[week_index]
+    elif week_title in titles:
+        week_index = titles.index(week_title)
+    if week_index is not None:
+        stored = daily_plan_store.get(email, version, week_index)
+        if stored:
+            return stored["plan"]
+    plan = call_openai_generate_daily_tasks(goal, week_title)
+    if week_index is not None and not isinstance(plan, str):
+        daily_plan_store.save_many(email, version, {week_index: (week_title, plan)})
+    return plan
+
+def generate_daily_plans_bulk(email, report=None):
+    """Generate every missing week's plan for the current roadmap version in packed, concurrent calls."""
+    goal, titles, version = load_plan_context(email)
+    stored = daily_plan_store.get_many(email, version)
+    missing = [(i, title) for i, title in enumerate(titles) if i not in stored]
+    if report:
+        report(10, f"Generating plans for {len(missing)} weeks")
+    plans, errors = generate_in_batches(
+        missing,
+        lambda batch: call_openai_generate_daily_plans_batch(goal, batch),
+        weeks_per_call=DAILY_PLAN_WEEKS_PER_CALL,
+        concurrency=DAILY_PLAN_CONCURRENCY,
+    )
+    daily_plan_store.save_many(email, version, {i: (titles[i], plan) for i, plan in plans.items()})
+    log.info("Daily plans: %d generated, %d reused, %d failed.", len(plans), len(stored), len(errors))
+    return {
+        "roadmap_version": version,
+        "generated": sorted(plans),
+        "reused": sorted(stored),
+        "errors": {str(i): e for i, e in errors.items()},
+    }
+
 # ------------------ Routes ------------------
+@app.route("/healthz")
+def healthz():
+    """Public liveness check; pool settings and usage are only shown to admins."""
+    report = health(db)
+    status = 200 if report["mongo"] == "ok" else 503
+    if not is_admin():
+        report = {"mongo": report["mongo"]}
+    return jsonify(report), status
+
+@app.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint. Set METRICS_TOKEN to require a bearer token."""
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        return Response(status=401)
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
 @app.route("/")
 def index():
     return render_template("index_3.html")
@@ -150,36 +560,71 @@ def signup():
     email = request.form.get("email")
     password = request.form.get("password")
     confirm = request.form.get("confirm_password")
+    ip = request.remote_addr or "unknown"
 
-    if not all([name, email, password, confirm]) or password != confirm:
+    wait = ip_limiter.retry_after(ip)
+    if wait:
+        return auth_throttled("signup", "ip", wait)
+    ip_limiter.hit(ip)
+    if not all([name, email, password, confirm]) or password != confirm or len(password) > MAX_PASSWORD_LENGTH:
         flash("Invalid form input.", "error")
         return redirect(url_for("index"))
-    if users_col.find_one({"email": email}):
+    if users_col.find_one({"email": email}, {"_id": 1}):
         flash("User already exists.", "error")
         return redirect(url_for("index"))
 
-    hashed = generate_password_hash(password)
-    users_col.insert_one({
-        "name": name,
-        "email": email,
-        "password": hashed,
-        "created_at": datetime.now(timezone.utc),
-        "goal": None,
-        "skills": [],
-        "roadmap": {"goal": None, "weeks": []},
-        "daily_plans": [],
-    })
+    try:
+        hashed = password_hasher.hash(password)
+    except (HashPoolBusy, FuturesTimeout):
+        return auth_busy()
+    try:
+        users_col.insert_one({
+            "name": name,
+            "email": email,
+            "password": hashed,
+            "created_at": datetime.now(timezone.utc),
+            "goal": None,
+            "skills": [],
+            "roadmap": {"goal": None, "weeks": []},
+            "daily_plans": [],
+        })
+    except DuplicateKeyError:
+        flash("User already exists.", "error")
+        return redirect(url_for("index"))
+    analytics.record_signup()
     flash("Signup successful! Please login.", "success")
     return redirect(url_for("index"))
 
 @app.route("/login", methods=["POST"])
 def login():
+    """Throttle checks come first so rejected attempts cost no Mongo read and no hash."""
     email = request.form.get("email")
     password = request.form.get("password")
-    user = users_col.find_one({"email": email})
-    if user and check_password_hash(user["password"], password):
+    ip = request.remote_addr or "unknown"
+    email_key = (email or "").strip().lower()
+
+    wait = ip_limiter.retry_after(ip)
+    if wait:
+        return auth_throttled("login", "ip", wait)
+    wait = email_limiter.retry_after(email_key)
+    if wait:
+        return auth_throttled("login", "email", wait)
+    ip_limiter.hit(ip)
+
+    user = None
+    if email and password and len(password) <= MAX_PASSWORD_LENGTH:
+        user = users_col.find_one({"email": email}, LOGIN_FIELDS)
+    try:
+        ok = user is not None and password_hasher.verify(user["password"], password)
+    except (HashPoolBusy, FuturesTimeout):
+        return auth_busy()
+    if ok:
+        email_limiter.reset(email_key)
+        if password_hasher.needs_rehash(user["password"]):
+            password_hasher.rehash_later(password, save_rehash(user["email"], user["password"]))
         session["user"] = user["email"]
         return redirect(url_for("dashboard"))
+    email_limiter.hit(email_key)
     flash("Invalid credentials.", "error")
     return redirect(url_for("index"))
 
@@ -191,18 +636,46 @@ def logout():
 @app.route("/dashboard")
 @login_required
 def dashboard():
-    user = users_col.find_one({"email": session["user"]})
-    roadmap = user.get("roadmap") or {"goal": user.get("goal"), "weeks": []}
-    roadmap = attach_weekly_dates(roadmap)
-    skills = user.get("skills", [])
-    progress = calculate_progress(roadmap)
-    return render_template(
-        "dashboard.html",
-        user=user,
-        roadmap=roadmap,
-        predefined_goals=PREDEFINED_GOALS,
-        overall_progress=progress
-    )
+    """
+    Rendered once per (user, roadmap revision, day) and then served from
+    dashboard_cache, or as a bare 304 when the browser already has it.
+    Checking freshness is a covered index read of roadmap_rev only.
+    """
+    email = session["user"]
+    today = datetime.now(timezone.utc).date()
+    state = users_col.find_one({"email": email}, DASHBOARD_REV_FIELDS)
+    if state is None:
+        session.pop("user", None)
+        return redirect(url_for("index"))
+    etag = dashboard_etag(email, state.get("roadmap_rev", 0), today, DASHBOARD_TEMPLATE_STAMP)
+    if request.if_none_match.contains_weak(etag):  # weak once gzipped by compress_response
+        return dashboard_response("", etag, 304)
+
+    html = dashboard_cache.get(email, etag)
+    if html is None:
+        user = users_col.find_one({"email": email}, DASHBOARD_FIELDS)
+        if user is None:
+            session.pop("user", None)
+            return redirect(url_for("index"))
+        # A write may have landed between the two reads; tag the page with what was actually rendered.
+        etag = dashboard_etag(email, user.get("roadmap_rev", 0), today, DASHBOARD_TEMPLATE_STAMP)
+        roadmap = attach_weekly_dates(user.get("roadmap") or {"goal": user.get("goal"), "weeks": []}, start_date=today)
+        html = render_template(
+            "dashboard.html",
+            user=dict(user, roadmap=roadmap),
+            roadmap=roadmap,
+            predefined_goals=PREDEFINED_GOALS,
+            overall_progress=calculate_progress(roadmap)
+        )
+        dashboard_cache.put(email, etag, html)
+    return dashboard_response(html, etag)
+
+def dashboard_response(body, etag, status=200):
+    response = make_response(body, status)
+    response.set_etag(etag)
+    # Per-user page: browsers may keep it but must revalidate every time.
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
 @app.route("/generate_roadmap", methods=["POST"])
 @login_required
@@ -216,129 +689,424 @@ def generate_roadmap():
     if not goal:
         return jsonify({"error": "Goal required"}), 400
 
+    if wants_async(payload):
+        params = {"email": session["user"], "goal": goal, "skills": skills, "hours": hours, "months": months}
+        return submit_job("roadmap", params)
+
     try:
-        roadmap = call_openai_generate_roadmap(goal, skills, hours, months)
-        roadmap = attach_weekly_dates(roadmap)
-        users_col.update_one(
-            {"email": session["user"]},
-            {"$set": {"goal": goal, "skills": skills, "roadmap": roadmap}}
-        )
-        roadmaps_col.insert_one({
-            "email": session["user"],
-            "roadmap": roadmap,
-            "created_at": datetime.now(timezone.utc)
-        })
-        print("[Server] Roadmap saved to database.")
+        roadmap = generate_and_save_roadmap(session["user"], goal, skills, hours, months)
         return jsonify({"success": True, "roadmap": roadmap})
     except RuntimeError as e:
-        print("[Server] Roadmap generation error:", str(e))
+        log.error("Roadmap generation error: %s", e)
         return jsonify({"error": str(e)}), 500
     except Exception as e:
-        print("[Server] Unexpected error:", e)
+        log.exception("Unexpected error: %s", e)
         return jsonify({"error": f"Unexpected server error: {e}"}), 500
 
+@app.route("/generate_roadmap/stream", methods=["POST"])
+@login_required
+def generate_roadmap_stream():
+    """
+    Stream the roadmap as server-sent events, one `week` event per completed week.
+    Weeks are collected in users.roadmap_draft while they arrive; the current
+    roadmap, goal and version history only change once the whole roadmap is in,
+    so a failed or abandoned stream leaves the user's existing roadmap alone.
+    """
+    payload = request.get_json(force=True)
+    goal = payload.get("goal")
+    skills = payload.get("skills", [])
+    hours = int(payload.get("hours", 2))
+    months = int(payload.get("duration_months", 3))
+    if not goal:
+        return jsonify({"error": "Goal required"}), 400
+    email = session["user"]
+
+    def events():
+        start = datetime.now(timezone.utc).date()
+        users_col.update_one({"email": email}, {"$set": {"roadmap_draft": {
+            "goal": goal, "weeks": [], "started_at": datetime.now(timezone.utc)}}})
+        gen = stream_openai_generate_roadmap(goal, skills, hours, months)
+        saved = False
+        try:
+            index = 0
+            while True:
+                try:
+                    week = next(gen)
+                except StopIteration as stop:
+                    roadmap = stop.value
+                    break
+                week = attach_weekly_dates({"weeks": [week]}, start_date=start + timedelta(weeks=index))["weeks"][0]
+                users_col.update_one({"email": email}, {"$push": {"roadmap_draft.weeks": week}})
+                yield sse_event("week", {"index": index, "week": week})
+                index += 1
+
+            roadmap, version = save_roadmap(email, goal, skills, roadmap, start_date=start,
+                                            extra_update={"$unset": {"roadmap_draft": ""}})
+            saved = True
+            log.info("Streamed roadmap saved to database as version %s", version)
+            yield sse_event("done", {"success": True, "weeks": len(roadmap.get("weeks", [])), "version": version})
+        except Exception as e:
+            if isinstance(e, RuntimeError):
+                log.error("Roadmap stream error: %s", e)
+            else:
+                log.exception("Unexpected roadmap stream error: %s", e)
+            analytics.record_generation(goal, ok=False)
+            yield sse_event("error", {"error": str(e)})
+        finally:
+            # Runs on success, errors and client disconnects (GeneratorExit) alike.
+            gen.close()
+            if not saved:
+                users_col.update_one({"email": email}, {"$unset": {"roadmap_draft": ""}})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ------------------ Roadmap History ------------------
+@app.route("/roadmap/versions")
+@login_required
+def roadmap_version_list():
+    return jsonify({"success": True, "versions": roadmap_versions.list_versions(session["user"])})
+
+@app.route("/roadmap/versions/<int:version>")
+@login_required
+def roadmap_version_get(version):
+    roadmap = roadmap_versions.get_version(session["user"], version)
+    if roadmap is None:
+        return jsonify({"error": "Version not found"}), 404
+    return jsonify({"success": True, "version": version, "roadmap": roadmap})
+
+@app.route("/roadmap/diff")
+@login_required
+def roadmap_version_diff():
+    try:
+        from_version = int(request.args.get("from"))
+        to_version = int(request.args.get("to"))
+    except (TypeError, ValueError):
+        return jsonify({"error": "from and to versions required"}), 400
+    patch = roadmap_versions.diff(session["user"], from_version, to_version)
+    if patch is None:
+        return jsonify({"error": "Version not found"}), 404
+    return jsonify({"success": True, "from": from_version, "to": to_version, "patch": patch})
+
+# ------------------ Task Progress ------------------
+def task_toggle_op(email, week_idx, task_idx, done):
+    """Conditional positional update for one task.
+    It only matches when the flag actually changes, so the counters move by exactly one
+    and concurrent clicks from two tabs can't double count."""
+    path = f"roadmap.weeks.{week_idx}.tasks.{task_idx}"
+    current = {"$ne": True} if done else True
+    delta = 1 if done else -1
+    query = {"email": email, path: {"$exists": True}, f"{path}.done": current}
+    update = {
+        "$set": {f"{path}.done": done},
+        "$inc": {"roadmap.progress.done": delta, f"roadmap.weeks.{week_idx}.done_count": delta, "roadmap_rev": 1},
+    }
+    return query, update
+
+def ensure_progress_counters(email):
+    """Backfill counters for roadmaps saved before they existed. Returns the progress dict."""
+    user = users_col.find_one({"email": email}, {"roadmap.progress": 1})
+    counters = ((user or {}).get("roadmap") or {}).get("progress")
+    if counters:
+        return counters
+    user = users_col.find_one({"email": email}, {"roadmap": 1})
+    roadmap = attach_progress_counters((user or {}).get("roadmap") or {"weeks": []})
+    users_col.update_one(
+        {"email": email, "roadmap.progress": {"$exists": False}},
+        {"$set": {
+            "roadmap.progress": roadmap.get("progress", {"done": 0, "total": 0}),
+            **{f"roadmap.weeks.{i}.task_count": w["task_count"] for i, w in enumerate(roadmap.get("weeks", []))},
+            **{f"roadmap.weeks.{i}.done_count": w["done_count"] for i, w in enumerate(roadmap.get("weeks", []))},
+        }}
+    )
+    return roadmap.get("progress", {"done": 0, "total": 0})
+
+def progress_percent(counters):
+    total = counters.get("total", 0)
+    return int((counters.get("done", 0) / total) * 100) if total else 0
+
+def parse_task_toggle(data):
+    return int(data.get("weekIdx")), int(data.get("taskIdx")), bool(data.get("done"))
+
 @app.route("/update_task_status", methods=["POST"])
 @login_required
 def update_task_status():
     data = request.get_json(force=True)
     try:
-        week_idx = int(data.get("weekIdx"))
-        task_idx = int(data.get("taskIdx"))
-        done = bool(data.get("done"))
+        week_idx, task_idx, done = parse_task_toggle(data)
     except Exception:
         return jsonify({"error": "Invalid indices"}), 400
+    if week_idx < 0 or task_idx < 0:
+        return jsonify({"error": "index out of range"}), 400
 
-    user = users_col.find_one({"email": session["user"]})
-    roadmap = user.get("roadmap", {})
-    weeks = roadmap.get("weeks", [])
+    email = session["user"]
+    ensure_progress_counters(email)
+    query, update = task_toggle_op(email, week_idx, task_idx, done)
+    user = users_col.find_one_and_update(
+        query, update, projection={"roadmap.progress": 1}, return_document=ReturnDocument.AFTER
+    )
+    if user is not None:
+        after = user["roadmap"]["progress"]
+        # The conditional update moved done by exactly one, so the before-state is known without a read.
+        analytics.record_progress(dict(after, done=after.get("done", 0) - (1 if done else -1)), after)
+    else:
+        # Either the task already had this state or the indices don't exist.
+        path = f"roadmap.weeks.{week_idx}.tasks.{task_idx}"
+        user = users_col.find_one({"email": email, path: {"$exists": True}}, {"roadmap.progress": 1})
+        if user is None:
+            return jsonify({"error": "task index out of range"}), 400
+    progress = progress_percent(user["roadmap"]["progress"])
+    return jsonify({"success": True, "progress": progress})
 
-    if week_idx < 0 or week_idx >= len(weeks):
-        return jsonify({"error": "week index out of range"}), 400
-    tasks = weeks[week_idx].get("tasks", [])
-    if task_idx < 0 or task_idx >= len(tasks):
-        return jsonify({"error": "task index out of range"}), 400
+@app.route("/update_task_status/batch", methods=["POST"])
+@login_required
+def update_task_status_batch():
+    """Apply many toggles in one round trip: {"updates": [{"weekIdx", "taskIdx", "done"}, ...]}."""
+    data = request.get_json(force=True)
+    updates = data.get("updates") or []
+    if not isinstance(updates, list) or not updates:
+        return jsonify({"error": "updates required"}), 400
+    try:
+        toggles = [parse_task_toggle(u) for u in updates]
+    except Exception:
+        return jsonify({"error": "Invalid indices"}), 400
+    if any(w < 0 or t < 0 for w, t, _ in toggles):
+        return jsonify({"error": "index out of range"}), 400
 
-    tasks[task_idx]["done"] = done
-    users_col.update_one({"email": session["user"]}, {"$set": {"roadmap": roadmap}})
-    progress = calculate_progress(roadmap)
-    return jsonify({"success": True, "progress": progress})
+    email = session["user"]
+    before = ensure_progress_counters(email)
+    ops = [UpdateOne(*task_toggle_op(email, w, t, d)) for w, t, d in toggles]
+    result = users_col.bulk_write(ops, ordered=True)
+    user = users_col.find_one({"email": email}, {"roadmap.progress": 1})
+    after = ((user or {}).get("roadmap") or {}).get("progress") or {}
+    if result.modified_count:
+        analytics.record_progress(before, after)
+    progress = progress_percent(after)
+    return jsonify({"success": True, "applied": result.modified_count, "progress": progress})
 
 @app.route("/generate_daily_tasks", methods=["POST"])
 @login_required
 def generate_daily_tasks():
     data = request.get_json(force=True)
     week_title = data.get("week_title")
-    if not week_title:
-        return jsonify({"error": "week_title required"}), 400
+    week_index = data.get("week_index")
+    try:
+        week_index = int(week_index) if week_index is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid week_index"}), 400
+    if not week_title and week_index is None:
+        return jsonify({"error": "week_title or week_index required"}), 400
 
-    user = users_col.find_one({"email": session["user"]})
-    roadmap = user.get("roadmap", {})
-    goal = roadmap.get("goal", "Skill Development")
+    if wants_async(data):
+        params = {"email": session["user"], "week_title": week_title, "week_index": week_index}
+        scope = f"week:{week_index}" if week_index is not None else week_title
+        return submit_job("daily_tasks", params, dedup_scope=scope)
 
-    prompt = f"Based on the week titled '{week_title}' for the goal '{goal}', generate 5 daily learning tasks with short descriptions. Output as a JSON array of objects with keys 'day' and 'tasks' (tasks array of strings)."
+    try:
+        return jsonify({"success": True, "daily_tasks": daily_tasks_for_week(session["user"], week_title, week_index)})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        ai_log.error("generate_daily_tasks error: %s", e)
+        return jsonify({"error": str(e)}), 500
 
+@app.route("/generate_daily_plans", methods=["POST"])
+@login_required
+def generate_daily_plans():
+    """Generate daily plans for every week of the current roadmap."""
+    data = request.get_json(force=True, silent=True) or {}
+    if wants_async(data):
+        return submit_job("daily_plans_bulk", {"email": session["user"]})
     try:
-        resp = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a productivity AI coach."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.35,
-            max_tokens=800
-        )
-        raw = resp.choices[0].message.content
-        parsed = safe_json_loads(raw)
-        if parsed:
-            return jsonify({"success": True, "daily_tasks": parsed})
-        return jsonify({"success": True, "daily_tasks": raw})
+        return jsonify({"success": True, **generate_daily_plans_bulk(session["user"])})
     except Exception as e:
-        print("[AI] generate_daily_tasks error:", e)
+        ai_log.error("generate_daily_plans error: %s", e)
         return jsonify({"error": str(e)}), 500
 
+@app.route("/daily_plans")
+@login_required
+def daily_plans():
+    _, _, version = load_plan_context(session["user"])
+    plans = daily_plan_store.get_many(session["user"], version)
+    return jsonify({"success": True, "roadmap_version": version, "plans": [plans[i] for i in sorted(plans)]})
+
+# ------------------ Background Jobs ------------------
+def wants_async(payload):
+    flag = payload.get("async", request.args.get("async"))
+    return str(flag).lower() in ("1", "true", "yes")
+
+def submit_job(kind, params, dedup_scope=""):
+    """Queue a job for the current user and answer 202 with where to follow it."""
+    try:
+        job, created = job_manager.submit(kind, session["user"], params, dedup_scope=dedup_scope)
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    return jsonify({
+        "success": True,
+        "job_id": job["_id"],
+        "status": job["status"],
+        "deduplicated": not created,
+        "status_url": url_for("job_status", job_id=job["_id"]),
+        "events_url": url_for("job_events", job_id=job["_id"]),
+    }), 202
+
+def run_roadmap_job(params, report):
+    report(10, "Generating roadmap")
+    roadmap = generate_and_save_roadmap(params["email"], params["goal"], params["skills"], params["hours"], params["months"])
+    return {"roadmap": roadmap}
+
+def run_daily_tasks_job(params, report):
+    report(10, "Generating daily tasks")
+    return {"daily_tasks": daily_tasks_for_week(params["email"], params["week_title"], params.get("week_index"))}
+
+def run_daily_plans_bulk_job(params, report):
+    return generate_daily_plans_bulk(params["email"], report)
+
+def run_analytics_rebuild_job(params, report):
+    report(10, "Recounting users")
+    return analytics.rebuild(users_col, roadmaps_col)
+
+# Agent workflows on the pooled crews: name -> (SkillSyncCrew method, {param: default or None if required}).
+CREW_WORKFLOWS = {
+    "orchestrate": ("orchestrate", {"goal": None, "skills": [], "hours": 2, "duration": 3, "weekends": True}),
+    "daily_plan": ("run_daily_plan", {"goal": None, "week_title": None, "hours": 2, "weekends": True}),
+    "playlist_plan": ("run_playlist_plan", {"playlists": None, "hours": 2, "weekends": True}),
+    "job_readiness": ("run_job_readiness", {"goal": None, "skills": []}),
+}
+
+def run_crew_job(params, report):
+    from loader import get_crew_pool
+    method, _ = CREW_WORKFLOWS[params["workflow"]]
+    report(5, "Waiting for a crew")
+    with get_crew_pool().lease(timeout=CREW_LEASE_TIMEOUT) as crew:
+        report(10, "Running agents")
+        return getattr(crew, method)(**params["args"])
+
+job_manager.register("roadmap", run_roadmap_job)
+job_manager.register("daily_tasks", run_daily_tasks_job)
+job_manager.register("daily_plans_bulk", run_daily_plans_bulk_job)
+job_manager.register("analytics_rebuild", run_analytics_rebuild_job)
+job_manager.register("crew", run_crew_job)
+
+@app.route("/jobs/<job_id>")
+@login_required
+def job_status(job_id):
+    job = job_manager.get(job_id, owner=session["user"])
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({"success": True, "job": public_view(job)})
+
+@app.route("/jobs/<job_id>/events")
+@login_required
+def job_events(job_id):
+    """
+    Server-sent events for a job; clients that can't use SSE poll /jobs/<id> instead.
+    An open stream occupies one server thread until the job ends, which is
+    why the Procfile runs gunicorn with the threaded (gthread) worker.
+    """
+    stream = job_manager.stream(job_id, session["user"], timeout=JOB_STREAM_TIMEOUT)
+    return Response(
+        stream_with_context(stream),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route("/crew/<workflow>", methods=["POST"])
+@login_required
+def crew_workflow(workflow):
+    """Run a multi-agent workflow on a pre-built crew from the pool. Always a background job."""
+    if workflow not in CREW_WORKFLOWS:
+        return jsonify({"error": "Unknown workflow"}), 404
+    data = request.get_json(force=True, silent=True) or {}
+    _, fields = CREW_WORKFLOWS[workflow]
+    missing = [name for name, default in fields.items() if default is None and not data.get(name)]
+    if missing:
+        return jsonify({"error": f"Missing: {', '.join(missing)}"}), 400
+    args = {name: data.get(name, default) for name, default in fields.items()}
+    return submit_job("crew", {"workflow": workflow, "args": args}, dedup_scope=workflow)
+
+# ------------------ Admin: Analytics ------------------
+@app.route("/admin")
+@admin_required
+def admin():
+    """Served from the rollup counters only, so its cost does not grow with the user count."""
+    return render_template("admin.html", **analytics.summary())
+
+@app.route("/admin/analytics")
+@admin_required
+def admin_analytics():
+    return jsonify({"success": True, "analytics": analytics.summary()})
+
+@app.route("/admin/analytics/rebuild", methods=["POST"])
+@admin_required
+def admin_analytics_rebuild():
+    """Recount the user-derived rollups from scratch (a full scan, so it runs as a job)."""
+    return submit_job("analytics_rebuild", {})
+
+# ------------------ Admin: Roadmap Cache ------------------
+@app.route("/admin/roadmap_cache", methods=["GET"])
+@admin_required
+def roadmap_cache_stats():
+    return jsonify({"success": True, "stats": roadmap_cache.snapshot()})
+
+@app.route("/admin/roadmap_cache/invalidate", methods=["POST"])
+@admin_required
+def roadmap_cache_invalidate():
+    data = request.get_json(force=True, silent=True) or {}
+    goal = data.get("goal")
+    if data.get("all"):
+        roadmap_cache.clear()
+        return jsonify({"success": True, "cleared": "all"})
+    if not goal:
+        return jsonify({"error": "goal required"}), 400
+    removed = roadmap_cache.invalidate_goal(goal)
+    return jsonify({"success": True, "goal": goal, "removed": removed})
+
+@app.route("/admin/dashboard_cache")
+@admin_required
+def dashboard_cache_stats():
+    return jsonify({"success": True, "stats": dashboard_cache.snapshot()})
+
+@app.route("/admin/llm_metrics")
+@admin_required
+def llm_metrics():
+    return jsonify({"success": True, "metrics": llm.metrics()})
+
 # ------------------ PDF Download Route ------------------
 @app.route("/download_pdf")
 @login_required
 def download_pdf():
     """Generate and download the user's roadmap as a PDF (white background)."""
-    user = users_col.find_one({"email": session["user"]})
+    user = users_col.find_one({"email": session["user"]}, PDF_FIELDS)
     if not user:
         return jsonify({"error": "User not found"}), 404
 
     roadmap = user.get("roadmap", {})
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
-    story = []
-
-    story.append(Paragraph("<b>SkillSync AI Roadmap</b>", styles["Title"]))
-    story.append(Spacer(1, 12))
-    story.append(Paragraph(f"Name: {user.get('name', 'Unknown')}", styles["Normal"]))
-    story.append(Paragraph(f"Goal: {roadmap.get('goal', 'N/A')}", styles["Normal"]))
-    story.append(Spacer(1, 12))
-
-    weeks = roadmap.get("weeks", [])
-    if not weeks:
-        story.append(Paragraph("No roadmap found. Please generate one first.", styles["BodyText"]))
-    else:
-        for week in weeks:
-            story.append(Paragraph(f"<b>{week.get('title', 'Untitled')}</b>", styles["Heading2"]))
-            story.append(Spacer(1, 6))
-            for t in week.get("tasks", []):
-                done = "✅" if t.get("done") else "⬜"
-                story.append(Paragraph(f"{done} {t.get('title', '')}", styles["BodyText"]))
-            story.append(Spacer(1, 6))
-            resources = week.get("resources", [])
-            if resources:
-                story.append(Paragraph("<b>Resources:</b>", styles["Heading4"]))
-                for r in resources:
-                    story.append(Paragraph(f"{r}", styles["BodyText"]))
-            story.append(Spacer(1, 12))
-
-    doc.build(story)
-    buffer.seek(0)
-    return send_file(buffer, as_attachment=True, download_name="SkillSync_Roadmap.pdf", mimetype="application/pdf")
+    name = user.get("name", "Unknown")
+    key = roadmap_fingerprint(name, roadmap)
+    if key in request.if_none_match:
+        return Response(status=304, headers={"ETag": f'"{key}"'})
+
+    try:
+        key, pdf = open_or_render(name, roadmap)
+    except Exception as e:
+        log.exception("PDF render failed: %s", e)
+        return jsonify({"error": "Could not render PDF"}), 500
+    response = send_file(
+        pdf,
+        as_attachment=True,
+        download_name="SkillSync_Roadmap.pdf",
+        mimetype="application/pdf",
+        etag=key,
+        conditional=True,
+        max_age=0,
+    )
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
 # ------------------ Run ------------------
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
+    create_app().run(debug=True, port=5000)
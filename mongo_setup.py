@@ -0,0 +1,214 @@
+import os
+import threading
+
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo import monitoring
+from pymongo.errors import OperationFailure
+
+from observability import MONGO_DURATION, MONGO_FAILURES, end_span, get_logger, start_span
+
+log = get_logger("mongo")
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return int(default)
+
+
+def client_options():
+    """
+    Connection pool settings, overridable per deployment.
+    Each gunicorn worker gets its own client, so the total connections to
+    Atlas is roughly workers * MONGO_MAX_POOL_SIZE.
+    """
+    return {
+        "maxPoolSize": _env_int("MONGO_MAX_POOL_SIZE", "20"),
+        "minPoolSize": _env_int("MONGO_MIN_POOL_SIZE", "0"),
+        "maxIdleTimeMS": _env_int("MONGO_MAX_IDLE_TIME_MS", "60000"),
+        "waitQueueTimeoutMS": _env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"),
+        "connectTimeoutMS": _env_int("MONGO_CONNECT_TIMEOUT_MS", "5000"),
+        "serverSelectionTimeoutMS": _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"),
+        "socketTimeoutMS": _env_int("MONGO_SOCKET_TIMEOUT_MS", "20000"),
+        "readPreference": os.getenv("MONGO_READ_PREFERENCE", "primary"),
+        "retryWrites": True,
+        "appname": os.getenv("MONGO_APP_NAME", "skillsync"),
+        # Don't open sockets at import time; the first query connects.
+        "connect": False,
+    }
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Counts pool events so /healthz can report live connection usage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {
+            "connections_open": 0,
+            "checked_out": 0,
+            "checkouts": 0,
+            "checkout_failures": 0,
+            "pools_cleared": 0,
+        }
+
+    def _bump(self, key, delta=1):
+        with self._lock:
+            self.stats[key] += delta
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._bump("pools_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._bump("connections_open")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._bump("connections_open", -1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._bump("checkout_failures")
+
+    def connection_checked_out(self, event):
+        self._bump("checked_out")
+        self._bump("checkouts")
+
+    def connection_checked_in(self, event):
+        self._bump("checked_out", -1)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+pool_stats = PoolStatsListener()
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Times every command by name and collection, and emits a client span when tracing is on."""
+
+    def __init__(self):
+        self._pending = {}
+
+    @staticmethod
+    def _collection(event):
+        target = event.command.get(event.command_name)
+        if isinstance(target, str):
+            return target
+        return event.command.get("collection", "")  # getMore carries the cursor id instead
+
+    def started(self, event):
+        collection = self._collection(event)
+        s = start_span(f"mongo.{event.command_name}", {
+            "db.system": "mongodb", "db.name": event.database_name,
+            "db.operation": event.command_name, "db.mongodb.collection": collection,
+        })
+        self._pending[(event.connection_id, event.request_id)] = (collection, s)
+
+    def _finish(self, event, error=None):
+        collection, s = self._pending.pop((event.connection_id, event.request_id), ("", None))
+        MONGO_DURATION.observe(event.duration_micros / 1e6, command=event.command_name, collection=collection)
+        if error is not None:
+            MONGO_FAILURES.inc(command=event.command_name, collection=collection)
+            log.debug("%s on %s failed after %.1fms: %s", event.command_name, collection,
+                      event.duration_micros / 1000, error)
+        end_span(s, error)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event, error=RuntimeError(str(event.failure.get("errmsg", event.failure))))
+
+
+command_metrics = CommandMetricsListener()
+
+
+def create_client(uri, **overrides):
+    options = client_options()
+    options.update(overrides)
+    listeners = list(options.pop("event_listeners", [])) + [pool_stats, command_metrics]
+    return MongoClient(uri, event_listeners=listeners, **options)
+
+
+# ------------------ Index Bootstrap ------------------
+INDEXES = {
+    "users": [
+        ([("email", ASCENDING)], {"unique": True, "name": "email_unique"}),
+        # Covers the dashboard's revision probe, so a 304 never loads the user document.
+        ([("email", ASCENDING), ("roadmap_rev", ASCENDING)], {"name": "email_roadmap_rev"}),
+    ],
+    "roadmaps": [
+        ([("email", ASCENDING), ("created_at", DESCENDING)], {"name": "email_created_at"}),
+    ],
+    "daily_plans": [
+        # DailyPlanStore reads and upserts by exactly these fields; unique so two
+        # concurrent generations of the same week update one document.
+        ([("email", ASCENDING), ("roadmap_version", ASCENDING), ("week_index", ASCENDING)],
+         {"unique": True, "name": "email_version_week"}),
+    ],
+    "playlists": [
+        # ingest_playlists.py upserts by url; unique keeps reruns from duplicating the catalog.
+        ([("url", ASCENDING)], {"unique": True, "name": "url_unique"}),
+        ([("language", ASCENDING), ("rating", DESCENDING)], {"name": "language_rating"}),
+        ([("creator", ASCENDING)], {"name": "creator"}),
+        ([("rating", DESCENDING)], {"name": "rating"}),
+    ],
+}
+
+
+def ensure_collection_indexes(collection, specs):
+    """Create one collection's indexes from INDEXES-style specs. Returns False if the server is unreachable."""
+    for keys, options in specs:
+        try:
+            collection.create_index(keys, **options)
+        except OperationFailure as e:
+            # e.g. existing duplicate emails block the unique index; keep serving.
+            log.warning("Could not create index %s on %s: %s", options.get("name"), collection.name, e)
+        except Exception as e:
+            log.warning("Index bootstrap skipped for %s: %s", collection.name, e)
+            return False
+    return True
+
+
+def ensure_indexes(db, collections=None):
+    """Create the indexes the routes depend on. Safe to run on every worker start."""
+    for collection, specs in INDEXES.items():
+        if collections is not None and collection not in collections:
+            continue
+        if not ensure_collection_indexes(db[collection], specs):
+            return
+
+
+def health(db):
+    """Ping the server and report pool settings and usage."""
+    options = client_options()
+    report = {
+        "pool": pool_stats.snapshot(),
+        "config": {
+            "max_pool_size": options["maxPoolSize"],
+            "min_pool_size": options["minPoolSize"],
+            "read_preference": options["readPreference"],
+        },
+    }
+    try:
+        db.command("ping")
+        report["mongo"] = "ok"
+    except Exception as e:
+        report["mongo"] = "error"
+        report["error"] = str(e)
+    return report
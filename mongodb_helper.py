@@ -1,23 +1,224 @@
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+from bson import ObjectId, json_util
+from collections import deque
+import atexit
+import base64
 import datetime
+import threading
+import time
 import uuid
 import os
+from mongo_setup import command_metrics
+from observability import MONGO_BATCH_DOCS, MONGO_BATCH_DURATION, get_logger
+
+log = get_logger("mongodb_helper")
+
+
+def utcnow():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def encode_page_token(value, last_id):
+    """Opaque, URL-safe cursor for fetch_page (extended JSON keeps datetimes and ObjectIds typed)."""
+    return base64.urlsafe_b64encode(json_util.dumps([value, last_id]).encode("utf-8")).decode("ascii")
+
+
+def decode_page_token(token):
+    try:
+        value, last_id = json_util.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid page token")
+    return value, last_id
+
+
+def keyset_filter(sort_field, value, last_id, ascending=True):
+    """
+    Rows after (value, last_id) in (sort_field, _id) order. Null and missing
+    values sort before everything else, and $gt/$lt never match them, so
+    they are matched explicitly: ascending they come first, descending last.
+    """
+    op = "$gt" if ascending else "$lt"
+    same_value = {sort_field: value, "_id": {op: last_id}}
+    if value is None:
+        if ascending:
+            return {"$or": [same_value, {sort_field: {"$ne": None}}]}
+        return same_value
+    branches = [{sort_field: {op: value}}, same_value]
+    if not ascending:
+        branches.append({sort_field: None})
+    return {"$or": branches}
+
+
+class WriteBufferFull(RuntimeError):
+    """Raised when a buffered write waited longer than put_timeout for room."""
+
+
+class BufferedWriter:
+    """
+    Collects writes for one collection and sends them as unordered batches.
+    A batch goes out when it reaches batch_size or the oldest queued write
+    is flush_interval seconds old. Plain dicts are sent with insert_many;
+    if a batch contains pymongo operations (UpdateOne, ...) it uses
+    bulk_write. put() blocks once max_buffer writes are queued.
+    """
+
+    def __init__(self, collection, batch_size=500, flush_interval=0.5, max_buffer=10000,
+                 put_timeout=5.0, max_retries=3):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max(max_buffer, batch_size)
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self._buffer = deque()
+        self._oldest = None
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()  # one batch in flight at a time, in queue order
+        self._closed = False
+        self._latencies = deque(maxlen=512)
+        self.stats_counts = {"batches": 0, "written": 0, "failed": 0, "retries": 0, "blocked_puts": 0}
+        self._thread = threading.Thread(target=self._run, name=f"mongo-writer-{collection.name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ------------------ Producer side ------------------
+    def put(self, op):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BufferedWriter is closed")
+            if len(self._buffer) >= self.max_buffer:
+                self.stats_counts["blocked_puts"] += 1
+                if not self._cond.wait_for(lambda: len(self._buffer) < self.max_buffer or self._closed,
+                                           timeout=self.put_timeout):
+                    raise WriteBufferFull(f"{len(self._buffer)} writes pending for {self.collection.name}")
+                if self._closed:
+                    raise RuntimeError("BufferedWriter is closed")
+            self._buffer.append(op)
+            if len(self._buffer) == 1:
+                self._oldest = time.monotonic()
+                self._cond.notify_all()  # start the flusher's interval timer
+            elif len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+
+    def put_many(self, ops):
+        for op in ops:
+            self.put(op)
+
+    # ------------------ Flushing ------------------
+    def _take(self, limit):
+        with self._cond:
+            batch = [self._buffer.popleft() for _ in range(min(limit, len(self._buffer)))]
+            self._oldest = time.monotonic() if self._buffer else None
+            self._cond.notify_all()  # wake producers waiting for room
+            return batch
+
+    def _write(self, batch):
+        started = time.monotonic()
+        for attempt in range(self.max_retries + 1):
+            try:
+                if all(isinstance(op, dict) for op in batch):
+                    self.collection.insert_many(batch, ordered=False)
+                else:
+                    self.collection.bulk_write([InsertOne(op) if isinstance(op, dict) else op for op in batch],
+                                               ordered=False)
+                failed = 0
+                break
+            except BulkWriteError as e:
+                # Unordered: everything except the reported errors was applied, so don't resend.
+                failed = len(e.details.get("writeErrors", []))
+                log.warning("%d of %d writes to %s rejected: %s", failed, len(batch), self.collection.name,
+                            e.details.get("writeErrors", [{}])[0].get("errmsg"))
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    failed = len(batch)
+                    log.error("Dropping %d writes to %s after %d attempts: %s",
+                              len(batch), self.collection.name, attempt + 1, e)
+                    break
+                self.stats_counts["retries"] += 1
+                time.sleep(min(2.0, 0.1 * (2 ** attempt)))
+        elapsed = time.monotonic() - started
+        self._latencies.append(elapsed)
+        self.stats_counts["batches"] += 1
+        self.stats_counts["written"] += len(batch) - failed
+        self.stats_counts["failed"] += failed
+        MONGO_BATCH_DURATION.observe(elapsed, collection=self.collection.name)
+        MONGO_BATCH_DOCS.inc(len(batch) - failed, collection=self.collection.name, outcome="written")
+        if failed:
+            MONGO_BATCH_DOCS.inc(failed, collection=self.collection.name, outcome="failed")
+        log.debug("Wrote batch of %d to %s in %.1fms", len(batch), self.collection.name, elapsed * 1000)
+
+    def flush(self):
+        """Write everything queued so far before returning."""
+        with self._write_lock:
+            while True:
+                batch = self._take(self.batch_size)
+                if not batch:
+                    return
+                self._write(batch)
+
+    def _due(self):
+        return len(self._buffer) >= self.batch_size or (
+            self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._due():
+                    timeout = None
+                    if self._oldest is not None:
+                        timeout = max(0.0, self.flush_interval - (time.monotonic() - self._oldest))
+                    self._cond.wait(timeout)
+                if self._closed:
+                    return
+            with self._write_lock:
+                batch = self._take(self.batch_size)
+                if batch:
+                    self._write(batch)
+
+    def close(self):
+        """Stop the background flusher and write whatever is left."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def pending(self):
+        return len(self._buffer)
+
+    def stats(self):
+        ordered = sorted(self._latencies)
+
+        def pct(p):
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2) if ordered else None
+
+        return {**self.stats_counts, "pending": self.pending(),
+                "batch_ms_p50": pct(0.50), "batch_ms_p95": pct(0.95), "batch_ms_max": pct(1.0)}
+
 
 class MongoDBHelper:
-    def __init__(self):
+    def __init__(self, buffered=None):
         # 🟢 FIX: Load URI from environment variable
-        MONGO_URI = os.getenv("MONGO_URI") 
+        MONGO_URI = os.getenv("MONGO_URI")
         if not MONGO_URI:
             raise EnvironmentError("MONGO_URI environment variable not set.")
-            
+
         self.client = MongoClient(
             MONGO_URI, # 🟢 USE THE VARIABLE HERE
-            server_api=ServerApi('1')
+            server_api=ServerApi('1'),
+            event_listeners=[command_metrics]
         )
-
-        
-            
+        # Buffered mode batches insert_document/insert_chat; MONGO_BUFFERED_WRITES=1 turns it on by default.
+        if buffered is None:
+            buffered = os.getenv("MONGO_BUFFERED_WRITES", "").lower() in ("1", "true", "yes")
+        self.buffered = buffered
+        self.writer = None
 
     def select_db(self, db_name='SkillSyncDB', collection='playlists'):
         """
@@ -26,48 +227,120 @@ class MongoDBHelper:
         """
         self.db = self.client[db_name]
         self.collection = self.db[collection]
-        print(f'[MongoDBHelper] ✅ DB "{db_name}" Collection "{collection}" Selected')
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.buffered:
+            self.writer = BufferedWriter(
+                self.collection,
+                batch_size=int(os.getenv("MONGO_WRITE_BATCH_SIZE", "500")),
+                flush_interval=float(os.getenv("MONGO_WRITE_FLUSH_MS", "500")) / 1000,
+                max_buffer=int(os.getenv("MONGO_WRITE_MAX_BUFFER", "10000")),
+            )
+        log.debug('DB "%s" Collection "%s" selected', db_name, collection)
 
-    def insert_document(self, data: dict):
+    def insert_document(self, data: dict, now=None):
         """
         Insert any type of document into current collection.
+        In buffered mode the write is queued and the pre-assigned _id returned.
         """
-        data["created_at"] = datetime.datetime.utcnow()
+        data["created_at"] = now or utcnow()
+        if self.writer is not None:
+            data.setdefault("_id", ObjectId())
+            self.writer.put(data)
+            return data["_id"]
         result = self.collection.insert_one(data)
-        print(f'[MongoDBHelper] 📌 Document inserted into "{self.collection.name}"')
+        log.debug('Document inserted into "%s"', self.collection.name)
         return result.inserted_id
 
     def insert_chat(self, session_id: str, role: str, message: str):
         """
         Special helper for chat storage.
         """
+        now = utcnow()
         doc = {
             "session_id": session_id,
             "role": role,
             "message": message,
-            "timestamp": datetime.datetime.utcnow()
+            "timestamp": now
         }
-        return self.insert_document(doc)
+        return self.insert_document(doc, now=now)
+
+    def flush(self):
+        """Write any buffered documents now (no-op when not buffered)."""
+        if self.writer is not None:
+            self.writer.flush()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.client.close()
 
-    def fetch_documents(self, query: dict = {}, limit=20, sort_field="created_at", ascending=True):
+    def fetch_documents(self, query: dict = None, limit=20, sort_field="created_at", ascending=True, projection=None):
         """
         Fetch documents from current collection.
         """
-        order = 1 if ascending else -1
-        documents = list(
-            self.collection.find(query)
-                           .sort(sort_field, order)
-                           .limit(limit)
-        )
-        print(f'[MongoDBHelper] 📂 {len(documents)} docs fetched from "{self.collection.name}"')
+        documents = list(self.iter_documents(query, projection=projection, sort_field=sort_field,
+                                             ascending=ascending, batch_size=limit, limit=limit))
+        log.debug('%d docs fetched from "%s"', len(documents), self.collection.name)
         return documents
 
+    def iter_documents(self, query: dict = None, projection=None, sort_field="created_at", ascending=True,
+                       batch_size=500, limit=0):
+        """
+        Stream documents from the server `batch_size` at a time instead of
+        building a list. sort_field=None keeps natural order (no sort stage).
+        """
+        cursor = self.collection.find(query or {}, projection).batch_size(batch_size)
+        if sort_field:
+            order = 1 if ascending else -1
+            cursor = cursor.sort([(sort_field, order), ("_id", order)])
+        if limit:
+            cursor = cursor.limit(limit)
+        try:
+            for doc in cursor:
+                yield doc
+        finally:
+            cursor.close()
+
+    def fetch_page(self, query: dict = None, page_size=20, after=None, sort_field="created_at", ascending=True,
+                   projection=None):
+        """
+        Keyset pagination on (sort_field, _id). Returns (documents, next_token);
+        pass next_token back as `after` for the following page, None means done.
+        Each page is one indexed range scan, so page 1000 costs the same as
+        page 1 (index the collection on the query fields + sort_field + _id).
+        Documents with a null or missing sort_field are included, in Mongo's
+        sort order (before every other value).
+        """
+        order = 1 if ascending else -1
+        filters = [query] if query else []
+        if after:
+            value, last_id = decode_page_token(after)
+            filters.append(keyset_filter(sort_field, value, last_id, ascending))
+        if projection and any(v for k, v in projection.items() if k != "_id"):
+            projection = {**projection, sort_field: 1}
+        if projection and not projection.get("_id", 1):
+            projection = {**projection, "_id": 1}  # needed for the token
+
+        cursor = (self.collection.find({"$and": filters} if len(filters) > 1 else (filters[0] if filters else {}),
+                                       projection)
+                  .sort([(sort_field, order), ("_id", order)])
+                  .limit(page_size + 1))
+        documents = list(cursor)
+        next_token = None
+        if len(documents) > page_size:
+            documents = documents[:page_size]
+            last = documents[-1]
+            next_token = encode_page_token(last.get(sort_field), last["_id"])
+        return documents, next_token
+
     def update_document(self, query: dict, update_data: dict):
         """
         Update single document based on query.
         """
         result = self.collection.update_one(query, {"$set": update_data})
-        print(f'[MongoDBHelper] ✏️ Document update matched={result.matched_count}, modified={result.modified_count}')
+        log.debug("Document update matched=%d, modified=%d", result.matched_count, result.modified_count)
         return result.modified_count
 
     def get_new_session_id(self):
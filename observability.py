@@ -0,0 +1,302 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# ------------------ Logging ------------------
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+_logging_configured = False
+_logging_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; anything passed via `extra=` becomes a field."""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=None, fmt=None):
+    """
+    Set up the `skillsync` logger tree once per process.
+    LOG_LEVEL (default INFO) and LOG_FORMAT (text or json) come from the
+    environment. Messages use %-style args, so disabled levels cost one
+    integer comparison.
+    """
+    global _logging_configured
+    with _logging_lock:
+        if _logging_configured:
+            return
+        root = logging.getLogger("skillsync")
+        root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+        handler = logging.StreamHandler()
+        if (fmt or os.getenv("LOG_FORMAT", "text")).lower() == "json":
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+        root.addHandler(handler)
+        root.propagate = False
+        _logging_configured = True
+
+
+def get_logger(name):
+    configure_logging()
+    return logging.getLogger(f"skillsync.{name}")
+
+
+# ------------------ Metrics ------------------
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape_label(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = [(k, list(s[0]), s[1], s[2]) for k, s in self._values.items()]
+        lines = self.header()
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = f'le="{_format_value(float(bound)) if bound != float("inf") else "+Inf"}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+REGISTRY = []
+
+
+def render_metrics():
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUESTS = Counter("skillsync_http_requests_total", "HTTP requests served.", ("route", "method", "status"))
+HTTP_DURATION = Histogram("skillsync_http_request_duration_seconds", "HTTP request latency.", ("route", "method"))
+HTTP_IN_FLIGHT = Gauge("skillsync_http_requests_in_flight", "HTTP requests currently being handled.", ("route",))
+MONGO_DURATION = Histogram("skillsync_mongo_command_duration_seconds", "MongoDB command latency.",
+                           ("command", "collection"), buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+MONGO_FAILURES = Counter("skillsync_mongo_command_failures_total", "Failed MongoDB commands.", ("command", "collection"))
+MONGO_BATCH_DURATION = Histogram("skillsync_mongo_batch_write_seconds", "Buffered writer batch latency.", ("collection",),
+                                 buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+MONGO_BATCH_DOCS = Counter("skillsync_mongo_batch_documents_total", "Documents written by buffered writers.",
+                           ("collection", "outcome"))
+AUTH_HASH_DURATION = Histogram("skillsync_auth_hash_seconds", "Password hash/verify latency including pool wait.", ("op",))
+AUTH_HASH_REJECTED = Counter("skillsync_auth_hash_rejected_total", "Password hashes refused because the pool was full.", ("op",))
+AUTH_THROTTLED = Counter("skillsync_auth_throttled_total", "Auth requests rejected by the rate limiter.", ("route", "scope"))
+LLM_DURATION = Histogram("skillsync_llm_request_duration_seconds", "LLM call latency including retries.", ("route", "outcome"))
+LLM_TOKENS = Counter("skillsync_llm_tokens_total", "LLM tokens used.", ("route", "kind"))
+LLM_ERRORS = Counter("skillsync_llm_errors_total", "LLM calls that failed after retries.", ("route", "error"))
+LLM_RETRIES = Counter("skillsync_llm_retries_total", "LLM call retries.", ("route",))
+LLM_COALESCED = Counter("skillsync_llm_coalesced_total", "LLM calls served by an identical in-flight call.", ("route",))
+LLM_IN_FLIGHT = Gauge("skillsync_llm_requests_in_flight", "LLM calls holding a concurrency slot.")
+LLM_QUEUED = Gauge("skillsync_llm_requests_queued", "LLM calls waiting for a rate-limit token or slot.")
+
+
+# ------------------ Tracing ------------------
+_NO_SPAN = nullcontext()
+_tracer = None
+_tracer_ready = False
+_tracer_lock = threading.Lock()
+
+
+def _setup_tracer():
+    """
+    OpenTelemetry is used only when OTEL_EXPORTER_OTLP_ENDPOINT (export via
+    OTLP/HTTP) or OTEL_TRACES_ENABLED (use the globally configured provider)
+    is set; otherwise every span helper is a no-op.
+    """
+    endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+    if not endpoint and os.getenv("OTEL_TRACES_ENABLED", "").lower() not in ("1", "true", "yes"):
+        return None
+    try:
+        from opentelemetry import trace
+        if endpoint:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            provider = TracerProvider(resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "skillsync")}))
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            trace.set_tracer_provider(provider)
+        return trace.get_tracer("skillsync")
+    except Exception as e:
+        get_logger("tracing").warning("OpenTelemetry disabled: %s", e)
+        return None
+
+
+def get_tracer():
+    global _tracer, _tracer_ready
+    if not _tracer_ready:
+        with _tracer_lock:
+            if not _tracer_ready:
+                _tracer = _setup_tracer()
+                _tracer_ready = True
+    return _tracer
+
+
+def span(name, attributes=None):
+    """Context manager for a child span of the current one; a shared no-op when tracing is off."""
+    tracer = get_tracer()
+    if tracer is None:
+        return _NO_SPAN
+    return tracer.start_as_current_span(name, attributes=attributes)
+
+
+def start_span(name, attributes=None):
+    """Detached span for work that outlives a `with` block (streams, listener callbacks). May be None."""
+    tracer = get_tracer()
+    return tracer.start_span(name, attributes=attributes) if tracer is not None else None
+
+
+def end_span(s, error=None):
+    if s is None:
+        return
+    if error is not None:
+        from opentelemetry.trace import Status, StatusCode
+        s.record_exception(error)
+        s.set_status(Status(StatusCode.ERROR, str(error)))
+    s.end()
+
+
+# ------------------ Flask ------------------
+def instrument_app(app):
+    """Per-route latency histogram, request counter, in-flight gauge and a server span per request."""
+    from flask import g, request
+
+    log = get_logger("http")
+
+    @app.before_request
+    def _start_request():
+        g._obs_route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        g._obs_started = time.perf_counter()
+        g._obs_status = 500
+        HTTP_IN_FLIGHT.inc(route=g._obs_route)
+        tracer = get_tracer()
+        if tracer is not None:
+            from opentelemetry import context, trace
+            s = tracer.start_span(f"{request.method} {g._obs_route}", kind=trace.SpanKind.SERVER,
+                                  attributes={"http.method": request.method, "http.route": g._obs_route})
+            g._obs_span = s
+            g._obs_token = context.attach(trace.set_span_in_context(s))
+
+    @app.after_request
+    def _record_status(response):
+        g._obs_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _finish_request(error=None):
+        started = g.pop("_obs_started", None)
+        if started is None:
+            return
+        route, status = g._obs_route, g._obs_status
+        elapsed = time.perf_counter() - started
+        HTTP_IN_FLIGHT.dec(route=route)
+        HTTP_DURATION.observe(elapsed, route=route, method=request.method)
+        HTTP_REQUESTS.inc(route=route, method=request.method, status=status)
+        s = g.pop("_obs_span", None)
+        if s is not None:
+            from opentelemetry import context
+            s.set_attribute("http.status_code", status)
+            context.detach(g.pop("_obs_token"))
+            end_span(s, error)
+        log.debug("%s %s -> %s in %.1fms", request.method, route, status, elapsed * 1000)
+
+    return app
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from observability import get_logger
+
+log = get_logger("pdf")
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "skillsync_pdf"))
+PDF_CACHE_MAX_FILES = int(os.getenv("PDF_CACHE_MAX_FILES", "500"))
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+# Bump when the layout below changes so old cached files are not served.
+PDF_LAYOUT_VERSION = "1"
+
+_styles = None
+_styles_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=PDF_RENDER_WORKERS, thread_name_prefix="skillsync-pdf")
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def get_styles():
+    """Build the reportlab stylesheet once per process."""
+    global _styles
+    if _styles is None:
+        with _styles_lock:
+            if _styles is None:
+                from reportlab.lib.styles import getSampleStyleSheet  # deferred: reportlab is only needed on a cache miss
+                _styles = getSampleStyleSheet()
+    return _styles
+
+
+def roadmap_fingerprint(name, roadmap):
+    """Hash of everything that shows up in the PDF; doubles as the ETag."""
+    roadmap = roadmap or {}
+    content = {
+        "v": PDF_LAYOUT_VERSION,
+        "name": name,
+        "goal": roadmap.get("goal"),
+        "weeks": [
+            {
+                "title": w.get("title"),
+                "tasks": [[t.get("title"), bool(t.get("done"))] for t in w.get("tasks", [])],
+                "resources": w.get("resources", []),
+            }
+            for w in roadmap.get("weeks", [])
+        ],
+    }
+    blob = json.dumps(content, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def cache_path(key):
+    return os.path.join(PDF_CACHE_DIR, f"{key}.pdf")
+
+
+def _escape(text):
+    return str(text).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def build_story(name, roadmap):
+    from reportlab.platypus import Paragraph, Spacer
+    styles = get_styles()
+    roadmap = roadmap or {}
+    story = []
+
+    story.append(Paragraph("<b>SkillSync AI Roadmap</b>", styles["Title"]))
+    story.append(Spacer(1, 12))
+    story.append(Paragraph(f"Name: {_escape(name)}", styles["Normal"]))
+    story.append(Paragraph(f"Goal: {_escape(roadmap.get('goal', 'N/A'))}", styles["Normal"]))
+    story.append(Spacer(1, 12))
+
+    weeks = roadmap.get("weeks", [])
+    if not weeks:
+        story.append(Paragraph("No roadmap found. Please generate one first.", styles["BodyText"]))
+        return story
+    for week in weeks:
+        story.append(Paragraph(f"<b>{_escape(week.get('title', 'Untitled'))}</b>", styles["Heading2"]))
+        story.append(Spacer(1, 6))
+        for t in week.get("tasks", []):
+            done = "✅" if t.get("done") else "⬜"
+            story.append(Paragraph(f"{done} {_escape(t.get('title', ''))}", styles["BodyText"]))
+        story.append(Spacer(1, 6))
+        resources = week.get("resources", [])
+        if resources:
+            story.append(Paragraph("<b>Resources:</b>", styles["Heading4"]))
+            for r in resources:
+                story.append(Paragraph(_escape(r), styles["BodyText"]))
+        story.append(Spacer(1, 12))
+    return story
+
+
+def _render_to_file(key, name, roadmap):
+    """Render straight to disk (no in-memory buffer) and publish atomically."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    final = cache_path(key)
+    fd, tmp = tempfile.mkstemp(suffix=".pdf.tmp", dir=PDF_CACHE_DIR)
+    os.close(fd)
+    try:
+        SimpleDocTemplate(tmp, pagesize=A4).build(build_story(name, roadmap))
+        os.replace(tmp, final)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    _prune()
+    return final
+
+
+def _prune():
+    try:
+        names = [f for f in os.listdir(PDF_CACHE_DIR) if f.endswith(".pdf")]
+    except OSError as e:
+        log.warning("Cache prune failed: %s", e)
+        return
+    if len(names) <= PDF_CACHE_MAX_FILES:
+        return
+    entries = []
+    for name in names:
+        path = os.path.join(PDF_CACHE_DIR, name)
+        try:
+            entries.append((os.path.getmtime(path), path))
+        except OSError:
+            pass  # already pruned by another worker
+    entries.sort()
+    for _, path in entries[:len(entries) - PDF_CACHE_MAX_FILES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _open_cached(path):
+    """Open a cached PDF, or None if it isn't there. An open file survives a concurrent prune."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(path)  # keep recently used files out of the prune window
+    except OSError:
+        pass
+    return f
+
+
+def open_or_render(name, roadmap, timeout=60, attempts=3):
+    """
+    Return (key, file) for the roadmap PDF, opened for reading; the caller closes it.
+    Cache hits are an open() call. Misses render on the PDF pool; concurrent
+    requests for the same content wait on the same render. The file is
+    opened rather than returned by path so a prune in another request can't
+    delete it between the check and the send.
+    """
+    key = roadmap_fingerprint(name, roadmap)
+    path = cache_path(key)
+    for _ in range(attempts):
+        f = _open_cached(path)
+        if f is not None:
+            return key, f
+        with _inflight_lock:
+            future = _inflight.get(key)
+            if future is None:
+                future = _executor.submit(_render_to_file, key, name, roadmap)
+                _inflight[key] = future
+                future.add_done_callback(lambda _f: _inflight.pop(key, None))
+        future.result(timeout=timeout)
+    raise RuntimeError("Rendered PDF was pruned before it could be served.")
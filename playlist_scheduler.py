@@ -0,0 +1,242 @@
+import os
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+
+from observability import get_logger
+
+log = get_logger("playlist_index")
+
+# Used when only a playlist's total length is known.
+DEFAULT_SEGMENT_MINUTES = 30
+# A video being split never leaves a part shorter than this at the end of a day.
+MIN_PART_MINUTES = 5
+
+
+def parse_minutes(value):
+    """Accept minutes as a number or an 'H:MM:SS' / 'MM:SS' string."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    parts = str(value).strip().split(":")
+    try:
+        nums = [float(p) for p in parts]
+    except ValueError:
+        return None
+    seconds = 0.0
+    for n in nums:
+        seconds = seconds * 60 + n
+    return seconds / 60 if len(nums) > 1 else nums[0]
+
+
+def parse_hours(value):
+    """Accept hours as a number or an 'H:MM:SS' / 'H:MM' duration string."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    parts = str(value).strip().split(":")
+    try:
+        nums = [float(p) for p in parts]
+    except ValueError:
+        return None
+    if len(nums) > 3:
+        return None
+    nums += [0.0] * (3 - len(nums))
+    return nums[0] + nums[1] / 60 + nums[2] / 3600
+
+
+def video_minutes(video):
+    if "duration_minutes" in video:
+        return parse_minutes(video["duration_minutes"])
+    if "duration_seconds" in video:
+        return float(video["duration_seconds"]) / 60
+    return parse_minutes(video.get("duration"))
+
+
+class PlaylistIndex:
+    """
+    In-memory view of the playlists collection, keyed by URL.
+    Loaded once and refreshed after `ttl_seconds`, so planning never does
+    a network round trip per call. `loader` returns an iterable of docs.
+    """
+
+    def __init__(self, loader, ttl_seconds=600):
+        self._loader = loader
+        self.ttl_seconds = ttl_seconds
+        self._by_url = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        by_url = {}
+        for doc in self._loader():
+            if doc.get("url"):
+                by_url[doc["url"]] = doc
+        with self._lock:
+            self._by_url = by_url
+            self._loaded_at = time.monotonic()
+        return len(by_url)
+
+    def get(self, url):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds:
+            try:
+                self.refresh()
+            except Exception as e:
+                log.warning("Refresh failed, serving cached entries: %s", e)
+                with self._lock:
+                    self._loaded_at = time.monotonic()
+        return self._by_url.get(url)
+
+    def __len__(self):
+        return len(self._by_url)
+
+
+def expand_videos(playlist, meta=None):
+    """
+    Per-video (title, url, minutes) list for a playlist, taken from, in order:
+    its own 'videos', the index entry's 'videos', the index entry's
+    video_count/avg_video_minutes, or a total 'hours' split into segments.
+    """
+    meta = meta or {}
+    videos = playlist.get("videos") or meta.get("videos")
+    if videos:
+        out = []
+        for i, v in enumerate(videos):
+            minutes = video_minutes(v)
+            if minutes and minutes > 0:
+                out.append((v.get("title") or f"Video {i + 1}", v.get("url") or playlist.get("url"), minutes))
+        return out
+    count = meta.get("video_count")
+    avg = parse_minutes(meta.get("avg_video_minutes"))
+    if count and avg:
+        return [(f"Video {i + 1}", playlist.get("url"), avg) for i in range(int(count))]
+    hours = parse_hours(playlist.get("hours") or meta.get("total_hours"))
+    if hours:
+        total = hours * 60
+        out, i = [], 0
+        while total > 0:
+            chunk = min(DEFAULT_SEGMENT_MINUTES, total)
+            out.append((f"Part {i + 1}", playlist.get("url"), chunk))
+            total -= chunk
+            i += 1
+        return out
+    return []
+
+
+def _next_study_day(day, skip_weekends):
+    day += timedelta(days=1)
+    while skip_weekends and day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+
+def build_schedule(playlists, hours_per_day, start_date=None, skip_weekends=False, index=None, max_days=3650):
+    """
+    Pack playlist videos into a day-by-day plan.
+    Each day holds at most hours_per_day of video. Playlists are interleaved
+    fairly: the next slot goes to the playlist with the fewest minutes
+    scheduled so far whose next video still fits today. A video longer than
+    a whole day is split into parts that fill whatever is left of each day.
+    Anything past max_days is reported as unscheduled_minutes rather than
+    dropped silently. Runs in O(videos * playlists).
+    """
+    capacity = float(hours_per_day) * 60
+    if capacity <= 0:
+        raise ValueError("hours_per_day must be positive")
+
+    names, queues = [], []
+    for i, p in enumerate(playlists):
+        meta = index.get(p.get("url")) if index is not None and p.get("url") else None
+        videos = expand_videos(p, meta)
+        if videos:
+            names.append(p.get("title") or (meta or {}).get("title") or p.get("url") or f"Playlist {i + 1}")
+            # [title, url, minutes left, next part number, needs splitting]
+            queues.append(deque([title, url, minutes, 1, minutes > capacity + 1e-9] for title, url, minutes in videos))
+    scheduled = [0.0] * len(queues)
+
+    day = start_date or datetime.now(timezone.utc).date()
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    while skip_weekends and day.weekday() >= 5:
+        day += timedelta(days=1)
+
+    schedule = []
+    items, used = [], 0.0
+    while any(queues) and len(schedule) < max_days:
+        remaining = capacity - used
+        # Candidates: a next video that fits whole, or one that has to be split anyway
+        # (as long as today has room for a sensible part).
+        can_split = remaining >= min(MIN_PART_MINUTES, capacity) - 1e-9
+        best = None
+        for i, q in enumerate(queues):
+            if q and (q[0][2] <= remaining + 1e-9 or (q[0][4] and can_split)):
+                if best is None or scheduled[i] < scheduled[best]:
+                    best = i
+        if best is None:
+            # Nothing else fits: close the day.
+            schedule.append({"date": day.isoformat(), "items": items, "minutes": round(used, 1)})
+            items, used = [], 0.0
+            day = _next_study_day(day, skip_weekends)
+            continue
+        head = queues[best][0]
+        title, url, minutes, part, split = head
+        if minutes <= remaining + 1e-9:
+            queues[best].popleft()
+            label = f"{title} (part {part})" if split else title
+        else:
+            minutes = remaining
+            head[2] -= minutes
+            head[3] += 1
+            label = f"{title} (part {part})"
+        items.append({"playlist": names[best], "title": label, "url": url, "minutes": round(minutes, 1)})
+        scheduled[best] += minutes
+        used += minutes
+    if items:
+        schedule.append({"date": day.isoformat(), "items": items, "minutes": round(used, 1)})
+
+    total = sum(scheduled)
+    unscheduled = sum(video[2] for q in queues for video in q)
+    if unscheduled:
+        log.warning("Schedule hit max_days=%d with %.1f minutes of video left unscheduled", max_days, unscheduled)
+    summary = (
+        f"{len(names)} playlists, {round(total / 60, 1)} hours of video over {len(schedule)} study days "
+        f"at {hours_per_day} h/day{' (weekdays only)' if skip_weekends else ''}."
+    )
+    if unscheduled:
+        summary += f" {round(unscheduled / 60, 1)} hours did not fit in {max_days} days."
+    return {
+        "schedule": schedule,
+        "days": len(schedule),
+        "total_minutes": round(total, 1),
+        "unscheduled_minutes": round(unscheduled, 1),
+        "truncated": bool(unscheduled),
+        "per_playlist_minutes": {names[i]: round(m, 1) for i, m in enumerate(scheduled)},
+        "schedule_summary": summary,
+    }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_playlist_index():
+    """Process-wide index over SkillSyncDB.playlists; empty if Mongo isn't configured."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                helper = []
+
+                def load():
+                    if not os.getenv("MONGO_URI"):
+                        return []
+                    if not helper:
+                        from mongodb_helper import MongoDBHelper
+                        helper.append(MongoDBHelper())
+                        helper[0].select_db("SkillSyncDB", "playlists")
+                    return helper[0].iter_documents(projection={"_id": 0}, sort_field=None)
+                _index = PlaylistIndex(load, ttl_seconds=int(os.getenv("PLAYLIST_INDEX_TTL", "600")))
+    return _index
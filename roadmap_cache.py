@@ -0,0 +1,175 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from observability import get_logger
+
+log = get_logger("roadmap_cache")
+
+
+def normalize_key_parts(goal, skills, hours_per_day, months, model, prompt_version):
+    """Normalize roadmap inputs so equivalent requests map to the same key."""
+    goal_norm = " ".join(str(goal or "").split()).lower()
+    if isinstance(skills, str):
+        skills = skills.split(",")
+    skills_norm = sorted({" ".join(str(s).split()).lower() for s in (skills or []) if str(s).strip()})
+    return {
+        "goal": goal_norm,
+        "skills": skills_norm,
+        "hours": int(hours_per_day),
+        "months": int(months),
+        "model": model,
+        "prompt_version": prompt_version,
+    }
+
+
+def make_cache_key(goal, skills, hours_per_day, months, model, prompt_version):
+    """Content-addressed key: sha256 of the normalized request tuple."""
+    parts = normalize_key_parts(goal, skills, hours_per_day, months, model, prompt_version)
+    blob = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class RoadmapCache:
+    """
+    Two-tier cache for generated roadmaps.
+    Tier 1: in-process LRU with TTL eviction.
+    Tier 2: Mongo collection shared by all workers (optional).
+    The in-process TTL is kept short so invalidations made on one worker
+    reach the others without any cross-process messaging.
+    """
+
+    def __init__(self, collection=None, max_entries=256, ttl_seconds=7 * 24 * 3600, memory_ttl_seconds=600):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.memory_ttl_seconds = min(memory_ttl_seconds, ttl_seconds)
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "memory_hits": 0, "mongo_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def ensure_indexes(self):
+        """TTL index so Mongo expires stale entries, plus a goal index for invalidation."""
+        if self.collection is None:
+            return
+        try:
+            self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self.collection.create_index("goal")
+        except Exception as e:
+            log.warning("Index creation failed: %s", e)
+
+    # ------------------ In-process tier ------------------
+    def _lru_get(self, key):
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                return None
+            expires_at, goal, roadmap = entry
+            if expires_at < time.monotonic():
+                del self._lru[key]
+                self.stats["evictions"] += 1
+                return None
+            self._lru.move_to_end(key)
+            return roadmap
+
+    def _lru_put(self, key, goal, roadmap):
+        with self._lock:
+            self._lru[key] = (time.monotonic() + self.memory_ttl_seconds, goal, roadmap)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    # ------------------ Public API ------------------
+    def get(self, key):
+        """Return a deep copy of the cached roadmap or None."""
+        roadmap = self._lru_get(key)
+        if roadmap is not None:
+            self.stats["hits"] += 1
+            self.stats["memory_hits"] += 1
+            return json.loads(roadmap)
+
+        if self.collection is not None:
+            try:
+                doc = self.collection.find_one({"_id": key}, {"roadmap": 1, "goal": 1, "expires_at": 1})
+            except Exception as e:
+                log.warning("Mongo read failed: %s", e)
+                doc = None
+            if doc and _not_expired(doc.get("expires_at")):
+                blob = json.dumps(doc["roadmap"])
+                self._lru_put(key, doc.get("goal"), blob)
+                self.stats["hits"] += 1
+                self.stats["mongo_hits"] += 1
+                return json.loads(blob)
+
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key, goal, roadmap):
+        """Store a roadmap in both tiers. The stored copy is isolated from later mutation."""
+        blob = json.dumps(roadmap)
+        goal_norm = " ".join(str(goal or "").split()).lower()
+        self._lru_put(key, goal_norm, blob)
+        self.stats["stores"] += 1
+        if self.collection is not None:
+            now = datetime.now(timezone.utc)
+            try:
+                self.collection.replace_one(
+                    {"_id": key},
+                    {
+                        "_id": key,
+                        "goal": goal_norm,
+                        "roadmap": json.loads(blob),
+                        "created_at": now,
+                        "expires_at": datetime.fromtimestamp(now.timestamp() + self.ttl_seconds, timezone.utc),
+                    },
+                    upsert=True,
+                )
+            except Exception as e:
+                log.warning("Mongo write failed: %s", e)
+
+    def invalidate_goal(self, goal):
+        """
+        Drop every cached roadmap for a goal. Returns the number of distinct
+        keys removed; an entry held in both tiers counts once.
+        """
+        goal_norm = " ".join(str(goal or "").split()).lower()
+        with self._lock:
+            removed = {k for k, v in self._lru.items() if v[1] == goal_norm}
+            for key in removed:
+                del self._lru[key]
+        if self.collection is not None:
+            try:
+                keys = [doc["_id"] for doc in self.collection.find({"goal": goal_norm}, {"_id": 1})]
+                if keys:
+                    self.collection.delete_many({"_id": {"$in": keys}})
+                removed.update(keys)
+            except Exception as e:
+                log.warning("Mongo invalidation failed: %s", e)
+        return len(removed)
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+        if self.collection is not None:
+            self.collection.delete_many({})
+
+    def snapshot(self):
+        """Counters plus current in-memory size, for admin/metrics views."""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return dict(
+            self.stats,
+            size=len(self._lru),
+            hit_ratio=round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+        )
+
+
+def _not_expired(expires_at):
+    if expires_at is None:
+        return True
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return expires_at > datetime.now(timezone.utc)
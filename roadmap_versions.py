@@ -0,0 +1,142 @@
+import copy
+import json
+from datetime import datetime, timezone
+
+import jsonpatch
+from pymongo import ASCENDING, DESCENDING
+
+from observability import get_logger
+
+log = get_logger("roadmap_versions")
+
+# Fields added after generation (dates, progress counters, task state) are not
+# part of a version's content; they would turn every diff into noise.
+VOLATILE_ROADMAP_KEYS = ("progress", "generating")
+VOLATILE_WEEK_KEYS = ("start_date_str", "end_date_str", "task_count", "done_count")
+
+
+def normalize_for_history(roadmap):
+    """Copy of the generated content of a roadmap, without per-user state."""
+    if not roadmap:
+        return None
+    content = copy.deepcopy(roadmap)
+    content.pop("_id", None)
+    for key in VOLATILE_ROADMAP_KEYS:
+        content.pop(key, None)
+    for week in content.get("weeks", []):
+        for key in VOLATILE_WEEK_KEYS:
+            week.pop(key, None)
+        for task in week.get("tasks", []):
+            if isinstance(task, dict):
+                task["done"] = False
+    return content
+
+
+def _size(obj):
+    return len(json.dumps(obj, separators=(",", ":"), default=str))
+
+
+class RoadmapVersionStore:
+    """
+    Version history for each user's roadmap.
+    The current version lives only in users.roadmap. This collection holds
+    one small record per version: a JSON patch from the previous version,
+    or a full snapshot on the first version and every `snapshot_every`
+    versions after that, so rebuilding a version never replays a long chain.
+    """
+
+    def __init__(self, collection, snapshot_every=10):
+        self.collection = collection
+        self.snapshot_every = max(1, snapshot_every)
+
+    def ensure_indexes(self):
+        try:
+            self.collection.create_index(
+                [("email", ASCENDING), ("version", DESCENDING)],
+                unique=True,
+                name="email_version",
+                partialFilterExpression={"version": {"$exists": True}},
+            )
+        except Exception as e:
+            log.warning("Index creation failed: %s", e)
+
+    # ------------------ Writes ------------------
+    def record(self, email, new_roadmap, version):
+        """
+        Store new_roadmap as the user's `version`, once users.roadmap holds it.
+        The number comes from the users update (so two concurrent saves can't
+        claim the same one) and an existing record for it, left by a save
+        whose users update never landed, is replaced. The delta is taken
+        against the rebuilt previous version, not users.roadmap, so a
+        half-written roadmap (e.g. an interrupted stream) can't corrupt the chain.
+        """
+        new_content = normalize_for_history(new_roadmap)
+        doc = {
+            "email": email,
+            "version": version,
+            "goal": new_content.get("goal"),
+            "weeks": len(new_content.get("weeks", [])),
+            "created_at": datetime.now(timezone.utc),
+        }
+
+        patch = None
+        if version > 1 and (version - 1) % self.snapshot_every != 0:
+            prev_content = self.get_version(email, version - 1)
+            if prev_content is not None:
+                patch = jsonpatch.make_patch(prev_content, new_content).patch
+                if _size(patch) >= _size(new_content):
+                    patch = None
+        if patch is None:
+            doc.update({"kind": "snapshot", "roadmap": new_content})
+        else:
+            doc.update({"kind": "delta", "patch": patch})
+        self.collection.replace_one({"email": email, "version": version}, doc, upsert=True)
+        return version
+
+    # ------------------ Reads ------------------
+    def latest_version(self, email):
+        doc = self.collection.find_one(
+            {"email": email, "version": {"$exists": True}},
+            {"version": 1},
+            sort=[("version", DESCENDING)],
+        )
+        return doc["version"] if doc else 0
+
+    def list_versions(self, email, limit=50):
+        cursor = self.collection.find(
+            {"email": email, "version": {"$exists": True}},
+            {"_id": 0, "version": 1, "kind": 1, "goal": 1, "weeks": 1, "created_at": 1},
+        ).sort("version", DESCENDING).limit(limit)
+        return list(cursor)
+
+    def get_version(self, email, version):
+        """Rebuild a version from its nearest snapshot plus the patches after it."""
+        snapshot = self.collection.find_one(
+            {"email": email, "kind": "snapshot", "version": {"$lte": version}},
+            {"version": 1, "roadmap": 1},
+            sort=[("version", DESCENDING)],
+        )
+        if snapshot is None:
+            return None
+        content = snapshot["roadmap"]
+        if snapshot["version"] == version:
+            return content
+        deltas = self.collection.find(
+            {"email": email, "kind": "delta", "version": {"$gt": snapshot["version"], "$lte": version}},
+            {"version": 1, "patch": 1},
+        ).sort("version", ASCENDING)
+        expected = snapshot["version"] + 1
+        for delta in deltas:
+            if delta["version"] != expected:
+                return None
+            content = jsonpatch.apply_patch(content, delta["patch"])
+            expected += 1
+        return content if expected == version + 1 else None
+
+    def diff(self, email, from_version, to_version):
+        """JSON patch turning from_version into to_version, or None if either is missing."""
+        old = self.get_version(email, from_version)
+        new = self.get_version(email, to_version)
+        if old is None or new is None:
+            return None
+        return jsonpatch.make_patch(old, new).patch
@@ -0,0 +1,364 @@
+"""
+Static asset build and serving.
+
+    python static_assets.py            # build static/dist and print sizes
+
+The build minifies CSS/JS, writes each asset under a content-hashed name in
+static/dist/ with .gz (and .br when the optional `brotli` package is
+installed) siblings, and records the mapping in static/dist/manifest.json.
+At runtime url_for('static', filename='script.js') resolves to the hashed
+name, which is served with an immutable year-long Cache-Control and the
+best precompressed variant the client accepts. Workers rebuild on startup
+when a source file changed (STATIC_BUILD=auto, the default).
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+import threading
+
+from observability import get_logger
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip variants are built
+    brotli = None
+
+log = get_logger("static_assets")
+
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+MIN_COMPRESS_BYTES = 512
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".txt", ".html", ".map")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+# ------------------ Minification ------------------
+_CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(/\*.*?\*/)', re.S)
+
+
+def _squeeze_css(chunk):
+    chunk = re.sub(r"\s+", " ", chunk)
+    return re.sub(r" ?([{};,]) ?", r"\1", chunk).replace(";}", "}")
+
+
+def minify_css(text):
+    """Drop comments and collapse whitespace outside strings; keeps rule structure intact."""
+    out, code, last = [], [], 0
+    for m in _CSS_TOKENS.finditer(text):
+        code.append(text[last:m.start()])
+        if m.group(1):
+            out.append(_squeeze_css("".join(code)))
+            out.append(m.group(1))
+            code = []
+        last = m.end()
+    code.append(text[last:])
+    out.append(_squeeze_css("".join(code)))
+    return "".join(out).strip() + "\n"
+
+
+# Characters after which a `/` starts a regex literal rather than a division.
+_REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^")
+_REGEX_KEYWORDS = re.compile(r"(?:^|[^\w$])(?:return|typeof|case|do|else|in|of|void|yield|await)$")
+
+
+def minify_js(text):
+    """
+    Conservative JS minifier: removes comments, indentation, trailing
+    spaces and blank lines, but keeps every line break so automatic
+    semicolon insertion behaves exactly as before. Strings, template
+    literals (including nested `${}`) and regex literals are copied as is.
+    """
+    out = []
+    i, n = 0, len(text)
+    stack = []  # "`" while inside a template literal, otherwise the brace depth of a ${} expression
+
+    def last_significant():
+        """The output so far back to the last line break, minus trailing whitespace."""
+        tail = []
+        for chunk in reversed(out):
+            tail.append(chunk)
+            if "\n" in chunk and "".join(tail).strip():
+                break
+        return "".join(reversed(tail)).rstrip()
+
+    def newline():
+        while out and out[-1] in (" ", "\t"):
+            out.pop()
+        if out and out[-1] != "\n":
+            out.append("\n")
+
+    while i < n:
+        c = text[i]
+        if stack and stack[-1] == "`":
+            # Inside a template literal.
+            if c == "\\":
+                out.append(text[i:i + 2])
+                i += 2
+                continue
+            if c == "`":
+                stack.pop()
+            elif text.startswith("${", i):
+                stack.append(0)
+                out.append("${")
+                i += 2
+                continue
+            out.append(c)
+            i += 1
+            continue
+
+        if c in "\"'":
+            j = i + 1
+            while j < n and text[j] != c and text[j] != "\n":
+                j += 2 if text[j] == "\\" else 1
+            out.append(text[i:j + 1])
+            i = j + 1
+        elif c == "`":
+            stack.append("`")
+            out.append(c)
+            i += 1
+        elif c == "{" and stack:
+            stack[-1] += 1
+            out.append(c)
+            i += 1
+        elif c == "}" and stack:
+            if stack[-1] == 0:
+                stack.pop()  # end of ${...}: back in the template literal
+            else:
+                stack[-1] -= 1
+            out.append(c)
+            i += 1
+        elif text.startswith("//", i):
+            while i < n and text[i] != "\n":
+                i += 1
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            if out and out[-1] not in (" ", "\n"):
+                out.append(" ")
+        elif c == "/":
+            prev = last_significant()
+            # `i++ / 2` divides: a postfix ++/-- ends an operand even though + and - precede regexes.
+            postfix = prev.endswith(("++", "--"))
+            if not prev or (prev[-1] in _REGEX_PRECEDERS and not postfix) or _REGEX_KEYWORDS.search(prev):
+                j, in_class = i + 1, False
+                while j < n and text[j] != "\n":
+                    if text[j] == "\\":
+                        j += 2
+                        continue
+                    if text[j] == "[":
+                        in_class = True
+                    elif text[j] == "]":
+                        in_class = False
+                    elif text[j] == "/" and not in_class:
+                        break
+                    j += 1
+                j += 1
+                while j < n and text[j].isalpha():
+                    j += 1
+                out.append(text[i:j])
+                i = j
+            else:
+                out.append(c)
+                i += 1
+        elif c == "\n":
+            newline()
+            i += 1
+        elif c in " \t\r":
+            j = i
+            while j < n and text[j] in " \t\r":
+                j += 1
+            if out and out[-1] not in ("\n", " "):
+                out.append(" ")
+            i = j
+        else:
+            out.append(c)
+            i += 1
+    newline()
+    return "".join(out).lstrip("\n")
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+
+# ------------------ Build ------------------
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _sources(static_dir):
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if not (root == static_dir and d == DIST_DIR)]
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, static_dir).replace(os.sep, "/"), path
+
+
+def _source_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_manifest(static_dir):
+    try:
+        with open(os.path.join(static_dir, DIST_DIR, MANIFEST_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def is_stale(static_dir, manifest=None):
+    manifest = load_manifest(static_dir) if manifest is None else manifest
+    sources = dict(_sources(static_dir))
+    if set(sources) != set(manifest):
+        return True
+    return any(manifest[name].get("source") != _source_hash(path) for name, path in sources.items())
+
+
+def build(static_dir):
+    """Minify, fingerprint and precompress every file under static_dir. Returns the manifest."""
+    dist = os.path.join(static_dir, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+    keep = {MANIFEST_NAME}
+    for name, path in _sources(static_dir):
+        with open(path, "rb") as f:
+            raw = f.read()
+        stem, ext = os.path.splitext(name)
+        data = raw
+        minify = MINIFIERS.get(ext.lower())
+        if minify:
+            try:
+                data = minify(raw.decode("utf-8")).encode("utf-8")
+            except UnicodeDecodeError:
+                data = raw
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        hashed = f"{stem}.{digest}{ext}"
+        target = os.path.join(dist, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        entry = {"path": f"{DIST_DIR}/{hashed}", "source": hashlib.sha256(raw).hexdigest(),
+                 "bytes": len(data), "source_bytes": len(raw), "encodings": {}}
+        if not os.path.exists(target):
+            _write_atomic(target, data)
+        keep.add(hashed)
+        if ext.lower() in COMPRESSIBLE and len(data) >= MIN_COMPRESS_BYTES:
+            variants = {"gzip": (".gz", lambda d: gzip.compress(d, 9, mtime=0))}
+            if brotli is not None:
+                variants["br"] = (".br", lambda d: brotli.compress(d, quality=11))
+            for encoding, (suffix, compress) in variants.items():
+                compressed = compress(data)
+                if len(compressed) < len(data):
+                    if not os.path.exists(target + suffix):
+                        _write_atomic(target + suffix, compressed)
+                    keep.add(hashed + suffix)
+                    entry["encodings"][encoding] = len(compressed)
+        manifest[name] = entry
+
+    # Drop fingerprints from earlier builds.
+    for root, _, files in os.walk(dist):
+        for file in files:
+            rel = os.path.relpath(os.path.join(root, file), dist).replace(os.sep, "/")
+            if rel not in keep and not file.endswith(".tmp"):
+                os.remove(os.path.join(root, file))
+    _write_atomic(os.path.join(dist, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    log.info("Built %d static assets into %s", len(manifest), dist)
+    return manifest
+
+
+# ------------------ Serving ------------------
+class StaticAssets:
+    """
+    Hooks the build into a Flask app: url_for('static') returns fingerprinted
+    names and the static endpoint serves them precompressed and immutable.
+    Files not in the manifest fall back to Flask's normal static handling.
+    """
+
+    def __init__(self, app=None, max_age=31536000):
+        self.max_age = max_age
+        self.static_dir = None
+        self._by_name = {}
+        self._by_path = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_dir = app.static_folder
+        self._fallback = app.view_functions["static"]
+        app.view_functions["static"] = self.serve
+        app.url_defaults(self._fingerprint)
+
+    def load(self, rebuild=False):
+        """Read the manifest, building first when asked to and the sources changed."""
+        with self._lock:
+            manifest = load_manifest(self.static_dir)
+            if rebuild and is_stale(self.static_dir, manifest):
+                manifest = build(self.static_dir)
+            self._by_name = {name: entry["path"] for name, entry in manifest.items()}
+            self._by_path = {entry["path"]: entry for entry in manifest.values()}
+        return len(self._by_name)
+
+    def _fingerprint(self, endpoint, values):
+        if endpoint == "static" and "filename" in values:
+            values["filename"] = self._by_name.get(values["filename"], values["filename"])
+
+    def serve(self, filename):
+        from flask import request, send_from_directory
+
+        entry = self._by_path.get(filename)
+        if entry is None:
+            return self._fallback(filename=filename)
+        encoding = None
+        for candidate in ("br", "gzip"):
+            if candidate in entry["encodings"] and request.accept_encodings[candidate]:
+                encoding = candidate
+                break
+        suffix = {"br": ".br", "gzip": ".gz"}.get(encoding, "")
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        response = send_from_directory(self.static_dir, filename + suffix, mimetype=mimetype,
+                                       max_age=self.max_age, conditional=True)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        if entry["encodings"]:
+            response.vary.add("Accept-Encoding")
+        response.headers["Cache-Control"] = IMMUTABLE if self.max_age >= 31536000 else f"public, max-age={self.max_age}"
+        return response
+
+
+def compress_response(response, min_bytes=1024, level=6):
+    """
+    after_request hook: gzip rendered HTML for clients that accept it.
+    Streams, file responses and anything already encoded are left alone;
+    a strong ETag becomes weak since the bytes on the wire change.
+    """
+    from flask import request
+
+    if (response.status_code != 200 or response.mimetype != "text/html" or response.direct_passthrough
+            or response.is_streamed or "Content-Encoding" in response.headers):
+        return response
+    response.vary.add("Accept-Encoding")
+    if not request.accept_encodings["gzip"]:
+        return response
+    data = response.get_data()
+    if len(data) < min_bytes:
+        return response
+    response.set_data(gzip.compress(data, level))
+    response.headers["Content-Encoding"] = "gzip"
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+if __name__ == "__main__":
+    static_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+    result = build(static_dir)
+    for name, entry in sorted(result.items()):
+        sizes = ", ".join(f"{enc} {size}" for enc, size in entry["encodings"].items())
+        print(f"{name:<30} {entry['source_bytes']:>8} -> {entry['bytes']:>8}  {entry['path']}  ({sizes or 'uncompressed'})")
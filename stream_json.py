@@ -0,0 +1,79 @@
+import json
+
+
+class WeekStreamParser:
+    """
+    Incremental parser for a streamed roadmap completion.
+    Feed it text chunks as they arrive; it returns every `weeks[i]` object
+    whose closing brace has been seen, without re-scanning earlier text.
+    Anything before the first top-level '{' (e.g. a ```json fence) is ignored.
+    """
+
+    def __init__(self, array_key="weeks"):
+        self.array_key = array_key
+        self.buffer = []          # characters of the current top-level document
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._pending_key = None
+        self._in_array = False
+        self._item_start = None
+        self.emitted = 0
+
+    def feed(self, chunk):
+        """Consume a chunk and return a list of newly completed array items."""
+        items = []
+        for ch in chunk:
+            if not self._stack and (self.buffer or ch != "{"):
+                continue  # prose / fences outside the document, or trailing text after it
+            pos = len(self.buffer)
+            self.buffer.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_string = "".join(self.buffer[self._string_start + 1:pos])
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif ch == ":" and len(self._stack) == 1:
+                self._pending_key = self._last_string
+            elif ch == "," and len(self._stack) == 1:
+                self._pending_key = None
+            elif ch in "{[":
+                if ch == "[" and len(self._stack) == 1 and self._pending_key == self.array_key:
+                    self._in_array = True
+                elif ch == "{" and self._in_array and len(self._stack) == 2:
+                    self._item_start = pos
+                self._stack.append(ch)
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if ch == "]" and self._in_array and len(self._stack) == 1:
+                    self._in_array = False
+                elif ch == "}" and self._item_start is not None and len(self._stack) == 2:
+                    raw = "".join(self.buffer[self._item_start:pos + 1])
+                    self._item_start = None
+                    try:
+                        items.append(json.loads(raw))
+                        self.emitted += 1
+                    except (ValueError, RecursionError):
+                        pass
+        return items
+
+    def document(self):
+        """Text of the top-level document seen so far (for a final full parse)."""
+        return "".join(self.buffer)
+
+    @property
+    def complete(self):
+        return bool(self.buffer) and not self._stack
@@ -0,0 +1,117 @@
+"""
+Shared fixtures. Run from the repository root:
+
+    pip install pytest mongomock
+    python -m pytest tests
+
+Nothing talks to a real Mongo or OpenAI: collections are mongomock and the
+modules under test are imported from the repository root.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def patch_mongomock_bulk():
+    """mongomock's bulk builder rejects the `sort` argument newer pymongo passes for UpdateOne/ReplaceOne."""
+    from mongomock.collection import BulkOperationBuilder
+    for name in ("add_update", "add_replace"):
+        original = getattr(BulkOperationBuilder, name)
+        if getattr(original, "drops_sort", False):
+            continue
+
+        def add(self, *args, _original=original, sort=None, **kwargs):
+            return _original(self, *args, **kwargs)
+
+        add.drops_sort = True
+        setattr(BulkOperationBuilder, name, add)
+
+
+@pytest.fixture
+def db():
+    mongomock = pytest.importorskip("mongomock")
+    patch_mongomock_bulk()
+    return mongomock.MongoClient()["skillsync_test"]
+
+
+ROADMAP = {
+    "goal": "Data Science",
+    "weeks": [{"title": f"Week {i + 1}", "tasks": [{"title": f"Task {i}.{j}", "done": False} for j in range(3)],
+               "resources": ["https://example.com"]} for i in range(4)],
+}
+
+
+class FakeCompletions:
+    """Stands in for client.chat.completions: every call returns ROADMAP, streamed in small chunks if asked."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, timeout=None, **request):
+        import json
+        import types
+        self.calls += 1
+        text = json.dumps(ROADMAP)
+        if request.get("stream"):
+            return iter([types.SimpleNamespace(usage=None, choices=[types.SimpleNamespace(
+                delta=types.SimpleNamespace(content=text[i:i + 16]))]) for i in range(0, len(text), 16)])
+        return types.SimpleNamespace(usage=None, choices=[types.SimpleNamespace(
+            message=types.SimpleNamespace(content=text))])
+
+
+@pytest.fixture(scope="session")
+def main_module():
+    """main imported once against mongomock and a fake OpenAI client."""
+    mongomock = pytest.importorskip("mongomock")
+    import types
+    patch_mongomock_bulk()
+    os.environ.update({
+        "MONGO_URI": "mongodb://in-memory",
+        "OPENAI_API_KEY": "test",
+        "ADMIN_EMAILS": "admin@example.com",
+        "AUTH_HASH_WORKERS": "0",
+        "AUTH_HASH_METHOD": "pbkdf2:sha256:1000",
+        "AUTH_IP_LIMIT": "0",
+        "MONGO_INDEX_BOOTSTRAP": "off",
+        "STATIC_BUILD": "off",
+        "ANALYTICS_FLUSH_SECONDS": "3600",
+    })
+    import mongo_setup
+    shared = mongomock.MongoClient()
+    mongo_setup.MongoClient = lambda uri, **options: shared
+    import main
+    main.llm._client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=FakeCompletions()))
+    main.create_app().config["TESTING"] = True
+    return main
+
+
+@pytest.fixture
+def main(main_module):
+    """main with an empty database (indexes included) and empty in-process caches."""
+    main_module.mongo_client.drop_database("SkillSyncDB")
+    main_module.bootstrap_indexes()
+    main_module.roadmap_cache.clear()
+    main_module.dashboard_cache = main_module.DashboardCache(max_entries=main_module.DASHBOARD_CACHE_SIZE)
+    main_module.email_limiter = main_module.SlidingWindowLimiter(main_module.AUTH_EMAIL_LIMIT,
+                                                                 main_module.AUTH_EMAIL_WINDOW)
+    with main_module.analytics._lock:
+        main_module.analytics._pending.clear()
+        main_module.analytics._meta.clear()
+    return main_module
+
+
+@pytest.fixture
+def login(main):
+    """login(email) -> a test client signed up and logged in as that user."""
+    def login(email="user@example.com", password="secret"):
+        client = main.app.test_client()
+        client.post("/signup", data={"name": "Test", "email": email, "password": password,
+                                     "confirm_password": password})
+        client.post("/login", data={"email": email, "password": password})
+        return client
+    return login
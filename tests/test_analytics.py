@@ -0,0 +1,102 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo.errors import AutoReconnect
+
+from analytics import BACKFILL_ID, AnalyticsRollups
+
+
+@pytest.fixture
+def rollups(db):
+    rollups = AnalyticsRollups(db["analytics_rollups"], flush_interval=3600)
+    yield rollups
+    rollups._stop.set()
+
+
+def test_concurrent_records_fold_into_exact_counters(rollups):
+    def user(i):
+        rollups.record_signup()
+        rollups.record_profile({}, f"Goal {i % 3}", ["python", "sql"])
+        rollups.record_generation(f"Goal {i % 3}")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(user, range(60)))
+    rollups.flush()
+    assert rollups.flush() == 0  # nothing pending twice
+
+    summary = rollups.summary()
+    assert (summary["total_users"], summary["total_roadmaps"]) == (60, 60)
+    assert sorted(g["count"] for g in summary["goals"]) == [20, 20, 20]
+    assert dict(summary["top_skills"]) == {"python": 60, "sql": 60}
+    assert summary["progress_histogram"][0] == 60
+
+
+def test_failed_flush_keeps_its_deltas(rollups, monkeypatch):
+    rollups.record_signup()
+    collection_type = type(rollups.collection)
+    real = collection_type.bulk_write
+    calls = []
+
+    def flaky(self, *args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise AutoReconnect("primary stepped down")
+        return real(self, *args, **kwargs)
+
+    monkeypatch.setattr(collection_type, "bulk_write", flaky)
+    with pytest.raises(AutoReconnect):
+        rollups.flush()
+    rollups.record_signup()
+    rollups.flush()
+    assert rollups.summary()["total_users"] == 2
+
+
+def _seed_users(db, n=30):
+    db["users"].insert_many([{"email": f"u{i}@example.com", "goal": "Web Dev" if i % 2 else "Data",
+                              "skills": ["python"], "roadmap": {"progress": {"done": i % 11, "total": 10}}}
+                             for i in range(n)])
+
+
+def test_rebuild_replaces_drifted_counters(db, rollups):
+    _seed_users(db)
+    rollups.record_profile({}, "Gone", ["cobol"])
+    rollups.flush()
+    rollups.rebuild(db["users"])
+    summary = rollups.summary()
+    assert summary["total_users"] == 30
+    assert {g["_id"]: g["count"] for g in summary["goals"]} == {"Web Dev": 15, "Data": 15}
+    assert dict(summary["top_skills"]) == {"python": 30}
+    assert sum(summary["progress_histogram"]) == 30
+
+
+def test_only_one_worker_backfills(db):
+    _seed_users(db)
+    workers = [AnalyticsRollups(db["analytics_rollups"], flush_interval=3600) for _ in range(6)]
+    rebuilds = []
+    barrier = threading.Barrier(len(workers))
+
+    def boot(rollups):
+        original = rollups.rebuild
+        rollups.rebuild = lambda *a, **k: rebuilds.append(1) or original(*a, **k)
+        barrier.wait()
+        return rollups.rebuild_if_missing(db["users"])
+
+    with ThreadPoolExecutor(max_workers=len(workers)) as pool:
+        results = list(pool.map(boot, workers))
+    assert len(rebuilds) == 1 and sum(r is not None for r in results) == 1
+    assert db["analytics_rollups"].find_one({"_id": BACKFILL_ID})["done_at"] is not None
+    assert workers[0].rebuild_if_missing(db["users"]) is None  # a later boot does nothing
+    assert workers[0].summary()["total_users"] == 30
+
+
+def test_abandoned_backfill_claim_is_taken_over(db, rollups):
+    _seed_users(db, 4)
+    claims = db["analytics_rollups"]
+    claims.insert_one({"_id": BACKFILL_ID, "kind": "backfill", "claimed_at": datetime.now(timezone.utc)})
+    assert rollups.rebuild_if_missing(db["users"], claim_timeout=60) is None  # held by a live worker
+
+    claims.update_one({"_id": BACKFILL_ID}, {"$set": {"claimed_at": datetime.now(timezone.utc) - timedelta(hours=1)}})
+    assert rollups.rebuild_if_missing(db["users"], claim_timeout=60)["users"] == 4
+    assert rollups.summary()["total_users"] == 4
@@ -0,0 +1,63 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from auth import HashPoolBusy, PasswordHasher, SlidingWindowLimiter
+
+
+def _die():
+    os._exit(1)
+
+
+def test_sliding_window_blocks_at_the_limit_and_decays():
+    limiter = SlidingWindowLimiter(3, 60)
+    for _ in range(3):
+        assert limiter.retry_after("ip", now=600) == 0
+        limiter.hit("ip", now=600)
+    wait = limiter.retry_after("ip", now=600)
+    assert 0 < wait <= 60
+    # Half-way through the next window the previous three count as 1.5.
+    assert limiter.retry_after("ip", now=690) == 0
+    assert limiter.retry_after("other", now=600) == 0
+
+
+def test_sliding_window_counts_concurrent_hits_exactly():
+    limiter = SlidingWindowLimiter(1000, 60)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: limiter.hit("ip", now=600), range(800)))
+    assert limiter._counts["ip"][1] == 800
+
+
+def test_sliding_window_key_cap():
+    limiter = SlidingWindowLimiter(1, 60, max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.hit(key, now=600)
+    assert list(limiter._counts) == ["b", "c"]
+
+
+def test_failed_logins_throttle_the_email_not_the_client(main, login):
+    login("victim@example.com", "right")
+    attacker = main.app.test_client()
+    for _ in range(main.AUTH_EMAIL_LIMIT):
+        assert "Retry-After" not in attacker.post("/login", data={"email": "victim@example.com",
+                                                                  "password": "wrong"}).headers
+    throttled = attacker.post("/login", data={"email": "victim@example.com", "password": "right"})
+    assert int(throttled.headers["Retry-After"]) > 0
+    # Another account from the same client is unaffected.
+    login("other@example.com", "pw")
+    ok = attacker.post("/login", data={"email": "other@example.com", "password": "pw"})
+    assert ok.headers["Location"].endswith("/dashboard")
+
+
+def test_hasher_replaces_a_broken_pool():
+    hasher = PasswordHasher("pbkdf2:sha256:1000", workers=1, max_pending=4)
+    try:
+        stored = hasher.hash("pw")
+        with pytest.raises(HashPoolBusy):
+            hasher._result(hasher._submit("hash", _die))
+        assert hasher.verify(stored, "pw")
+        hasher._pool().submit(_die).exception(timeout=30)  # break it between requests
+        assert hasher.verify(stored, "pw")
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,30 @@
+import pytest
+
+from mongodb_helper import MongoDBHelper
+
+
+@pytest.fixture
+def helper(db):
+    # Skip __init__: it connects with MONGO_URI; fetch_page only needs the collection.
+    helper = MongoDBHelper.__new__(MongoDBHelper)
+    helper.collection = db["pages"]
+    return helper
+
+
+def _all_pages(helper, **kwargs):
+    seen, token = [], None
+    while True:
+        docs, token = helper.fetch_page(page_size=2, after=token, sort_field="rank", **kwargs)
+        seen.extend(d["_id"] for d in docs)
+        if token is None:
+            return seen
+
+
+@pytest.mark.parametrize("ascending", [True, False])
+def test_fetch_page_walks_null_and_missing_sort_values(helper, ascending):
+    docs = [{"_id": 1, "rank": 3}, {"_id": 2}, {"_id": 3, "rank": None}, {"_id": 4, "rank": 1},
+            {"_id": 5, "rank": 3}, {"_id": 6}, {"_id": 7, "rank": 2}]
+    helper.collection.insert_many(docs)
+    # Null and missing sort first, ties broken by _id.
+    expected = [2, 3, 6, 4, 7, 1, 5]
+    assert _all_pages(helper, ascending=ascending) == (expected if ascending else expected[::-1])
@@ -0,0 +1,22 @@
+from ingest_playlists import ingest
+from mongo_setup import INDEXES, ensure_collection_indexes
+
+ROWS = [
+    (1, {"url": "https://y/1", "title": "Python  basics", "rating": "4.5"}),
+    (2, {"url": "https://y/2", "title": "SQL", "video_count": "12"}),
+    (3, {"url": "https://y/1", "title": "Python basics (2024)"}),
+    (4, {"title": "no url"}),
+]
+
+
+def test_ingest_into_custom_collection_is_idempotent(db):
+    collection = db["catalog_v2"]
+    assert ensure_collection_indexes(collection, INDEXES["playlists"])
+    assert collection.index_information()["url_unique"]["unique"]
+
+    first = ingest(collection, iter(ROWS), chunk_size=10)
+    assert (first["inserted"], first["rejected"], first["duplicates"]) == (2, 1, 1)
+    second = ingest(collection, iter(ROWS), chunk_size=10)
+    assert (second["inserted"], second["modified"], second["unchanged"]) == (0, 0, 2)
+    assert collection.count_documents({}) == 2
+    assert collection.find_one({"url": "https://y/1"})["title"] == "Python basics (2024)"
@@ -0,0 +1,78 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from jobs import JobManager, JobQueueFull
+
+
+@pytest.fixture
+def gate():
+    event = threading.Event()
+    yield event
+    event.set()  # never leave a worker blocked
+
+
+@pytest.fixture
+def manager(db, gate):
+    manager = JobManager(db["jobs"], max_workers=2, max_queue=4)
+
+    def slow(params, report):
+        report(50, "Working")
+        gate.wait(5)
+        return {"echo": params}
+
+    manager.register("slow", slow)
+    return manager
+
+
+def _wait_done(manager, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_concurrent_submits_share_one_job(manager, gate):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: manager.submit("slow", "a@example.com", {"n": 1}, "week:0"), range(8)))
+    ids = {job["_id"] for job, _ in results}
+    assert len(ids) == 1
+    assert sum(created for _, created in results) == 1
+    assert manager.collection.count_documents({}) == 1
+
+    gate.set()
+    assert _wait_done(manager, ids.pop())["result"] == {"echo": {"n": 1}}
+
+
+def test_dedup_is_per_owner_and_scope_and_ends_with_the_job(manager, gate):
+    first, _ = manager.submit("slow", "a@example.com", {}, "week:0")
+    assert manager.submit("slow", "a@example.com", {}, "week:1")[1]
+    assert manager.submit("slow", "b@example.com", {}, "week:0")[1]
+    gate.set()
+    _wait_done(manager, first["_id"])
+    again, created = manager.submit("slow", "a@example.com", {}, "week:0")
+    assert created and again["_id"] != first["_id"]
+
+
+def test_stale_active_job_is_replaced(manager, gate):
+    job, _ = manager.submit("slow", "a@example.com", {}, "x")
+    manager.collection.update_one({"_id": job["_id"]},
+                                  {"$set": {"updated_at": datetime.now(timezone.utc) - timedelta(hours=1)}})
+    fresh, created = manager.submit("slow", "a@example.com", {}, "x")
+    assert created and fresh["_id"] != job["_id"]
+    assert manager.get(job["_id"])["status"] == "failed"
+
+
+def test_full_queue_fails_fast_and_frees_the_dedup_key(manager):
+    for i in range(4):
+        manager.submit("slow", "a@example.com", {}, f"scope:{i}")
+    with pytest.raises(JobQueueFull):
+        manager.submit("slow", "a@example.com", {}, "overflow")
+    rejected = manager.collection.find_one({"params": {}, "status": "failed"})
+    assert rejected is not None and "dedup_key" not in rejected
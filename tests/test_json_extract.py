@@ -0,0 +1,25 @@
+import json
+
+from json_extract import extract_json, strip_trailing_commas
+
+
+def test_trailing_commas_outside_strings_only():
+    text = 'Sure! {"a": [1, 2,], "b": "keep, ]this", "c": {"d": "\\", ]",},}'
+    assert extract_json(text) == {"a": [1, 2], "b": "keep, ]this", "c": {"d": '", ]'}}
+    assert strip_trailing_commas('["x,]", 1,]') == '["x,]", 1]'
+
+
+def test_truncated_document_is_closed_at_the_last_complete_value():
+    doc = json.dumps({"goal": "g", "weeks": [{"title": f"W{i}", "tasks": ["a", "b"]} for i in range(3)]})
+    parsed = extract_json("```json\n" + doc[:-30])
+    assert parsed["goal"] == "g"
+    assert [w.get("title") for w in parsed["weeks"]][:2] == ["W0", "W1"]
+
+
+def test_prose_and_fences_around_a_document():
+    assert extract_json('Here you go:\n```json\n[{"day": "Day 1"}]\n```\nEnjoy') == [{"day": "Day 1"}]
+    assert extract_json("no json here") is None
+
+
+def test_too_deep_to_decode_gives_up_quickly():
+    assert extract_json("text " + "[" * 50000 + "]" * 50000) is None
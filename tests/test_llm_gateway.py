@@ -0,0 +1,75 @@
+import types
+
+import pytest
+
+from llm_gateway import LLMBusyError, LLMGateway
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._chunks)
+
+    def close(self):
+        self.closed = True
+
+
+def _chunk(text, usage=None):
+    return types.SimpleNamespace(usage=usage,
+                                 choices=[types.SimpleNamespace(delta=types.SimpleNamespace(content=text))])
+
+
+def _gateway(streams, **kwargs):
+    calls = []
+
+    def create(timeout=None, **request):
+        calls.append(request)
+        return streams.pop(0)
+
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+    kwargs.setdefault("queue_timeout", 0.05)
+    return LLMGateway(lambda: client, **kwargs), calls
+
+
+def test_stream_is_admitted_at_call_time():
+    gateway, calls = _gateway([FakeStream([_chunk("a")])], max_concurrency=1, rate_per_minute=6000)
+    stream = gateway.stream_chat("r", [{"role": "user", "content": "hi"}], model="m")
+    assert len(calls) == 1 and gateway.metrics()["in_flight"] == 1
+    with pytest.raises(LLMBusyError):
+        gateway.stream_chat("r", [{"role": "user", "content": "again"}], model="m")
+    assert [c.choices[0].delta.content for c in stream] == ["a"]
+    assert gateway.metrics()["in_flight"] == 0
+
+
+def test_closing_a_stream_early_closes_upstream_and_records_it():
+    upstream = FakeStream([_chunk("a"), _chunk("b"), _chunk("c")])
+    gateway, _ = _gateway([upstream, FakeStream([])], max_concurrency=1, rate_per_minute=6000)
+
+    def consumer():
+        with gateway.stream_chat("r", [{"role": "user", "content": "hi"}], model="m") as stream:
+            for chunk in stream:
+                yield chunk
+
+    gen = consumer()
+    next(gen)
+    gen.close()  # what a client disconnect does to a Flask streaming response
+    assert upstream.closed
+    metrics = gateway.metrics()
+    assert metrics["in_flight"] == 0
+    assert metrics["routes"]["r"]["calls"] == 1 and metrics["routes"]["r"]["errors"] == 1
+    assert list(gateway.stream_chat("r", [{"role": "user", "content": "hi"}], model="m")) == []  # slot is free again
+
+
+def test_stream_settles_token_reservation_with_usage():
+    usage = types.SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15)
+    gateway, _ = _gateway([FakeStream([_chunk("a"), _chunk(None, usage=usage)])],
+                          rate_per_minute=6000, tokens_per_minute=1000)
+    list(gateway.stream_chat("r", [{"role": "user", "content": "x" * 400}], model="m", max_tokens=500))
+    # The 600-token estimate is swapped for the 15 actually used; left reserved, ~400 would remain.
+    assert gateway.metrics()["tokens_available"] >= 985
@@ -0,0 +1,23 @@
+from roadmap_cache import RoadmapCache, make_cache_key
+
+
+def _key(goal, skills=("python",)):
+    return make_cache_key(goal, list(skills), 2, 3, "gpt-4o-mini", "v1")
+
+
+def test_invalidate_goal_counts_an_entry_in_both_tiers_once(db):
+    cache = RoadmapCache(db["roadmap_cache"])
+    cache.put(_key("Data Science"), "Data  science", {"weeks": []})
+    cache.put(_key("Data Science", ["sql"]), "data science", {"weeks": []})
+    cache.put(_key("Web Dev"), "web dev", {"weeks": []})
+
+    assert cache.invalidate_goal("DATA SCIENCE") == 2
+    assert cache.get(_key("Data Science")) is None
+    assert db["roadmap_cache"].count_documents({}) == 1
+
+
+def test_invalidate_goal_without_mongo():
+    cache = RoadmapCache()
+    cache.put(_key("Go"), "go", {"weeks": []})
+    assert cache.invalidate_goal("go") == 1
+    assert cache.invalidate_goal("go") == 0
@@ -0,0 +1,69 @@
+import copy
+
+import pytest
+
+from conftest import ROADMAP
+from roadmap_versions import RoadmapVersionStore
+
+
+def _edit(roadmap, title):
+    roadmap = copy.deepcopy(roadmap)
+    roadmap["weeks"][0]["title"] = title
+    return roadmap
+
+
+def test_versions_rebuild_from_snapshots_and_patches(db):
+    store = RoadmapVersionStore(db["roadmaps"], snapshot_every=3)
+    store.ensure_indexes()
+    contents = [_edit(ROADMAP, f"Intro {v}") for v in range(1, 6)]
+    for version, content in enumerate(contents, start=1):
+        store.record("a@example.com", content, version)
+
+    kinds = {v["version"]: v["kind"] for v in store.list_versions("a@example.com")}
+    assert kinds == {1: "snapshot", 2: "delta", 3: "delta", 4: "snapshot", 5: "delta"}
+    for version, content in enumerate(contents, start=1):
+        assert store.get_version("a@example.com", version) == content
+    assert store.diff("a@example.com", 1, 2) == [
+        {"op": "replace", "path": "/weeks/0/title", "value": "Intro 2"}]
+
+
+def test_record_replaces_a_version_that_was_never_applied(db):
+    store = RoadmapVersionStore(db["roadmaps"])
+    store.ensure_indexes()
+    store.record("a@example.com", ROADMAP, 1)
+    store.record("a@example.com", _edit(ROADMAP, "never applied"), 2)
+    store.record("a@example.com", _edit(ROADMAP, "applied"), 2)
+    assert db["roadmaps"].count_documents({"email": "a@example.com"}) == 2
+    assert store.get_version("a@example.com", 2)["weeks"][0]["title"] == "applied"
+
+
+def test_failed_users_update_leaves_no_version(main, login, monkeypatch):
+    login("a@example.com")
+    main.save_roadmap("a@example.com", "Data Science", [], copy.deepcopy(ROADMAP))
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("primary stepped down")
+
+    monkeypatch.setattr(main.users_col, "find_one_and_update", fail)
+    with pytest.raises(RuntimeError):
+        main.save_roadmap("a@example.com", "Data Science", [], _edit(ROADMAP, "lost"))
+    monkeypatch.undo()
+    assert [v["version"] for v in main.roadmap_versions.list_versions("a@example.com")] == [1]
+
+    _, version = main.save_roadmap("a@example.com", "Data Science", [], _edit(ROADMAP, "kept"))
+    assert version == 2
+    user = main.users_col.find_one({"email": "a@example.com"})
+    assert user["roadmap_version"] == 2
+    assert main.roadmap_versions.get_version("a@example.com", 2)["weeks"][0]["title"] == "kept"
+
+
+def test_concurrent_saves_get_distinct_versions(main, login):
+    from concurrent.futures import ThreadPoolExecutor
+    login("a@example.com")
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        versions = list(pool.map(
+            lambda i: main.save_roadmap("a@example.com", "Data Science", [], _edit(ROADMAP, f"Run {i}"))[1],
+            range(8)))
+    assert sorted(versions) == list(range(1, 9))
+    assert main.users_col.find_one({"email": "a@example.com"})["roadmap_version"] == 8
+    assert sorted(v["version"] for v in main.roadmap_versions.list_versions("a@example.com")) == list(range(1, 9))
@@ -0,0 +1,23 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Time from `import main` to the first response in a fresh interpreter; generous for slow CI machines.
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1500"))
+
+
+def test_worker_starts_within_budget_without_heavy_imports():
+    # The shipped defaults, not whatever the developer's shell exports.
+    env = {k: v for k, v in os.environ.items() if k not in ("CREW_POOL_WARM", "MONGO_INDEX_BOOTSTRAP")}
+    proc = subprocess.run(
+        [sys.executable, os.path.join("benchmarks", "startup_profile.py"),
+         "--runs", "3", "--json", "--budget-ms", str(STARTUP_BUDGET_MS)],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=300,
+    )
+    assert proc.stdout, proc.stderr[-2000:]
+    report = json.loads(proc.stdout)
+    assert report["eager_lazy_modules"] == [], "imported at startup but should load lazily"
+    assert report["median"]["ready_ms"] <= STARTUP_BUDGET_MS, report["median"]
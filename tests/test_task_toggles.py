@@ -0,0 +1,54 @@
+import copy
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import ROADMAP
+
+EMAIL = "user@example.com"
+
+
+@pytest.fixture
+def clients(main, login):
+    """Four sessions for the same user, like four open tabs, with a saved four-week roadmap."""
+    tabs = [login(EMAIL) for _ in range(4)]
+    main.save_roadmap(EMAIL, "Data Science", [], copy.deepcopy(ROADMAP))
+    return tabs
+
+
+def _counters(main):
+    roadmap = main.users_col.find_one({"email": EMAIL})["roadmap"]
+    return roadmap["progress"], [w["done_count"] for w in roadmap["weeks"]]
+
+
+def _toggle_everywhere(clients, done, repeat=5):
+    def click(client):
+        return [client.post("/update_task_status", json={"weekIdx": 1, "taskIdx": 2, "done": done}).status_code
+                for _ in range(repeat)]
+    with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+        return [code for codes in pool.map(click, clients) for code in codes]
+
+
+def test_concurrent_toggles_move_counters_once(main, clients):
+    assert set(_toggle_everywhere(clients, True)) == {200}
+    progress, per_week = _counters(main)
+    assert progress == {"done": 1, "total": 12}
+    assert per_week == [0, 1, 0, 0]
+
+    assert set(_toggle_everywhere(clients, False)) == {200}
+    assert _counters(main) == ({"done": 0, "total": 12}, [0, 0, 0, 0])
+
+
+def test_toggle_out_of_range_is_rejected(main, clients):
+    response = clients[0].post("/update_task_status", json={"weekIdx": 9, "taskIdx": 0, "done": True})
+    assert response.status_code == 400
+    assert _counters(main)[0]["done"] == 0
+
+
+def test_batch_applies_only_real_changes(main, clients):
+    updates = [{"weekIdx": 0, "taskIdx": 0, "done": True}, {"weekIdx": 0, "taskIdx": 0, "done": True},
+               {"weekIdx": 2, "taskIdx": 1, "done": True}, {"weekIdx": 3, "taskIdx": 0, "done": False}]
+    body = clients[0].post("/update_task_status/batch", json={"updates": updates}).get_json()
+    assert body["applied"] == 2 and body["progress"] == 16
+    assert clients[1].post("/update_task_status/batch", json={"updates": updates}).get_json()["applied"] == 0
+    assert _counters(main) == ({"done": 2, "total": 12}, [1, 0, 1, 0])